@@ -0,0 +1,120 @@
+import argparse
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from inference_service.async_ocr import AsyncOCREngine
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="OCR throughput of the async VLM engine at several in-flight limits"
+    )
+    parser.add_argument("--base_url", default=None, type=str, help="OpenAI-compatible endpoint (default: local mock)")
+    parser.add_argument("--model", default=None, type=str)
+    parser.add_argument("--num_plates", default=64, type=int)
+    parser.add_argument("--concurrency", default="1,4,8,16,32", type=str, help="Comma separated max in-flight values")
+    parser.add_argument("--mock_latency_ms", default=300, type=float, help="Mock server response time")
+    parser.add_argument("--mock_capacity", default=12, type=int, help="Concurrent requests before the mock returns 429")
+    return parser.parse_args()
+
+
+def start_mock_server(latency_ms: float, capacity: int) -> ThreadingHTTPServer:
+    """
+    Minimal /chat/completions endpoint that answers after `latency_ms` and throttles
+    (429 + Retry-After) above `capacity` concurrent requests.
+    """
+    lock = threading.Lock()
+    active = [0]
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+            with lock:
+                throttled = active[0] >= capacity
+                if not throttled:
+                    active[0] += 1
+
+            if throttled:
+                body = json.dumps({"error": {"message": "rate limited", "type": "rate_limit"}}).encode()
+                self.send_response(429)
+                self.send_header("Retry-After", "0.2")
+            else:
+                time.sleep(latency_ms / 1000)
+                with lock:
+                    active[0] -= 1
+                body = json.dumps({
+                    "id": "mock",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": "mock",
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "51F12345"},
+                        "finish_reason": "stop"
+                    }],
+                }).encode()
+                self.send_response(200)
+
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def run_engine(base_url: str, model: str, crops: list, max_in_flight: int) -> dict:
+    kwargs = {"base_url": base_url, "max_in_flight": max_in_flight, "log_requests": False}
+    if model:
+        kwargs["model"] = model
+
+    async with AsyncOCREngine(**kwargs) as engine:
+        start = time.perf_counter()
+        plates = await engine.read_plates(crops)
+        elapsed = time.perf_counter() - start
+
+        stats = engine.stats()
+        stats["elapsed"] = elapsed
+        stats["read"] = sum(1 for plate in plates if plate)
+        return stats
+
+
+def main():
+    args = parse_arguments()
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server = start_mock_server(args.mock_latency_ms, args.mock_capacity)
+        base_url = f"http://127.0.0.1:{server.server_address[1]}/v1/"
+        print(f"[BENCH] Mock VLM at {base_url} ({args.mock_latency_ms:.0f} ms, "
+              f"throttles above {args.mock_capacity} concurrent requests)")
+
+    rng = np.random.default_rng(0)
+    crops = [rng.integers(0, 255, (48, 160, 3), dtype=np.uint8) for _ in range(args.num_plates)]
+
+    print(f"\n{'in flight':>9} {'plates/s':>9} {'read':>6} {'retries':>8} {'429/503':>8} {'final limit':>12}")
+    for max_in_flight in [int(c) for c in args.concurrency.split(",")]:
+        stats = asyncio.run(run_engine(base_url, args.model, crops, max_in_flight))
+        print(f"{max_in_flight:>9} {len(crops) / stats['elapsed']:>9.1f} {stats['read']:>6} "
+              f"{stats['retries']:>8} {stats['throttled']:>8} {stats['concurrency_limit']:>12.1f}")
+
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
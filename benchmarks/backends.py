@@ -0,0 +1,91 @@
+import argparse
+import itertools
+import time
+
+import numpy as np
+import supervision as sv
+from supervision.metrics import MeanAveragePrecision
+
+from inference_service.backends import load_model
+
+VEHICLE_CLASSES = [2, 3, 5, 7]
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Compare latency and mAP drift of the PyTorch, ONNX Runtime and OpenVINO backends"
+    )
+    parser.add_argument("--source_video_path", default="inference_service/data/plate.mp4", type=str)
+    parser.add_argument("--model_path", default="inference_service/yolo11n.pt", type=str)
+    parser.add_argument(
+        "--backends", default="pytorch,onnx,openvino,onnx:int8,openvino:int8", type=str,
+        help="Comma separated backends; append ':int8' for the quantized export"
+    )
+    parser.add_argument("--calibration_dir", default=None, type=str)
+    parser.add_argument("--num_frames", default=200, type=int)
+    parser.add_argument("--warmup_frames", default=5, type=int)
+    parser.add_argument("--confidence_threshold", default=0.3, type=float)
+    return parser.parse_args()
+
+
+def run_backend(model, frames: list, conf_thres: float, warmup_frames: int):
+    for frame in frames[:warmup_frames]:
+        model(frame, verbose=False)
+
+    latencies = []
+    outputs = []
+    for frame in frames:
+        start = time.perf_counter()
+        result = model(frame, verbose=False)[0]
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        detections = sv.Detections.from_ultralytics(result)
+        detections = detections[detections.confidence > conf_thres]
+        detections = detections[np.isin(detections.class_id, VEHICLE_CLASSES)]
+        outputs.append(detections)
+
+    return outputs, np.array(latencies)
+
+
+def map_against(reference: list, candidate: list) -> float:
+    """
+    mAP@0.5 of a backend's detections, using the first backend (PyTorch by default) as ground truth.
+    """
+    metric = MeanAveragePrecision()
+    metric.update(candidate, reference)
+    return metric.compute().map50
+
+
+def main():
+    args = parse_arguments()
+
+    frames = list(itertools.islice(
+        sv.get_video_frames_generator(source_path=args.source_video_path),
+        args.num_frames
+    ))
+
+    reference = None
+
+    print("| backend | mean ms | p50 ms | p95 ms | mAP@0.5 vs first |")
+    print("|---------|--------:|-------:|-------:|-------------------:|")
+    for spec in args.backends.split(","):
+        backend, _, precision = spec.partition(":")
+        int8 = precision == "int8"
+
+        if int8 and not args.calibration_dir:
+            print(f"| {spec} | skipped: needs --calibration_dir | | | |")
+            continue
+
+        model = load_model(args.model_path, backend, int8=int8, calibration_dir=args.calibration_dir)
+        outputs, latencies = run_backend(model, frames, args.confidence_threshold, args.warmup_frames)
+
+        if reference is None:
+            reference = outputs
+        drift = map_against(reference, outputs)
+
+        print(f"| {spec} | {latencies.mean():.1f} | {np.percentile(latencies, 50):.1f} "
+              f"| {np.percentile(latencies, 95):.1f} | {drift:.3f} |")
+
+
+if __name__ == "__main__":
+    main()
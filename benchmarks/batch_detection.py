@@ -0,0 +1,65 @@
+import argparse
+import itertools
+import time
+
+import supervision as sv
+
+from inference_service.detector import initialize_detector, process_detection_batch, batch_frames
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark detection throughput (frames/sec) against YOLO batch size"
+    )
+    parser.add_argument("--source_video_path", default="inference_service/data/plate.mp4", type=str)
+    parser.add_argument("--model_path", default="inference_service/yolo11n.pt", type=str)
+    parser.add_argument("--batch_sizes", default="1,2,4,8,16", type=str)
+    parser.add_argument("--num_frames", default=256, type=int)
+    parser.add_argument("--warmup_frames", default=8, type=int)
+    parser.add_argument("--confidence_threshold", default=0.3, type=float)
+    parser.add_argument("--iou_threshold", default=0.7, type=float)
+    parser.add_argument("--use_roi", action="store_true", help="Crop the road polygon before inference")
+    return parser.parse_args()
+
+
+def run_benchmark(args: argparse.Namespace, batch_size: int) -> float:
+    video_info = sv.VideoInfo.from_video_path(video_path=args.source_video_path)
+    model, byte_track, polygon_zone, *_, roi = initialize_detector(
+        args.model_path, video_info, args.confidence_threshold, args.iou_threshold, use_roi=args.use_roi
+    )
+
+    frames = list(itertools.islice(
+        sv.get_video_frames_generator(source_path=args.source_video_path),
+        args.num_frames
+    ))
+
+    # Warm up the model so lazy initialisation is not part of the measurement
+    process_detection_batch(
+        model, byte_track, polygon_zone, frames[:args.warmup_frames],
+        args.confidence_threshold, args.iou_threshold, roi
+    )
+
+    start = time.perf_counter()
+    for batch in batch_frames(frames, batch_size):
+        process_detection_batch(
+            model, byte_track, polygon_zone, batch,
+            args.confidence_threshold, args.iou_threshold, roi
+        )
+    elapsed = time.perf_counter() - start
+
+    return len(frames) / elapsed
+
+
+def main():
+    args = parse_arguments()
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",")]
+
+    print(f"{'batch_size':>10} | {'frames/sec':>10}")
+    print("-" * 23)
+    for batch_size in batch_sizes:
+        fps = run_benchmark(args, batch_size)
+        print(f"{batch_size:>10} | {fps:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
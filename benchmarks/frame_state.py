@@ -0,0 +1,140 @@
+import argparse
+import time
+import tracemalloc
+from typing import Callable, Dict
+
+from workflow.fast_path import GraphSpec, FastPathExecutor, processing_spec
+from workflow.frame_context import CameraAccumulator, update_state
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Per-frame allocations of dict-spread TrafficState copies vs an in-place FrameContext"
+    )
+    parser.add_argument("--num_frames", default=5000, type=int)
+    parser.add_argument("--vehicles", default=20, type=int, help="Tracked vehicles per frame (size of the speed dicts)")
+    parser.add_argument("--repeats", default=3, type=int, help="Best of N timed runs per mode")
+    return parser.parse_args()
+
+
+def spread(state: dict, **changes) -> dict:
+    # What the nodes returned before: a full copy of the state per node
+    return {**state, **changes}
+
+
+def make_spec(update: Callable, vehicles: int) -> GraphSpec:
+    """
+    The processing topology with nodes that write the same fields as the real
+    ones, so the difference between modes is only how the state is updated.
+    """
+    speed_values = {tracker_id: 50.0 + tracker_id for tracker_id in range(vehicles)}
+    speed_confidence = dict.fromkeys(speed_values, 0.9)
+
+    def detect_vehicle(state):
+        return update(state, detections=None, motion_skipped=False, next="calculate_speed")
+
+    def calculate_speed(state):
+        return update(state, speed_values=speed_values, speed_confidence=speed_confidence, next="check_violation")
+
+    def check_violation(state):
+        return update(state, violations=[], next="ocr_plate")
+
+    def ocr_plate(state):
+        return update(state, next="end")
+
+    real = processing_spec()
+    nodes = {"detect_vehicle": detect_vehicle, "calculate_speed": calculate_speed,
+             "check_violation": check_violation, "ocr_plate": ocr_plate}
+    return GraphSpec(real.entry, nodes, real.routes)
+
+
+def dict_frame(accumulator: CameraAccumulator, frame_id: int) -> dict:
+    # Same keys as workflow.main.run_frame built for every frame
+    return {
+        "frame": None,
+        "frame_id": frame_id,
+        "timestamp": frame_id / 30,
+        "camera_id": "CAM_001",
+        "location": "bench",
+        "speed_limit": 60.0,
+        "detections": None,
+        "speed_values": accumulator.speed_values,
+        "speed_confidence": accumulator.speed_confidence,
+        "violations": [],
+        "violation_plates": accumulator.violation_plates,
+        "plate_readings": accumulator.plate_readings,
+        "llm_reports": accumulator.llm_reports,
+        "next": "save_db",
+    }
+
+
+def context_frame(accumulator: CameraAccumulator, frame_id: int):
+    return accumulator.frame_context(None, frame_id, frame_id / 30, "CAM_001", "bench", 60.0, next="save_db")
+
+
+def run_frame(executor: FastPathExecutor, accumulator: CameraAccumulator, make_frame: Callable, frame_id: int):
+    result = executor.invoke(make_frame(accumulator, frame_id))
+    accumulator.speed_values = result["speed_values"]
+    accumulator.speed_confidence = result["speed_confidence"]
+    return result
+
+
+def measure_memory(executor, make_frame, num_frames: int) -> Dict[str, float]:
+    """
+    Peak bytes and live blocks a frame needs on top of what was allocated before it.
+    """
+    accumulator = CameraAccumulator()
+    run_frame(executor, accumulator, make_frame, 0)
+
+    peak_bytes = 0
+    tracemalloc.start()
+    try:
+        for frame_id in range(1, num_frames + 1):
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            run_frame(executor, accumulator, make_frame, frame_id)
+            peak_bytes += tracemalloc.get_traced_memory()[1] - before
+
+        # Blocks held by the state of one frame while it is alive
+        snapshot_before = tracemalloc.take_snapshot()
+        result = run_frame(executor, accumulator, make_frame, num_frames + 1)
+        snapshot_after = tracemalloc.take_snapshot()
+        blocks = sum(stat.count_diff for stat in snapshot_after.compare_to(snapshot_before, "lineno"))
+        del result
+    finally:
+        tracemalloc.stop()
+
+    return {"peak_bytes": peak_bytes / num_frames, "blocks": blocks}
+
+
+def time_runs(executor, make_frame, num_frames: int, repeats: int) -> float:
+    accumulator = CameraAccumulator()
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for frame_id in range(num_frames):
+            run_frame(executor, accumulator, make_frame, frame_id)
+        best = min(best, time.perf_counter() - start)
+    return best / num_frames * 1e6
+
+
+def main():
+    args = parse_arguments()
+
+    modes = {
+        "dict spread (before)": (FastPathExecutor(make_spec(spread, args.vehicles)), dict_frame),
+        "dict partial updates": (FastPathExecutor(make_spec(update_state, args.vehicles)), dict_frame),
+        "FrameContext in place": (FastPathExecutor(make_spec(update_state, args.vehicles)), context_frame),
+    }
+
+    print(f"{len(modes)} modes, {args.num_frames} frames, {args.vehicles} vehicles per frame\n")
+    print("| state | peak KiB/frame | live blocks/frame | us/frame |")
+    print("|:------|---------------:|------------------:|---------:|")
+    for name, (executor, make_frame) in modes.items():
+        memory = measure_memory(executor, make_frame, args.num_frames)
+        us = time_runs(executor, make_frame, args.num_frames, args.repeats)
+        print(f"| {name} | {memory['peak_bytes'] / 1024:.2f} | {memory['blocks']} | {us:.1f} |")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import argparse
+import time
+from typing import List, Tuple
+
+from workflow.fast_path import GraphSpec, FastPathExecutor, build_langgraph, processing_spec
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Per-frame orchestration overhead of LangGraph vs the fast-path executor"
+    )
+    parser.add_argument("--num_frames", default=5000, type=int)
+    parser.add_argument("--node_work_us", default=0.0, type=float, help="Busy-wait inside every node to mimic real work")
+    parser.add_argument("--repeats", default=3, type=int, help="Best of N timed runs per executor")
+    return parser.parse_args()
+
+
+def stub_spec(node_work_us: float) -> Tuple[GraphSpec, List]:
+    """
+    The processing topology with nodes that only route to the next step, so the
+    timing is the cost of running the graph itself.
+    """
+    real = processing_spec()
+    order = [real.entry] + [targets[0] for targets in real.routes.values() if targets]
+
+    def make_node(next_name: str):
+        def node(state: dict) -> dict:
+            if node_work_us:
+                deadline = time.perf_counter() + node_work_us / 1e6
+                while time.perf_counter() < deadline:
+                    pass
+            return {**state, "next": next_name}
+        return node
+
+    nodes = {name: make_node(order[i + 1] if i + 1 < len(order) else "end") for i, name in enumerate(order)}
+    return GraphSpec(real.entry, nodes, real.routes), [nodes[name] for name in order]
+
+
+def frame_state(frame_id: int) -> dict:
+    # TrafficState keys workflow.main.run_frame fills for every frame
+    return {
+        "frame": None,
+        "frame_id": frame_id,
+        "timestamp": frame_id / 30,
+        "camera_id": "CAM_001",
+        "location": "bench",
+        "speed_limit": 60.0,
+        "detections": None,
+        "speed_values": {},
+        "speed_confidence": {},
+        "violations": [],
+        "violation_plates": [],
+        "plate_readings": {},
+        "llm_reports": [],
+        "next": "",
+    }
+
+
+def time_runs(run, num_frames: int, repeats: int) -> float:
+    states = [frame_state(frame_id) for frame_id in range(num_frames)]
+    run(states[0])
+
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for state in states:
+            run(state)
+        best = min(best, time.perf_counter() - start)
+    return best / num_frames * 1e6
+
+
+def main():
+    args = parse_arguments()
+    spec, ordered_nodes = stub_spec(args.node_work_us)
+
+    def direct(state):
+        for node in ordered_nodes:
+            state = node(state)
+        return state
+
+    runners = {
+        "direct calls": direct,
+        "fast path": FastPathExecutor(spec).invoke,
+        "langgraph": build_langgraph(spec).invoke,
+    }
+
+    timings = {name: time_runs(run, args.num_frames, args.repeats) for name, run in runners.items()}
+    baseline = timings["direct calls"]
+
+    print(f"{len(ordered_nodes)} nodes, {args.num_frames} frames, {args.node_work_us:.0f} us of work per node\n")
+    print("| executor | us/frame | overhead us/frame | frames/sec |")
+    print("|:---------|---------:|------------------:|-----------:|")
+    for name, us in timings.items():
+        print(f"| {name} | {us:.1f} | {us - baseline:.1f} | {1e6 / us:.0f} |")
+
+
+if __name__ == "__main__":
+    main()
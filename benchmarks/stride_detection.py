@@ -0,0 +1,88 @@
+import argparse
+import itertools
+import time
+
+import numpy as np
+import supervision as sv
+
+from inference_service.detector import initialize_detector, StridedDetector
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Report detection accuracy and throughput of keyframe-stride detection"
+    )
+    parser.add_argument("--source_video_path", default="inference_service/data/plate.mp4", type=str)
+    parser.add_argument("--model_path", default="inference_service/yolo11n.pt", type=str)
+    parser.add_argument("--strides", default="1,2,4,8", type=str)
+    parser.add_argument("--num_frames", default=300, type=int)
+    parser.add_argument("--confidence_threshold", default=0.3, type=float)
+    parser.add_argument("--iou_threshold", default=0.7, type=float)
+    parser.add_argument("--match_iou", default=0.5, type=float, help="IoU needed to count a box as matched")
+    return parser.parse_args()
+
+
+def run_stride(args: argparse.Namespace, frames: list, stride: int):
+    video_info = sv.VideoInfo.from_video_path(video_path=args.source_video_path)
+    model, byte_track, polygon_zone, *_ = initialize_detector(
+        args.model_path, video_info, args.confidence_threshold, args.iou_threshold
+    )
+    detector = StridedDetector(
+        model, byte_track, polygon_zone, args.confidence_threshold, args.iou_threshold, stride=stride
+    )
+
+    # Warm up the model outside of the timed loop
+    model(frames[0], verbose=False)
+
+    outputs = []
+    start = time.perf_counter()
+    for frame in frames:
+        outputs.append(detector.detect(frame))
+    elapsed = time.perf_counter() - start
+
+    return outputs, len(frames) / elapsed, detector.keyframes
+
+
+def compare(reference: list, candidate: list, match_iou: float):
+    matched, total_reference, total_candidate = 0, 0, 0
+    ious = []
+
+    for ref, cand in zip(reference, candidate):
+        total_reference += len(ref)
+        total_candidate += len(cand)
+        if len(ref) == 0 or len(cand) == 0:
+            continue
+
+        iou = sv.box_iou_batch(ref.xyxy, cand.xyxy)
+        best = iou.max(axis=1)
+        hits = best >= match_iou
+        matched += int(hits.sum())
+        ious.extend(best[hits].tolist())
+
+    recall = matched / total_reference if total_reference else 1.0
+    precision = matched / total_candidate if total_candidate else 1.0
+    mean_iou = float(np.mean(ious)) if ious else 0.0
+    return recall, precision, mean_iou
+
+
+def main():
+    args = parse_arguments()
+    strides = [int(s) for s in args.strides.split(",")]
+
+    frames = list(itertools.islice(
+        sv.get_video_frames_generator(source_path=args.source_video_path),
+        args.num_frames
+    ))
+
+    reference, _, _ = run_stride(args, frames, 1)
+
+    print("| stride | frames/sec | YOLO calls | recall | precision | mean IoU |")
+    print("|-------:|-----------:|-----------:|-------:|----------:|---------:|")
+    for stride in strides:
+        outputs, fps, keyframes = run_stride(args, frames, stride)
+        recall, precision, mean_iou = compare(reference, outputs, args.match_iou)
+        print(f"| {stride} | {fps:.2f} | {keyframes} | {recall:.3f} | {precision:.3f} | {mean_iou:.3f} |")
+
+
+if __name__ == "__main__":
+    main()
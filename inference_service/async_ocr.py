@@ -0,0 +1,232 @@
+import asyncio
+import random
+import time
+from typing import List, Optional
+
+import httpx
+import numpy as np
+import openai
+from openai import AsyncOpenAI
+
+from inference_service.plate_reader import (
+    API_BASE_URL, API_KEY, MODEL_NAME, REQUEST_TIMEOUT,
+    build_plate_messages, parse_plate_response, clean_plate_text,
+    build_batch_messages, parse_batch_response, payload_bytes, PayloadEncoder
+)
+
+THROTTLE_STATUS = (429, 503)
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit: grows by one slot per `limit` successful requests and
+    halves when the provider throttles, always within [minimum, maximum].
+    """
+
+    def __init__(self, maximum: int, initial: Optional[int] = None, minimum: int = 1):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(self.maximum, initial or self.maximum))
+        self.in_flight = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self) -> None:
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self) -> None:
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def on_throttle(self) -> None:
+        self.limit = max(self.minimum, self.limit / 2)
+
+
+class AsyncOCREngine:
+    """
+    Asyncio VLM plate reader for any OpenAI-compatible endpoint.
+
+    At most `max_in_flight` requests are outstanding; the actual limit adapts
+    (AIMD) to 429/503 responses. Each attempt gets `timeout` seconds, and 429, 5xx,
+    timeouts and connection errors are retried up to `max_retries` times with
+    full-jitter exponential backoff (or the server's Retry-After).
+
+        async with AsyncOCREngine(max_in_flight=16) as engine:
+            plates = await engine.read_plates(crops)
+    """
+
+    def __init__(
+            self,
+            base_url: str = API_BASE_URL,
+            api_key: Optional[str] = API_KEY,
+            model: str = MODEL_NAME,
+            max_in_flight: int = 8,
+            initial_concurrency: Optional[int] = None,
+            timeout: float = REQUEST_TIMEOUT,
+            max_retries: int = 4,
+            backoff_base: float = 0.5,
+            backoff_max: float = 10.0,
+            encoder: Optional[PayloadEncoder] = None,
+            log_requests: bool = True,
+    ):
+        self.base_url = base_url
+        self.api_key = api_key or "EMPTY"
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_in_flight = max_in_flight
+        self.initial_concurrency = initial_concurrency
+        self.encoder = encoder or PayloadEncoder()
+        self.log_requests = log_requests
+
+        self.limiter = None
+        self.client = None
+
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+        self.total_latency = 0.0
+        self.bytes_sent = 0
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def start(self) -> None:
+        # The limiter's Condition binds to the running loop, so build it here
+        self.limiter = AdaptiveLimiter(self.max_in_flight, self.initial_concurrency)
+        self.client = AsyncOpenAI(
+            base_url=self.base_url,
+            api_key=self.api_key,
+            max_retries=0,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_in_flight,
+                    max_keepalive_connections=self.max_in_flight
+                ),
+                timeout=httpx.Timeout(self.timeout)
+            )
+        )
+
+    async def close(self) -> None:
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(self.backoff_max, float(retry_after))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        if isinstance(error, (asyncio.TimeoutError, openai.APITimeoutError, openai.APIConnectionError)):
+            return True
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code == 429 or error.status_code >= 500
+        return False
+
+    async def _complete(self, messages: list) -> Optional[str]:
+        """
+        Answer text of one chat completion, with retries; None if every attempt failed.
+        """
+        size = payload_bytes(messages)
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire()
+            start = time.perf_counter()
+            try:
+                self.requests += 1
+                self.bytes_sent += size
+                response = await asyncio.wait_for(
+                    self.client.chat.completions.create(model=self.model, messages=messages),
+                    timeout=self.timeout
+                )
+                latency = time.perf_counter() - start
+                self.total_latency += latency
+                self.limiter.on_success()
+                if self.log_requests:
+                    print(f"[ASYNC OCR] {size / 1024:.1f} KB sent, {latency * 1000:.0f} ms")
+                return response.choices[0].message.content if response.choices else ""
+            except Exception as e:
+                if isinstance(e, openai.APIStatusError) and e.status_code in THROTTLE_STATUS:
+                    self.throttled += 1
+                    self.limiter.on_throttle()
+                if not self._is_retryable(e) or attempt == self.max_retries:
+                    self.failures += 1
+                    print(f"[ASYNC OCR] Request failed after {attempt + 1} attempts: {e}")
+                    return None
+                error = e
+            finally:
+                await self.limiter.release()
+
+            self.retries += 1
+            await asyncio.sleep(self._backoff(attempt, error))
+
+        return None
+
+    async def _request(self, plate_im: np.ndarray) -> Optional[str]:
+        plate_im = self.encoder.prepare(plate_im)
+        content = await self._complete(build_plate_messages(plate_im, self.encoder))
+        return parse_plate_response(content) if content is not None else None
+
+    async def read_plate(self, plate_im: np.ndarray) -> Optional[str]:
+        """
+        Plate number, "" for no plate, None if every attempt failed.
+        """
+        text = await self._request(plate_im)
+        if text is None:
+            return None
+        return clean_plate_text(text) if text else ""
+
+    async def read_plate_batch(self, plate_ims: List[np.ndarray], layout: str = "images") -> List[Optional[str]]:
+        """
+        Read several crops with one request; crops without a usable answer are
+        retried as single-image requests. None marks a crop whose retry failed too.
+        """
+        if len(plate_ims) == 1:
+            return [await self.read_plate(plate_ims[0])]
+
+        prepared = [self.encoder.prepare(plate_im) for plate_im in plate_ims]
+        content = await self._complete(build_batch_messages(prepared, layout, self.encoder))
+        texts = parse_batch_response(content, len(plate_ims))
+
+        missing = [index for index, text in enumerate(texts) if text is None]
+        retried = await asyncio.gather(*(self.read_plate(plate_ims[index]) for index in missing))
+
+        plates = [clean_plate_text(text) if text else "" for text in texts]
+        for index, plate in zip(missing, retried):
+            plates[index] = plate
+
+        print(f"[ASYNC OCR] {len(plate_ims)} crops in one request, {len(missing)} retried alone")
+        return plates
+
+    async def read_plates(self, plate_ims: List[np.ndarray]) -> List[Optional[str]]:
+        return list(await asyncio.gather(*(self.read_plate(plate_im) for plate_im in plate_ims)))
+
+    def stats(self) -> dict:
+        successes = self.requests - self.failures - self.retries
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "failures": self.failures,
+            "bytes_sent": self.bytes_sent,
+            "concurrency_limit": self.limiter.limit if self.limiter else 0,
+            "average_latency": self.total_latency / successes if successes > 0 else 0.0,
+        }
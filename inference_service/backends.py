@@ -0,0 +1,193 @@
+import glob
+import os
+import shutil
+import tempfile
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+BACKENDS = ("pytorch", "onnx", "openvino")
+CALIBRATION_EXTENSIONS = ("*.jpg", "*.jpeg", "*.png", "*.bmp")
+
+
+def exported_model_path(model_path: str, backend: str, int8: bool = False) -> str:
+    """
+    Location of the cached export, next to the .pt file (e.g. yolo11n_int8.onnx).
+    """
+    stem, _ = os.path.splitext(model_path)
+    suffix = "_int8" if int8 else ""
+
+    if backend == "onnx":
+        return f"{stem}{suffix}.onnx"
+    if backend == "openvino":
+        return f"{stem}{suffix}_openvino_model"
+
+    raise ValueError(f"Backend '{backend}' has no exported model")
+
+
+def list_calibration_frames(calibration_dir: str) -> list:
+    paths = []
+    for pattern in CALIBRATION_EXTENSIONS:
+        paths.extend(glob.glob(os.path.join(calibration_dir, pattern)))
+
+    if not paths:
+        raise FileNotFoundError(f"No calibration frames found in {calibration_dir}")
+
+    return sorted(paths)
+
+
+def _letterbox_square(image: np.ndarray, imgsz: int) -> np.ndarray:
+    height, width = image.shape[:2]
+    scale = imgsz / max(height, width)
+    resized = cv2.resize(image, (round(width * scale), round(height * scale)))
+
+    pad_y = imgsz - resized.shape[0]
+    pad_x = imgsz - resized.shape[1]
+    return cv2.copyMakeBorder(
+        resized,
+        pad_y // 2, pad_y - pad_y // 2,
+        pad_x // 2, pad_x - pad_x // 2,
+        cv2.BORDER_CONSTANT,
+        value=(114, 114, 114)
+    )
+
+
+class FrameCalibrationReader:
+    """
+    onnxruntime CalibrationDataReader over a folder of camera frames, preprocessed
+    the way Ultralytics feeds the exported model (letterbox, RGB, CHW, 0..1).
+    """
+
+    def __init__(self, calibration_dir: str, input_name: str, imgsz: int = 640):
+        self.paths = iter(list_calibration_frames(calibration_dir))
+        self.input_name = input_name
+        self.imgsz = imgsz
+
+    def get_next(self):
+        for path in self.paths:
+            image = cv2.imread(path)
+            if image is None:
+                continue
+
+            image = _letterbox_square(image, self.imgsz)
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            tensor = image.transpose(2, 0, 1)[np.newaxis].astype(np.float32) / 255.0
+            return {self.input_name: tensor}
+
+        return None
+
+    def rewind(self):
+        pass
+
+
+def _export(model_path: str, target: str, imgsz: int, **kwargs) -> str:
+    exported = YOLO(model_path).export(imgsz=imgsz, dynamic=True, **kwargs)
+    exported = str(exported)
+
+    if os.path.abspath(exported) != os.path.abspath(target):
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        elif os.path.exists(target):
+            os.remove(target)
+        shutil.move(exported, target)
+
+    return target
+
+
+def _quantize_onnx(fp32_path: str, target: str, calibration_dir: str, imgsz: int) -> str:
+    try:
+        import onnxruntime as ort
+        from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+    except ImportError as e:
+        raise ImportError("INT8 ONNX export needs onnxruntime: pip install onnxruntime") from e
+
+    session = ort.InferenceSession(fp32_path, providers=["CPUExecutionProvider"])
+    input_name = session.get_inputs()[0].name
+
+    quantize_static(
+        fp32_path,
+        target,
+        calibration_data_reader=FrameCalibrationReader(calibration_dir, input_name, imgsz),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+    )
+    return target
+
+
+def _export_openvino_int8(model_path: str, target: str, calibration_dir: str, imgsz: int) -> str:
+    list_calibration_frames(calibration_dir)
+
+    # Ultralytics calibrates OpenVINO (NNCF) from a dataset yaml; point it at the frame folder
+    names = YOLO(model_path).names
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_path = os.path.join(tmp_dir, "calibration.yaml")
+        with open(data_path, "w", encoding="utf-8") as f:
+            f.write(f"path: {os.path.abspath(calibration_dir)}\n")
+            f.write("train: .\n")
+            f.write("val: .\n")
+            f.write("names:\n")
+            for class_id, name in names.items():
+                f.write(f"  {class_id}: {name}\n")
+
+        return _export(model_path, target, imgsz, format="openvino", int8=True, data=data_path)
+
+
+def export_model(
+        model_path: str,
+        backend: str,
+        int8: bool = False,
+        calibration_dir: str = None,
+        imgsz: int = 640,
+) -> str:
+    target = exported_model_path(model_path, backend, int8)
+
+    if int8 and not calibration_dir:
+        raise ValueError("INT8 quantization needs --calibration_dir with sample frames")
+
+    print(f"[BACKEND] Exporting {model_path} -> {target}")
+
+    if backend == "onnx" and int8:
+        fp32_path = exported_model_path(model_path, "onnx")
+        if not os.path.exists(fp32_path):
+            _export(model_path, fp32_path, imgsz, format="onnx")
+        return _quantize_onnx(fp32_path, target, calibration_dir, imgsz)
+
+    if backend == "onnx":
+        return _export(model_path, target, imgsz, format="onnx")
+
+    if backend == "openvino" and int8:
+        return _export_openvino_int8(model_path, target, calibration_dir, imgsz)
+
+    return _export(model_path, target, imgsz, format="openvino")
+
+
+def load_model(
+        model_path: str,
+        backend: str = "pytorch",
+        int8: bool = False,
+        calibration_dir: str = None,
+        imgsz: int = 640,
+) -> YOLO:
+    """
+    Load the detector on the requested backend. Exported models are cached next to
+    the .pt file and reused on later runs. Every backend is wrapped in the Ultralytics
+    YOLO class, so results convert to sv.Detections the same way.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+
+    if backend == "pytorch":
+        if int8:
+            print("[BACKEND] INT8 is only supported on onnx/openvino, loading FP32 PyTorch model")
+        return YOLO(model_path)
+
+    target = exported_model_path(model_path, backend, int8)
+    if not os.path.exists(target):
+        export_model(model_path, backend, int8, calibration_dir, imgsz)
+    else:
+        print(f"[BACKEND] Using cached {backend} model: {target}")
+
+    return YOLO(target, task="detect")
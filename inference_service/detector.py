@@ -1,8 +1,14 @@
+import math
+from typing import Iterable, Iterator, List, Optional, Tuple
+
 import cv2
 import numpy as np
 import supervision as sv
 from ultralytics import YOLO
 
+from inference_service.backends import load_model
+from inference_service.motion import downscale_gray, motion_score
+
 SOURCE = np.array([
     [508,  950],
     [1410,  950],
@@ -34,14 +40,91 @@ class ViewTransformer:
         return transformed_points.reshape(-1, 2)
 
 
-def initialize_detector(
-        model_path: str, video_info: sv.VideoInfo, conf_thres: float, iou_thres: float
-):
-    model = YOLO(model_path)
-    byte_track = sv.ByteTrack(
-        frame_rate=video_info.fps, track_activation_threshold=conf_thres
-    )
+def clip_polygon_to_frame(polygon: np.ndarray, resolution_wh: Tuple[int, int]) -> np.ndarray:
+    width, height = resolution_wh
+    frame_polygon = np.array([
+        [0, 0],
+        [width, 0],
+        [width, height],
+        [0, height]
+    ], dtype=np.float32)
+
+    area, clipped = cv2.intersectConvexConvex(polygon.astype(np.float32), frame_polygon)
+    if clipped is None or area <= 0:
+        return frame_polygon
+    return clipped.reshape(-1, 2)
+
+
+class RoadROI:
+    """
+    Crop the bounding box of the road polygon out of each frame and letterbox it
+    before inference, keeping the pixel scale YOLO would use on the full frame.
+    Boxes are mapped back to full-frame coordinates with restore().
+    """
+
+    def __init__(
+            self,
+            polygon: np.ndarray,
+            resolution_wh: Tuple[int, int],
+            imgsz: int = 640,
+            stride: int = 32,
+    ):
+        width, height = resolution_wh
+        self.polygon = clip_polygon_to_frame(polygon, resolution_wh)
+
+        self.x1 = max(0, int(math.floor(self.polygon[:, 0].min())))
+        self.y1 = max(0, int(math.floor(self.polygon[:, 1].min())))
+        self.x2 = min(width, int(math.ceil(self.polygon[:, 0].max())))
+        self.y2 = min(height, int(math.ceil(self.polygon[:, 1].max())))
+
+        roi_w = self.x2 - self.x1
+        roi_h = self.y2 - self.y1
+        scale = imgsz / max(width, height)
+
+        self.resized_w = max(1, round(roi_w * scale))
+        self.resized_h = max(1, round(roi_h * scale))
+        self.input_w = int(math.ceil(self.resized_w / stride) * stride)
+        self.input_h = int(math.ceil(self.resized_h / stride) * stride)
+        self.pad_x = (self.input_w - self.resized_w) // 2
+        self.pad_y = (self.input_h - self.resized_h) // 2
+
+        self.scale_x = self.resized_w / roi_w
+        self.scale_y = self.resized_h / roi_h
+
+        self.pixel_fraction = (roi_w * roi_h) / (width * height)
+
+    @property
+    def imgsz(self) -> Tuple[int, int]:
+        return self.input_h, self.input_w
+
+    def prepare(self, frame: np.ndarray) -> np.ndarray:
+        crop = frame[self.y1:self.y2, self.x1:self.x2]
+        resized = cv2.resize(crop, (self.resized_w, self.resized_h), interpolation=cv2.INTER_LINEAR)
+        return cv2.copyMakeBorder(
+            resized,
+            self.pad_y, self.input_h - self.resized_h - self.pad_y,
+            self.pad_x, self.input_w - self.resized_w - self.pad_x,
+            cv2.BORDER_CONSTANT,
+            value=(114, 114, 114)
+        )
+
+    def restore(self, detections: sv.Detections) -> sv.Detections:
+        if len(detections) == 0:
+            return detections
 
+        pad = np.array([self.pad_x, self.pad_y, self.pad_x, self.pad_y], dtype=np.float32)
+        scale = np.array([self.scale_x, self.scale_y, self.scale_x, self.scale_y], dtype=np.float32)
+        offset = np.array([self.x1, self.y1, self.x1, self.y1], dtype=np.float32)
+
+        xyxy = (detections.xyxy - pad) / scale + offset
+        xyxy[:, [0, 2]] = np.clip(xyxy[:, [0, 2]], self.x1, self.x2)
+        xyxy[:, [1, 3]] = np.clip(xyxy[:, [1, 3]], self.y1, self.y2)
+        detections.xyxy = xyxy
+
+        return detections
+
+
+def create_annotators(video_info: sv.VideoInfo):
     thickness = sv.calculate_optimal_line_thickness(
         resolution_wh=video_info.resolution_wh
     )
@@ -59,17 +142,57 @@ def initialize_detector(
         position=sv.Position.BOTTOM_CENTER,
     )
 
-    # Create a full-frame polygon zone for better detection with test videos
-    width, height = video_info.resolution_wh
-    source_polygon = np.array([
-        [0, 0],
-        [width, 0],
-        [width, height],
-        [0, height]
-    ])
+    return box_annotator, label_annotator, trace_annotator
+
+
+def initialize_detector(
+        model_path: str,
+        video_info: sv.VideoInfo,
+        conf_thres: float,
+        iou_thres: float,
+        use_roi: bool = False,
+        imgsz: int = 640,
+        backend: str = "pytorch",
+        int8: bool = False,
+        calibration_dir: Optional[str] = None,
+        model=None,
+        source: Optional[np.ndarray] = None,
+        target: Optional[np.ndarray] = None,
+):
+    """
+    Pass `model` to reuse an already loaded detector (e.g. shared between cameras),
+    and `source`/`target` to override the default SOURCE/TARGET calibration.
+    """
+    if model is None:
+        model = load_model(model_path, backend, int8=int8, calibration_dir=calibration_dir, imgsz=imgsz)
+    source = SOURCE if source is None else source
+    target = TARGET if target is None else target
+
+    byte_track = sv.ByteTrack(
+        frame_rate=video_info.fps, track_activation_threshold=conf_thres
+    )
+
+    box_annotator, label_annotator, trace_annotator = create_annotators(video_info)
+
+    roi = None
+    if use_roi:
+        # Only the road polygon is cropped and sent to YOLO
+        roi = RoadROI(source, video_info.resolution_wh, imgsz=imgsz)
+        source_polygon = roi.polygon.astype(int)
+        print(f"[DETECT] Road ROI {roi.x1},{roi.y1} -> {roi.x2},{roi.y2} "
+              f"({roi.pixel_fraction * 100:.0f}% of the frame), model input {roi.input_w}x{roi.input_h}")
+    else:
+        # Create a full-frame polygon zone for better detection with test videos
+        width, height = video_info.resolution_wh
+        source_polygon = np.array([
+            [0, 0],
+            [width, 0],
+            [width, height],
+            [0, height]
+        ])
 
     polygon_zone = sv.PolygonZone(polygon=source_polygon)
-    view_transformer = ViewTransformer(source=SOURCE, target=TARGET)
+    view_transformer = ViewTransformer(source=source, target=target)
 
     return (
         model,
@@ -79,20 +202,47 @@ def initialize_detector(
         box_annotator,
         label_annotator,
         trace_annotator,
+        roi,
     )
 
 
-def process_detection(
+def scale_detections(detections: sv.Detections, factor: float) -> sv.Detections:
+    """
+    Copy of the detections with boxes multiplied by factor.
+    """
+    scaled = detections[np.arange(len(detections))]
+    scaled.xyxy = detections.xyxy * factor
+    return scaled
+
+
+def _run_model(
         model: YOLO,
+        frames: List[np.ndarray],
+        roi: Optional[RoadROI],
+        input_scale: float = 1.0,
+) -> List[sv.Detections]:
+    if roi is None:
+        results = model(frames, verbose=False)
+        detections = [sv.Detections.from_ultralytics(result) for result in results]
+    else:
+        results = model([roi.prepare(frame) for frame in frames], imgsz=roi.imgsz, verbose=False)
+        detections = [roi.restore(sv.Detections.from_ultralytics(result)) for result in results]
+
+    if input_scale != 1.0:
+        # Frames were decoded downscaled; report boxes in full-resolution coordinates
+        for d in detections:
+            d.xyxy = d.xyxy / input_scale
+
+    return detections
+
+
+def _filter_detections(
+        detections: sv.Detections,
         byte_track: sv.ByteTrack,
         polygon_zone: sv.PolygonZone,
-        frame: np.ndarray,
         conf_thres: float,
         iou_thres: float,
 ) -> sv.Detections:
-    result = model(frame, verbose=False)[0]
-    detections = sv.Detections.from_ultralytics(result)
-
     detections = detections[detections.confidence > conf_thres]
     if detections.class_id is not None:
         is_vehicle = np.isin(detections.class_id, [2, 3, 5, 7])
@@ -102,4 +252,164 @@ def process_detection(
     detections = detections.with_nms(threshold=iou_thres)
     detections = byte_track.update_with_detections(detections=detections)
 
-    return detections
\ No newline at end of file
+    return detections
+
+
+def process_detection(
+        model: YOLO,
+        byte_track: sv.ByteTrack,
+        polygon_zone: sv.PolygonZone,
+        frame: np.ndarray,
+        conf_thres: float,
+        iou_thres: float,
+        roi: Optional[RoadROI] = None,
+        input_scale: float = 1.0,
+) -> sv.Detections:
+    detections = _run_model(model, [frame], roi, input_scale)[0]
+    return _filter_detections(detections, byte_track, polygon_zone, conf_thres, iou_thres)
+
+
+def process_detection_batch(
+        model: YOLO,
+        byte_track: sv.ByteTrack,
+        polygon_zone: sv.PolygonZone,
+        frames: List[np.ndarray],
+        conf_thres: float,
+        iou_thres: float,
+        roi: Optional[RoadROI] = None,
+        input_scale: float = 1.0,
+) -> List[sv.Detections]:
+    """
+    Run one YOLO forward pass over a list of frames.
+
+    The tracker is still updated frame by frame, in the order the frames were given,
+    so the returned detections are identical in shape to calling process_detection
+    on each frame.
+    """
+    if not frames:
+        return []
+
+    return [
+        _filter_detections(detections, byte_track, polygon_zone, conf_thres, iou_thres)
+        for detections in _run_model(model, frames, roi, input_scale)
+    ]
+
+
+def batch_frames(frames: Iterable[np.ndarray], batch_size: int) -> Iterator[List[np.ndarray]]:
+    batch = []
+    for frame in frames:
+        batch.append(frame)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class StridedDetector:
+    """
+    Run YOLO only on keyframes and propagate tracked boxes in between.
+
+    A keyframe is taken every `stride` frames, or earlier when the motion score
+    between consecutive frames is above `motion_threshold`. The stride shrinks as
+    more tracks are live, because crowded scenes drift faster. In-between frames
+    reuse the last keyframe detections, shifted by each track's per-frame velocity.
+    """
+
+    def __init__(
+            self,
+            model: YOLO,
+            byte_track: sv.ByteTrack,
+            polygon_zone: sv.PolygonZone,
+            conf_thres: float,
+            iou_thres: float,
+            stride: int = 4,
+            motion_threshold: float = 0.05,
+            tracks_per_stride_step: int = 8,
+            motion_width: int = 160,
+            roi: Optional[RoadROI] = None,
+            input_scale: float = 1.0,
+    ):
+        self.model = model
+        self.byte_track = byte_track
+        self.polygon_zone = polygon_zone
+        self.conf_thres = conf_thres
+        self.iou_thres = iou_thres
+        self.stride = max(1, stride)
+        self.motion_threshold = motion_threshold
+        self.tracks_per_stride_step = tracks_per_stride_step
+        self.motion_width = motion_width
+        self.roi = roi
+        self.input_scale = input_scale
+
+        self.keyframe_detections = None
+        self.frames_since_keyframe = 0
+        self.velocities = {}
+        self.previous_small = None
+
+        self.keyframes = 0
+        self.propagated_frames = 0
+
+    def current_stride(self) -> int:
+        live_tracks = len(self.keyframe_detections) if self.keyframe_detections is not None else 0
+        return max(1, self.stride // (1 + live_tracks // self.tracks_per_stride_step))
+
+    def _is_keyframe(self, frame: np.ndarray) -> bool:
+        if self.stride == 1 or self.keyframe_detections is None:
+            return True
+        if self.frames_since_keyframe + 1 >= self.current_stride():
+            return True
+
+        small = downscale_gray(frame, self.motion_width)
+        score = motion_score(self.previous_small, small)
+        self.previous_small = small
+        return score > self.motion_threshold
+
+    def _update_velocities(self, detections: sv.Detections, elapsed: int) -> None:
+        previous = self.keyframe_detections
+        velocities = {}
+
+        if previous is not None and previous.tracker_id is not None and detections.tracker_id is not None:
+            previous_boxes = dict(zip(previous.tracker_id, previous.xyxy))
+            for tracker_id, box in zip(detections.tracker_id, detections.xyxy):
+                if tracker_id in previous_boxes:
+                    velocities[tracker_id] = (box - previous_boxes[tracker_id]) / elapsed
+
+        self.velocities = velocities
+
+    def _propagate(self) -> sv.Detections:
+        detections = self.keyframe_detections[np.arange(len(self.keyframe_detections))]
+        if detections.tracker_id is None:
+            return detections
+
+        steps = self.frames_since_keyframe
+        for i, tracker_id in enumerate(detections.tracker_id):
+            velocity = self.velocities.get(tracker_id)
+            if velocity is not None:
+                detections.xyxy[i] = detections.xyxy[i] + velocity * steps
+
+        return detections
+
+    def detect(self, frame: np.ndarray) -> sv.Detections:
+        if self._is_keyframe(frame):
+            detections = process_detection(
+                self.model,
+                self.byte_track,
+                self.polygon_zone,
+                frame,
+                self.conf_thres,
+                self.iou_thres,
+                self.roi,
+                self.input_scale,
+            )
+            self._update_velocities(detections, self.frames_since_keyframe + 1)
+
+            self.keyframe_detections = detections
+            self.frames_since_keyframe = 0
+            self.previous_small = downscale_gray(frame, self.motion_width)
+            self.keyframes += 1
+            return detections
+
+        self.frames_since_keyframe += 1
+        self.propagated_frames += 1
+        return self._propagate()
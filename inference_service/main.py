@@ -3,9 +3,12 @@
 import argparse
 import cv2
 import supervision as sv
-from detector import initialize_detector, process_detection
+from detector import initialize_detector, process_detection_batch, batch_frames
 from speed_estimator import SpeedEstimator
-from plate_reader import extract_and_read_plate  
+from track_lifecycle import TrackLifecycle
+from plate_localizer import PlateLocalizer
+from ocr_cache import OCRCache, PLATE_MAX_DISTANCE
+from plate_reader import extract_and_read_plate, get_plate_reader, PayloadEncoder, PLATE_HEIGHT, MAX_PAYLOAD_BYTES
 
 
 def parse_arguments() -> argparse.Namespace:
@@ -30,7 +33,68 @@ def parse_arguments() -> argparse.Namespace:
     parser.add_argument(
         "--speed_threshold_kmh", default=60, help="Speed threshold for plate extraction (km/h)", type=int
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--batch_size", default=1, help="Number of frames per YOLO forward pass", type=int
+    )
+    parser.add_argument(
+        "--use_roi", action="store_true", help="Run YOLO only on the road polygon (SOURCE) crop"
+    )
+    parser.add_argument(
+        "--backend", default="pytorch", choices=["pytorch", "onnx", "openvino"], help="Inference backend", type=str
+    )
+    parser.add_argument(
+        "--int8", action="store_true", help="Use an INT8 post-training quantized export (onnx/openvino)"
+    )
+    parser.add_argument(
+        "--calibration_dir", default=None, help="Folder of frames used for INT8 calibration", type=str
+    )
+    parser.add_argument(
+        "--headless", action="store_true", help="Do not open a display window"
+    )
+    parser.add_argument(
+        "--annotate_every", default=1, help="Draw annotations on every Nth frame only", type=int
+    )
+    parser.add_argument(
+        "--annotate_violations_only", action="store_true", help="Draw annotations only on frames with violations"
+    )
+    parser.add_argument(
+        "--ocr_timeout", default=30.0, help="VLM request timeout (seconds)", type=float
+    )
+    parser.add_argument(
+        "--ocr_max_connections", default=8, help="Pooled keep-alive connections to the VLM API", type=int
+    )
+    parser.add_argument(
+        "--plate_localizer", default="none", choices=["none", "classical", "yolo"], help="Tight plate crops for OCR", type=str
+    )
+    parser.add_argument(
+        "--plate_model_path", default=None, help="YOLO plate detector for --plate_localizer=yolo", type=str
+    )
+    parser.add_argument(
+        "--ocr_cache", action="store_true", help="Reuse OCR results for near-identical crops (perceptual hash)"
+    )
+    parser.add_argument(
+        "--ocr_cache_path", default=None, help="SQLite file that keeps the OCR cache between runs", type=str
+    )
+    parser.add_argument(
+        "--tiered_ocr", action="store_true", help="Try local EasyOCR first, call the VLM only when it is unsure"
+    )
+    parser.add_argument(
+        "--ocr_plate_height", default=PLATE_HEIGHT, help="Resize crops to this height before the VLM (0 = keep)", type=int
+    )
+    parser.add_argument(
+        "--ocr_max_bytes", default=MAX_PAYLOAD_BYTES, help="JPEG byte budget per image sent to the VLM (0 = no limit)", type=int
+    )
+    parser.add_argument(
+        "--ocr_grayscale", action="store_true", help="Send plate crops to the VLM in grayscale"
+    )
+    parser.add_argument(
+        "--ocr_clahe", action="store_true", help="Apply CLAHE contrast enhancement before the VLM"
+    )
+
+    args = parser.parse_args()
+    if args.plate_localizer == "yolo" and not args.plate_model_path:
+        parser.error("--plate_localizer=yolo requires --plate_model_path")
+    return args
 
 
 def main():
@@ -46,51 +110,116 @@ def main():
         box_annotator,
         label_annotator,
         trace_annotator,
+        roi,
     ) = initialize_detector(
-        args.model_path, video_info, args.confidence_threshold, args.iou_threshold
+        args.model_path,
+        video_info,
+        args.confidence_threshold,
+        args.iou_threshold,
+        use_roi=args.use_roi,
+        backend=args.backend,
+        int8=args.int8,
+        calibration_dir=args.calibration_dir,
     )
 
     speed_estimator = SpeedEstimator(view_transformer, video_info.fps)
+    track_lifecycle = TrackLifecycle(byte_track=byte_track)
+    track_lifecycle.register("speed_estimator", speed_estimator.evict)
+
+    # One reader for the whole run, so the VLM connection is reused across frames
+    # Near matches only on tight plate crops, see OCRCache
+    ocr_cache = None
+    if args.ocr_cache or args.ocr_cache_path:
+        ocr_cache = OCRCache(
+            db_path=args.ocr_cache_path, max_distance=PLATE_MAX_DISTANCE if args.plate_localizer != "none" else 0
+        )
+    encoder = PayloadEncoder(
+        target_height=args.ocr_plate_height, max_bytes=args.ocr_max_bytes, grayscale=args.ocr_grayscale, clahe=args.ocr_clahe
+    )
+    plate_reader = get_plate_reader(
+        tiered=args.tiered_ocr, timeout=args.ocr_timeout, max_connections=args.ocr_max_connections, cache=ocr_cache,
+        encoder=encoder
+    )
+
+    plate_localizer = None
+    if args.plate_localizer != "none":
+        plate_localizer = PlateLocalizer(model_path=args.plate_model_path if args.plate_localizer == "yolo" else None)
 
     frame_generator = sv.get_video_frames_generator(source_path=args.source_video_path)
 
+    frame_index = 0
+
     with sv.VideoSink(args.target_video_path, video_info) as sink:
-        for frame in frame_generator:
-            detections = process_detection(
+        for frames in batch_frames(frame_generator, args.batch_size):
+            batch_detections = process_detection_batch(
                 model,
                 byte_track,
                 polygon_zone,
-                frame,
+                frames,
                 args.confidence_threshold,
                 args.iou_threshold,
+                roi,
             )
 
-            speed_labels = speed_estimator.update_and_estimate(detections)
-
-            final_labels = extract_and_read_plate(
-                frame,
-                detections,
-                speed_labels,
-                args.speed_threshold_kmh
-            )
-
-            annotated_frame = frame.copy()
-            annotated_frame = trace_annotator.annotate(
-                scene=annotated_frame, detections=detections
-            )
-            annotated_frame = box_annotator.annotate(
-                scene=annotated_frame, detections=detections
-            )
-            annotated_frame = label_annotator.annotate(
-                scene=annotated_frame, detections=detections, labels=final_labels
-            )
-
-            sink.write_frame(annotated_frame)
-            cv2.imshow("frame", annotated_frame)
-            if cv2.waitKey(1) & 0xFF == ord("q"):
+            stop = False
+            for frame, detections in zip(frames, batch_detections):
+                tracker_ids, speeds = speed_estimator.estimate(detections)
+                speed_labels = speed_estimator.format_labels(tracker_ids, speeds)
+                track_lifecycle.update(tracker_ids, now=frame_index / video_info.fps)
+
+                final_labels = extract_and_read_plate(
+                    frame,
+                    detections,
+                    speed_labels,
+                    args.speed_threshold_kmh,
+                    reader=plate_reader,
+                    localizer=plate_localizer
+                )
+
+                # extract_and_read_plate only rewrites the labels of vehicles over the threshold
+                has_violation = final_labels != speed_labels
+                if args.annotate_violations_only:
+                    annotate = has_violation
+                else:
+                    annotate = frame_index % max(1, args.annotate_every) == 0
+                frame_index += 1
+
+                if annotate:
+                    annotated_frame = frame.copy()
+                    annotated_frame = trace_annotator.annotate(
+                        scene=annotated_frame, detections=detections
+                    )
+                    annotated_frame = box_annotator.annotate(
+                        scene=annotated_frame, detections=detections
+                    )
+                    annotated_frame = label_annotator.annotate(
+                        scene=annotated_frame, detections=detections, labels=final_labels
+                    )
+                else:
+                    # Nothing is drawn, so the decoded frame is written as-is
+                    annotated_frame = frame
+
+                sink.write_frame(annotated_frame)
+
+                if args.headless:
+                    continue
+
+                cv2.imshow("frame", annotated_frame)
+                if cv2.waitKey(1) & 0xFF == ord("q"):
+                    stop = True
+                    break
+
+            if stop:
                 break
 
-    cv2.destroyAllWindows()
+    if not args.headless:
+        cv2.destroyAllWindows()
+
+    if args.tiered_ocr:
+        print(f"[OCR TIER] {plate_reader.stats.summary()}")
+    if ocr_cache is not None:
+        print(f"[OCR CACHE] {ocr_cache.summary()}")
+        ocr_cache.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,68 @@
+import cv2
+import numpy as np
+
+
+def downscale_gray(frame: np.ndarray, width: int = 160) -> np.ndarray:
+    height = max(1, int(frame.shape[0] * width / frame.shape[1]))
+    small = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    return cv2.GaussianBlur(small, (5, 5), 0)
+
+
+def motion_score(previous: np.ndarray, current: np.ndarray, pixel_threshold: int = 25) -> float:
+    """
+    Fraction of pixels that changed by more than pixel_threshold between two
+    downscaled grayscale frames.
+    """
+    if previous is None or previous.shape != current.shape:
+        return 1.0
+    diff = cv2.absdiff(previous, current)
+    return float(np.count_nonzero(diff > pixel_threshold)) / diff.size
+
+
+class MotionGate:
+    """
+    Cheap check ahead of YOLO: compare a downscaled frame against a running
+    background and skip detection when nothing moves and no tracks are live.
+    """
+
+    def __init__(self, threshold: float = 0.002, width: int = 160, learning_rate: float = 0.05):
+        self.threshold = threshold
+        self.width = width
+        self.learning_rate = learning_rate
+
+        self.background = None
+        self.active_tracks = 0
+
+        self.frames = 0
+        self.skipped = 0
+
+    @property
+    def skip_ratio(self) -> float:
+        return self.skipped / self.frames if self.frames else 0.0
+
+    def score(self, frame: np.ndarray) -> float:
+        small = downscale_gray(frame, self.width)
+
+        if self.background is None or self.background.shape != small.shape:
+            self.background = small.astype(np.float32)
+            return 1.0
+
+        score = motion_score(cv2.convertScaleAbs(self.background), small)
+        cv2.accumulateWeighted(small, self.background, self.learning_rate)
+        return score
+
+    def should_detect(self, frame: np.ndarray) -> bool:
+        self.frames += 1
+
+        # Always score so the background keeps adapting to lighting changes
+        score = self.score(frame)
+        if self.active_tracks > 0 or score > self.threshold:
+            return True
+
+        self.skipped += 1
+        return False
+
+    def update_tracks(self, active_tracks: int) -> None:
+        self.active_tracks = active_tracks
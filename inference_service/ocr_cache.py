@@ -0,0 +1,224 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+def perceptual_hash(image: np.ndarray, hash_size: int = 8) -> int:
+    """
+    64-bit DCT perceptual hash of a crop, normalized to grayscale, fixed size and
+    equalized contrast so the same plate under slightly different light or scale
+    hashes close together.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    gray = cv2.equalizeHist(gray)
+    size = hash_size * 4
+    small = cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+    low = cv2.dct(small)[:hash_size, :hash_size].ravel()
+    bits = low[1:] > np.median(low[1:])
+
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+# Near-match radius for tight plate crops (a plate localizer is in use)
+PLATE_MAX_DISTANCE = 2
+
+
+class OCRCache:
+    """
+    Plate results keyed by scope (camera id) and perceptual hash. A lookup hits when
+    a stored hash of the same scope is within `max_distance` bits. Entries expire
+    after `ttl_seconds` (no-plate results after `negative_ttl_seconds`) and the least
+    recently used are dropped beyond `max_entries`. With `db_path` entries are also
+    kept in SQLite and reloaded on the next run; the table is pruned the same way
+    and writes are committed in batches every `commit_interval` seconds.
+
+    The hash only keeps the coarse layout of a crop. On a vehicle region (no plate
+    localizer) that is mostly the car's shape and colour, so two similar cars can
+    hash alike and one would be given the other's plate. The default therefore
+    only reuses exact hash matches; near matches (PLATE_MAX_DISTANCE) are meant
+    for tight plate crops only.
+    """
+
+    def __init__(
+            self,
+            max_entries: int = 1024,
+            ttl_seconds: float = 24 * 3600,
+            negative_ttl_seconds: float = 60.0,
+            max_distance: int = 0,
+            db_path: Optional[str] = None,
+            sweep_interval: float = 60.0,
+            commit_interval: float = 5.0
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.max_distance = max_distance
+        self.sweep_interval = sweep_interval
+        self.commit_interval = commit_interval
+
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.next_sweep = 0.0
+
+        self.hits = 0
+        self.misses = 0
+
+        # Rows to write / delete at the next commit, keyed by the hash column
+        self.pending_rows = {}
+        self.pending_deletes = set()
+        self.last_commit = time.time()
+
+        self.db = None
+        if db_path:
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS ocr_cache (hash TEXT PRIMARY KEY, plate TEXT, created_at REAL)"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS ocr_cache_created_at ON ocr_cache (created_at)")
+            self._load()
+
+    def _ttl(self, plate: str) -> float:
+        return self.ttl_seconds if plate else self.negative_ttl_seconds
+
+    def _expired(self, entry: Tuple[str, float], now: float) -> bool:
+        plate, created_at = entry
+        return now - created_at >= self._ttl(plate)
+
+    def _load(self) -> None:
+        now = time.time()
+        # Rows a previous run expired or evicted without cleaning up
+        self._prune_db(now)
+        self.db.execute(
+            "DELETE FROM ocr_cache WHERE hash NOT IN (SELECT hash FROM ocr_cache ORDER BY created_at DESC LIMIT ?)",
+            (self.max_entries,)
+        )
+        self.db.commit()
+
+        rows = self.db.execute("SELECT hash, plate, created_at FROM ocr_cache ORDER BY created_at").fetchall()
+        for key, plate, created_at in rows:
+            scope, _, value = key.rpartition("/")
+            self.entries[(scope or None, int(value, 16))] = (plate, created_at)
+        print(f"[OCR CACHE] Loaded {len(self.entries)} entries")
+
+    def _prune_db(self, now: float) -> None:
+        self.db.execute(
+            "DELETE FROM ocr_cache WHERE created_at < ? OR (plate = '' AND created_at < ?)",
+            (now - self.ttl_seconds, now - self.negative_ttl_seconds)
+        )
+
+    def _sweep(self, now: float) -> None:
+        """
+        Drop expired entries, at most once per `sweep_interval`; lookups skip
+        expired entries in between.
+        """
+        if now < self.next_sweep:
+            return
+        self.next_sweep = now + self.sweep_interval
+
+        expired = [key for key, entry in self.entries.items() if self._expired(entry, now)]
+        for key in expired:
+            del self.entries[key]
+        if self.db is not None:
+            self._prune_db(now)
+            self._flush(now, force=True)
+
+    def _flush(self, now: float, force: bool = False) -> None:
+        """
+        Write pending rows in one transaction, at most once per `commit_interval`.
+        """
+        if self.db is None or not (force or now - self.last_commit >= self.commit_interval):
+            return
+
+        if self.pending_deletes:
+            self.db.executemany("DELETE FROM ocr_cache WHERE hash = ?", [(key,) for key in self.pending_deletes])
+        if self.pending_rows:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO ocr_cache (hash, plate, created_at) VALUES (?, ?, ?)",
+                [(key, plate, created_at) for key, (plate, created_at) in self.pending_rows.items()]
+            )
+        self.db.commit()
+
+        self.pending_deletes.clear()
+        self.pending_rows.clear()
+        self.last_commit = now
+
+    def lookup(self, plate_im: np.ndarray, scope: Optional[str] = None) -> Tuple[tuple, Optional[str]]:
+        """
+        (key, cached plate or None). Pass the key back to store() after a miss.
+        """
+        key = (scope, perceptual_hash(plate_im))
+        now = time.time()
+
+        with self.lock:
+            self._sweep(now)
+
+            entry = self.entries.get(key)
+            match = key if entry is not None and not self._expired(entry, now) else None
+            if match is None and self.max_distance > 0:
+                best_distance = self.max_distance + 1
+                for candidate, entry in self.entries.items():
+                    if candidate[0] != scope or self._expired(entry, now):
+                        continue
+                    distance = hamming(key[1], candidate[1])
+                    if distance < best_distance:
+                        match, best_distance = candidate, distance
+
+            if match is None:
+                self.misses += 1
+                return key, None
+
+            self.hits += 1
+            self.entries.move_to_end(match)
+            return key, self.entries[match][0]
+
+    def store(self, key: tuple, plate: str) -> None:
+        now = time.time()
+        with self.lock:
+            self.entries[key] = (plate, now)
+            self.entries.move_to_end(key)
+            if self.db is not None:
+                db_key = self._db_key(key)
+                self.pending_deletes.discard(db_key)
+                self.pending_rows[db_key] = (plate, now)
+
+            while len(self.entries) > self.max_entries:
+                evicted, _ = self.entries.popitem(last=False)
+                if self.db is not None:
+                    db_key = self._db_key(evicted)
+                    self.pending_rows.pop(db_key, None)
+                    self.pending_deletes.add(db_key)
+
+            self._flush(now)
+
+    @staticmethod
+    def _db_key(key: tuple) -> str:
+        scope, value = key
+        return f"{scope}/{value:016x}" if scope is not None else f"{value:016x}"
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self) -> str:
+        return f"{self.hits} hits, {self.misses} misses ({self.hit_rate:.0%} hit rate), {len(self.entries)} entries"
+
+    def close(self) -> None:
+        with self.lock:
+            if self.db is not None:
+                self._flush(time.time(), force=True)
+                self.db.close()
+                self.db = None
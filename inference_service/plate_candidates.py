@@ -0,0 +1,112 @@
+import math
+from typing import Iterable, List, Optional
+
+import cv2
+import numpy as np
+
+# Crop quality reference points: full size score at REFERENCE_AREA pixels, half
+# sharpness score at SHARPNESS_REFERENCE Laplacian variance (on a SHARPNESS_WIDTH-wide copy)
+REFERENCE_AREA = 200 * 100
+SHARPNESS_REFERENCE = 100.0
+SHARPNESS_WIDTH = 128
+TARGET_ASPECT = 2.5
+
+
+def score_crop(crop: np.ndarray, target_aspect: float = TARGET_ASPECT) -> float:
+    """
+    Cheap quality score in [0, 1] for a plate crop: size x sharpness x aspect ratio.
+    """
+    height, width = crop.shape[:2]
+    if height < 2 or width < 2:
+        return 0.0
+
+    size_score = min(1.0, (height * width) / REFERENCE_AREA)
+
+    # Laplacian variance on a fixed-width copy, so small crops are not favoured
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    scaled_height = max(2, round(height * SHARPNESS_WIDTH / width))
+    gray = cv2.resize(gray, (SHARPNESS_WIDTH, scaled_height), interpolation=cv2.INTER_AREA)
+    sharpness = cv2.Laplacian(gray, cv2.CV_64F).var()
+    sharpness_score = sharpness / (sharpness + SHARPNESS_REFERENCE)
+
+    aspect_score = math.exp(-abs(math.log((width / height) / target_aspect)))
+
+    return size_score * sharpness_score * aspect_score
+
+
+class PlateCandidate:
+
+    def __init__(self, tracker_id: int, first_seen: float):
+        self.tracker_id = tracker_id
+        self.first_seen = first_seen
+        self.last_seen = first_seen
+        self.crop = None
+        self.score = -1.0
+        self.frame_id = None
+        self.offers = 0
+
+
+class PlateCandidateBuffer:
+    """
+    Best plate crop per violating track. Crops are offered every frame while the
+    track is over the limit, and only the highest scoring one is kept. A candidate
+    is due once its track has not been seen for `leave_grace` seconds or
+    `deadline` seconds have passed since its first crop (0 = dispatch at once).
+    """
+
+    def __init__(self, deadline: float = 2.0, leave_grace: float = 0.3):
+        self.deadline = deadline
+        self.leave_grace = leave_grace
+        self.candidates = {}
+
+        self.offered = 0
+        self.dispatched = 0
+
+    def __len__(self) -> int:
+        return len(self.candidates)
+
+    def __contains__(self, tracker_id: int) -> bool:
+        return tracker_id in self.candidates
+
+    def offer(self, tracker_id: int, crop: np.ndarray, frame_id: int, timestamp: float) -> bool:
+        """
+        Score `crop` and keep a copy if it beats the track's best. Returns True if kept.
+        """
+        candidate = self.candidates.get(tracker_id)
+        if candidate is None:
+            candidate = self.candidates[tracker_id] = PlateCandidate(tracker_id, timestamp)
+
+        candidate.last_seen = timestamp
+        candidate.offers += 1
+        self.offered += 1
+
+        score = score_crop(crop)
+        if score <= candidate.score:
+            return False
+
+        candidate.crop = crop.copy()
+        candidate.score = score
+        candidate.frame_id = frame_id
+        return True
+
+    def due(self, now: float, active_tracker_ids: Optional[Iterable[int]] = None) -> List[PlateCandidate]:
+        """
+        Pop and return the candidates whose track left or whose deadline passed.
+        """
+        active = set(active_tracker_ids) if active_tracker_ids is not None else set()
+
+        ready = []
+        for tracker_id, candidate in self.candidates.items():
+            left = tracker_id not in active and now - candidate.last_seen >= self.leave_grace
+            if left or now - candidate.first_seen >= self.deadline:
+                ready.append(tracker_id)
+
+        return self._pop(ready)
+
+    def flush(self) -> List[PlateCandidate]:
+        return self._pop(list(self.candidates))
+
+    def _pop(self, tracker_ids: List[int]) -> List[PlateCandidate]:
+        popped = [self.candidates.pop(tracker_id) for tracker_id in tracker_ids]
+        self.dispatched += len(popped)
+        return popped
@@ -0,0 +1,180 @@
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Vietnamese plates: one-row ~4.7:1 (520x110 mm), two-row ~2:1 (330x165 mm); allow for perspective
+MIN_ASPECT = 1.2
+MAX_ASPECT = 6.5
+MIN_AREA_FRACTION = 0.004
+MAX_AREA_FRACTION = 0.3
+MAX_TILT_DEGREES = 30
+
+
+def order_box_points(points: np.ndarray) -> np.ndarray:
+    """
+    Corners as top-left, top-right, bottom-right, bottom-left.
+    """
+    points = points.astype(np.float32)
+    sums = points.sum(axis=1)
+    diffs = np.diff(points, axis=1).ravel()
+    return np.array([
+        points[np.argmin(sums)],
+        points[np.argmin(diffs)],
+        points[np.argmax(sums)],
+        points[np.argmax(diffs)],
+    ], dtype=np.float32)
+
+
+def warp_box(image: np.ndarray, box: np.ndarray) -> np.ndarray:
+    """
+    Deskewed crop of the rotated rectangle `box` (4 corner points).
+    """
+    tl, tr, br, bl = order_box_points(box)
+    width = int(round(max(np.linalg.norm(tr - tl), np.linalg.norm(br - bl))))
+    height = int(round(max(np.linalg.norm(bl - tl), np.linalg.norm(br - tr))))
+    if width < 2 or height < 2:
+        return image[0:0, 0:0]
+
+    target = np.array([[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]], dtype=np.float32)
+    matrix = cv2.getPerspectiveTransform(np.array([tl, tr, br, bl]), target)
+    return cv2.warpPerspective(image, matrix, (width, height), flags=cv2.INTER_LINEAR)
+
+
+class PlateLocalizer:
+    """
+    Tight, deskewed plate crop from a vehicle region.
+
+    Without a model it uses a classical localizer: black-hat + horizontal Sobel to
+    find dense character strokes, a wide closing to merge them into blobs, and the
+    best plate-shaped minAreaRect. With `model_path` (a YOLO plate detector) the
+    highest-confidence box is taken instead and then deskewed the same way.
+    localize() returns None when nothing plate-like is found.
+    """
+
+    def __init__(self, model_path: Optional[str] = None, conf_thres: float = 0.25, pad: float = 0.1):
+        self.model_path = model_path
+        self.conf_thres = conf_thres
+        self.pad = pad
+        self.model = None
+
+        self.calls = 0
+        self.found = 0
+        self.input_pixels = 0
+        self.output_pixels = 0
+
+        if model_path:
+            from ultralytics import YOLO
+            self.model = YOLO(model_path)
+
+    def _candidate_box(self, region: np.ndarray) -> Optional[Tuple[np.ndarray, float]]:
+        gray = cv2.cvtColor(region, cv2.COLOR_BGR2GRAY) if region.ndim == 3 else region
+        height, width = gray.shape[:2]
+        area = height * width
+
+        kernel_size = max(3, (width // 40) | 1)
+        blackhat = cv2.morphologyEx(
+            gray, cv2.MORPH_BLACKHAT, cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_size * 3, kernel_size))
+        )
+        # Dark characters on a light plate; also look for light-on-dark plates
+        tophat = cv2.morphologyEx(
+            gray, cv2.MORPH_TOPHAT, cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_size * 3, kernel_size))
+        )
+        strokes = cv2.max(blackhat, tophat)
+
+        gradient = np.abs(cv2.Sobel(strokes, cv2.CV_32F, 1, 0, ksize=3))
+        gradient = cv2.normalize(gradient, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+        gradient = cv2.GaussianBlur(gradient, (5, 5), 0)
+
+        _, mask = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+        mask = cv2.morphologyEx(
+            mask, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_size * 2, max(3, kernel_size // 2)))
+        )
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
+
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        best = None
+        for contour in contours:
+            rect = cv2.minAreaRect(contour)
+            (cx, cy), (w, h), angle = rect
+            if w < 2 or h < 2:
+                continue
+
+            long_side, short_side = max(w, h), min(w, h)
+            aspect = long_side / short_side
+            area_fraction = (w * h) / area
+            if not (MIN_ASPECT <= aspect <= MAX_ASPECT and MIN_AREA_FRACTION <= area_fraction <= MAX_AREA_FRACTION):
+                continue
+
+            # Tilt of the long side from horizontal
+            tilt = angle if w >= h else angle - 90
+            tilt = (tilt + 90) % 180 - 90
+            if abs(tilt) > MAX_TILT_DEGREES:
+                continue
+
+            fill = cv2.contourArea(contour) / (w * h)
+            # Plates sit low and central on the vehicle
+            centrality = 1 - abs(cx / width - 0.5)
+            score = fill * centrality * (0.5 + cy / height) * np.sqrt(area_fraction)
+            if best is None or score > best[1]:
+                best = (cv2.boxPoints(rect), score)
+
+        return best
+
+    def _padded(self, box: np.ndarray, region_shape) -> np.ndarray:
+        center = box.mean(axis=0)
+        box = center + (box - center) * (1 + self.pad)
+        height, width = region_shape[:2]
+        return np.clip(box, [0, 0], [width - 1, height - 1])
+
+    def _localize_with_model(self, region: np.ndarray) -> Optional[np.ndarray]:
+        result = self.model(region, conf=self.conf_thres, verbose=False)[0]
+        if result.boxes is None or len(result.boxes) == 0:
+            return None
+
+        best = int(result.boxes.conf.argmax())
+        x1, y1, x2, y2 = result.boxes.xyxy[best].cpu().numpy()
+        pad_x, pad_y = (x2 - x1) * self.pad, (y2 - y1) * self.pad
+        x1, y1 = max(0, int(x1 - pad_x)), max(0, int(y1 - pad_y))
+        x2, y2 = min(region.shape[1], int(x2 + pad_x)), min(region.shape[0], int(y2 + pad_y))
+        plate = region[y1:y2, x1:x2]
+
+        # Straighten the detected plate with the classical box when it finds one
+        candidate = self._candidate_box(plate)
+        if candidate is not None:
+            warped = warp_box(plate, self._padded(candidate[0], plate.shape))
+            if warped.size:
+                return warped
+        return plate
+
+    def localize(self, region: np.ndarray) -> Optional[np.ndarray]:
+        if region is None or region.size == 0:
+            return None
+
+        self.calls += 1
+        if self.model is not None:
+            plate = self._localize_with_model(region)
+        else:
+            candidate = self._candidate_box(region)
+            plate = warp_box(region, self._padded(candidate[0], region.shape)) if candidate is not None else None
+
+        if plate is None or plate.size == 0:
+            return None
+
+        self.found += 1
+        self.input_pixels += region.shape[0] * region.shape[1]
+        self.output_pixels += plate.shape[0] * plate.shape[1]
+        return plate
+
+    def crop(self, region: np.ndarray) -> np.ndarray:
+        """
+        Localized plate, or the region itself when no plate is found.
+        """
+        plate = self.localize(region)
+        return plate if plate is not None else region
+
+    def summary(self) -> str:
+        ratio = self.output_pixels / self.input_pixels if self.input_pixels else 0.0
+        return (f"plates localized {self.found}/{self.calls}, "
+                f"crop size {ratio:.0%} of the vehicle region")
@@ -1,115 +1,491 @@
 import numpy as np
 import supervision as sv
 import cv2
-from typing import List
+from typing import List, Optional
 import re
 import os
+import json
+import math
+import time
 import base64
+import threading
 
+import httpx
 from openai import OpenAI
 from dotenv import load_dotenv
 
 load_dotenv()
 
-API_BASE_URL = "https://api.tokenfactory.nebius.com/v1/"
-MODEL_NAME = "nvidia/Nemotron-Nano-V2-12b"
+API_BASE_URL = os.environ.get("VLM_BASE_URL", "https://api.tokenfactory.nebius.com/v1/")
+MODEL_NAME = os.environ.get("VLM_MODEL", "nvidia/Nemotron-Nano-V2-12b")
 API_KEY = os.environ.get("API_KEY")
 
+REQUEST_TIMEOUT = float(os.environ.get("VLM_TIMEOUT", 30.0))
+CONNECT_TIMEOUT = float(os.environ.get("VLM_CONNECT_TIMEOUT", 5.0))
+MAX_CONNECTIONS = int(os.environ.get("VLM_MAX_CONNECTIONS", 8))
+MAX_RETRIES = int(os.environ.get("VLM_MAX_RETRIES", 2))
+
+# 0 keeps the crop size: without a plate localizer the crop is the whole vehicle
+# region, and shrinking that to ~100 px leaves the plate characters unreadable
+PLATE_HEIGHT = int(os.environ.get("OCR_PLATE_HEIGHT", 0))
+MAX_PAYLOAD_BYTES = int(os.environ.get("OCR_MAX_BYTES", 24_000))
+
+
+SYSTEM_PROMPT = (
+    "You are a STRICT, expert, and highly efficient ALPR processor. "
+    "Your output MUST be ONLY one single string containing the license plate characters. "
+    "You must NOT include ANY explanatory text, formatting, or analysis (like 'Okay, the plate is...'). "
+    "If you successfully read the plate, output the raw characters (letters and numbers) without spaces or hyphens. "
+    "If no plate is clearly visible, output ONLY the text 'NO_PLATE'."
+)
+
+USER_PROMPT = "Identify the license plate number from the provided image. Output ONLY the raw characters (letters and numbers)."
+
+
+BATCH_SYSTEM_PROMPT = (
+    "You are a STRICT, expert, and highly efficient ALPR processor. "
+    "You receive several license plate images, each labeled with a number. "
+    "Your output MUST be ONLY one JSON object mapping every label to the plate characters "
+    "(letters and numbers, without spaces or hyphens), for example {\"1\": \"51F12345\", \"2\": \"NO_PLATE\"}. "
+    "Use 'NO_PLATE' for a label whose plate is not clearly visible. Do NOT add any other text."
+)
+
+MOSAIC_TILE_SIZE = (320, 120)
+MOSAIC_LABEL_HEIGHT = 28
+
+
+class PayloadEncoder:
+    """
+    Shrinks plate crops before they are sent to the VLM.
+
+    prepare() scales a crop to `target_height` pixels (0 keeps the size; only use it
+    on tight plate crops) and can convert it to grayscale and/or apply CLAHE.
+    encode() binary-searches the highest JPEG quality in [min_quality, max_quality]
+    whose output fits `max_bytes` per crop (0 disables the search and uses
+    max_quality); if even min_quality is too large the image is downscaled until it
+    fits or reaches `min_height`.
+    """
+
+    def __init__(
+            self,
+            target_height: int = PLATE_HEIGHT,
+            max_bytes: int = MAX_PAYLOAD_BYTES,
+            grayscale: bool = False,
+            clahe: bool = False,
+            min_quality: int = 30,
+            max_quality: int = 90,
+            min_height: int = 32
+    ):
+        self.target_height = target_height
+        self.max_bytes = max_bytes
+        self.grayscale = grayscale
+        self.clahe = clahe
+        self.min_quality = min_quality
+        self.max_quality = max_quality
+        self.min_height = min_height
+
+    def prepare(self, image: np.ndarray) -> np.ndarray:
+        if image.size == 0:
+            return image
+
+        height, width = image.shape[:2]
+        if self.target_height and height != self.target_height:
+            scale = self.target_height / height
+            interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+            image = cv2.resize(image, (max(1, round(width * scale)), self.target_height), interpolation=interpolation)
+
+        if self.grayscale and image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+        if self.clahe:
+            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(4, 4))
+            if image.ndim == 2:
+                image = clahe.apply(image)
+            else:
+                lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
+                lab[:, :, 0] = clahe.apply(lab[:, :, 0])
+                image = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
+
+        return image
+
+    @staticmethod
+    def _jpeg(image: np.ndarray, quality: int) -> bytes:
+        _, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return buffer.tobytes()
+
+    def encode(self, image: np.ndarray, crops: int = 1) -> bytes:
+        """
+        JPEG of an image holding `crops` plate crops (e.g. a mosaic), within crops * max_bytes.
+        """
+        max_bytes = self.max_bytes * crops
+        data = self._jpeg(image, self.max_quality)
+        if not max_bytes or len(data) <= max_bytes:
+            return data
+
+        while True:
+            low, high = self.min_quality, self.max_quality - 1
+            best = None
+            while low <= high:
+                quality = (low + high) // 2
+                candidate = self._jpeg(image, quality)
+                if len(candidate) <= max_bytes:
+                    best, low = candidate, quality + 1
+                else:
+                    data, high = candidate, quality - 1
+            if best is not None:
+                return best
+
+            # Still over budget at min_quality: trade resolution instead
+            height, width = image.shape[:2]
+            if height * 0.75 < self.min_height:
+                return data
+            image = cv2.resize(image, (max(1, round(width * 0.75)), round(height * 0.75)), interpolation=cv2.INTER_AREA)
+
+
+def image_part(image: np.ndarray, encoder: Optional[PayloadEncoder] = None, crops: int = 1) -> dict:
+    if encoder is not None:
+        data = encoder.encode(image, crops)
+    else:
+        _, buffer = cv2.imencode('.jpg', image)
+        data = buffer.tobytes()
+    base64_data = base64.b64encode(data).decode("utf-8")
+    return {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_data}"}}
+
+
+def payload_bytes(messages: list) -> int:
+    """
+    Size of the base64 image data in a chat request.
+    """
+    total = 0
+    for message in messages:
+        if isinstance(message["content"], list):
+            total += sum(len(part["image_url"]["url"]) for part in message["content"] if part["type"] == "image_url")
+    return total
+
+
+def build_plate_messages(plate_im: np.ndarray, encoder: Optional[PayloadEncoder] = None) -> list:
+    """
+    Chat messages asking the VLM to read one plate crop.
+    """
+    human_content = [
+        {"type": "text", "text": USER_PROMPT},
+        image_part(plate_im, encoder)
+    ]
+
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": human_content}
+    ]
+
+
+def build_mosaic(plate_ims: List[np.ndarray], tile_size=MOSAIC_TILE_SIZE) -> np.ndarray:
+    """
+    Grid of plate crops, each letterboxed into a tile under a numbered label (1..K).
+    """
+    tile_width, tile_height = tile_size
+    columns = math.ceil(math.sqrt(len(plate_ims)))
+    rows = math.ceil(len(plate_ims) / columns)
+    cell_height = tile_height + MOSAIC_LABEL_HEIGHT
+
+    mosaic = np.full((rows * cell_height, columns * tile_width, 3), 255, dtype=np.uint8)
+    for index, plate_im in enumerate(plate_ims):
+        row, column = divmod(index, columns)
+        x, y = column * tile_width, row * cell_height
+
+        cv2.putText(mosaic, str(index + 1), (x + 6, y + MOSAIC_LABEL_HEIGHT - 7),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2, cv2.LINE_AA)
+        cv2.rectangle(mosaic, (x, y), (x + tile_width - 1, y + cell_height - 1), (0, 0, 0), 1)
+
+        if plate_im.size == 0:
+            continue
+        if plate_im.ndim == 2:
+            plate_im = cv2.cvtColor(plate_im, cv2.COLOR_GRAY2BGR)
+
+        height, width = plate_im.shape[:2]
+        scale = min((tile_width - 4) / width, (tile_height - 4) / height)
+        resized = cv2.resize(plate_im, (max(1, int(width * scale)), max(1, int(height * scale))))
+        top = y + MOSAIC_LABEL_HEIGHT + (tile_height - resized.shape[0]) // 2
+        left = x + (tile_width - resized.shape[1]) // 2
+        mosaic[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+
+    return mosaic
+
+
+def build_batch_messages(
+        plate_ims: List[np.ndarray],
+        layout: str = "images",
+        encoder: Optional[PayloadEncoder] = None
+) -> list:
+    """
+    One request for several crops: separate numbered image parts ("images") or one
+    labeled grid ("mosaic"). The answer is a JSON object keyed by label.
+    """
+    count = len(plate_ims)
+    if layout == "mosaic":
+        human_content = [
+            {"type": "text", "text": f"The image is a grid of {count} plate crops, each numbered in its top-left corner."},
+            image_part(build_mosaic(plate_ims), encoder, crops=count)
+        ]
+    else:
+        human_content = []
+        for label, plate_im in enumerate(plate_ims, start=1):
+            human_content.append({"type": "text", "text": f"Image {label}:"})
+            human_content.append(image_part(plate_im, encoder))
 
-class PlateReader:
+    human_content.append({"type": "text", "text": f"Return the JSON object for labels 1 to {count}."})
 
-    def __init__(self):
-        if not API_KEY:
-            raise EnvironmentError("API_KEY is not set.")
+    return [
+        {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+        {"role": "user", "content": human_content}
+    ]
 
-        self.client = OpenAI(
-            base_url=API_BASE_URL,
-            api_key=API_KEY
-        )
-        print(f"VLM API Client initialized for {MODEL_NAME}.")
 
-    def preprocess_plate_image(self, plate_im: np.ndarray) -> np.ndarray:
-        return plate_im
+def parse_batch_response(raw_response_content: str, count: int) -> List[Optional[str]]:
+    """
+    Raw plate text per label from a batch answer; "" for NO_PLATE and None where the
+    answer is missing or unusable (the caller retries that crop on its own).
+    """
+    if not raw_response_content:
+        return [None] * count
 
-    def _recognize_plate_via_vlm(self, plate_im: np.ndarray) -> str:
+    text = raw_response_content.split("</think>")[-1]
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    if not match:
+        return [None] * count
 
-        _, buffer = cv2.imencode('.jpg', plate_im)
-        base64_data = base64.b64encode(buffer).decode("utf-8")
+    try:
+        answers = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return [None] * count
+    if not isinstance(answers, dict):
+        return [None] * count
 
-        system_prompt = (
-            "You are a STRICT, expert, and highly efficient ALPR processor. "
-            "Your output MUST be ONLY one single string containing the license plate characters. "
-            "You must NOT include ANY explanatory text, formatting, or analysis (like 'Okay, the plate is...'). "
-            "If you successfully read the plate, output the raw characters (letters and numbers) without spaces or hyphens. "
-            "If no plate is clearly visible, output ONLY the text 'NO_PLATE'."
-        )
+    results = []
+    for label in range(1, count + 1):
+        value = answers.get(str(label))
+        results.append(parse_plate_response(value) if isinstance(value, str) else None)
+    return results
 
-        user_prompt = "Identify the license plate number from the provided image. STRICTLY follow the output format guidelines."
 
-        human_content = [
-            {"type": "text",
-             "text": "Identify the license plate number from the provided image. Output ONLY the raw characters (letters and numbers)."},
-            {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_data}"}}
-        ]
+def parse_plate_response(raw_response_content: str) -> str:
+    """
+    Plate characters from a VLM answer (drops reasoning before </think>), "" for NO_PLATE.
+    """
+    if not raw_response_content:
+        return ""
 
-        try:
-            response = self.client.chat.completions.create(
-                model=MODEL_NAME,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": human_content}
-                ]
-            )
+    pattern = r'(?:</think>\s*)([A-Z0-9\s.-]+)'
+    match = re.search(pattern, raw_response_content, re.IGNORECASE | re.DOTALL)
+    if match:
+        raw_text = match.group(1).split('\n')[0].strip()
+    else:
+        raw_text = raw_response_content.strip()
 
-            if response.choices:
-                raw_response_content = response.choices[0].message.content
-                pattern = r'(?:</think>\s*)([A-Z0-9\s.-]+)'
-                match = re.search(pattern, raw_response_content, re.IGNORECASE | re.DOTALL)
-                if match:
-                    raw_text = match.group(1).split('\n')[0].strip()
-                else:
-                    raw_text = raw_response_content.strip()
+    if raw_text.strip().upper() == 'NO_PLATE':
+        return ""
+
+    return raw_text.strip()
+
+
+PLATE_CHARS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+
+# Vietnamese plates: 2-digit province code, series letter, 4-5 digits
+PLATE_PATTERNS = [
+    r'(\d{2}[A-Z])-?(\d{4,5})',
+    r'(\d{2})-?([A-Z]\d{4,5})',
+    r'(\d{2}[A-Z])(\d{4,5})'
+]
+
+
+def normalize_plate_text(text: str) -> str:
+    text = text.replace(' ', '').replace('-', '')
+
+    allowed = set(PLATE_CHARS)
+    return "".join(c for c in text if c in allowed)
+
+
+def match_plate_pattern(text: str) -> str:
+    """
+    Formatted plate (e.g. "51F-12345") if the text matches a Vietnamese plate pattern, else "".
+    """
+    text = normalize_plate_text(text)
+
+    for pattern in PLATE_PATTERNS:
+        match = re.match(pattern, text)
+        if match:
+            if len(match.groups()) == 2:
+                return f"{match.group(1)}-{match.group(2)}"
+
+    return ""
+
+
+def clean_plate_text(text: str) -> str:
+    plate = match_plate_pattern(text)
+    if plate:
+        return plate
+
+    text = normalize_plate_text(text)
+    return text if len(text) >= 5 else ""
 
-                if raw_text.strip().upper() == 'NO_PLATE':
-                    return ""
 
-                return raw_text.strip()
+class PlateReader:
+    """
+    VLM plate reader. The underlying HTTP client keeps connections alive, so build
+    one reader and reuse it (see get_plate_reader); it is safe to share between
+    threads, with up to `max_connections` requests in flight.
+    """
+
+    def __init__(
+            self,
+            timeout: float = REQUEST_TIMEOUT,
+            connect_timeout: float = CONNECT_TIMEOUT,
+            max_connections: int = MAX_CONNECTIONS,
+            max_retries: int = MAX_RETRIES,
+            cache=None,
+            encoder: Optional[PayloadEncoder] = None
+    ):
+        if not API_KEY:
+            raise EnvironmentError("API_KEY is not set.")
+
+        # Optional OCRCache: near-identical crops reuse an earlier result
+        self.cache = cache
+        self.encoder = encoder or PayloadEncoder()
+
+        self.http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections
+            ),
+            timeout=httpx.Timeout(timeout, connect=connect_timeout)
+        )
+        self.client = OpenAI(
+            base_url=API_BASE_URL,
+            api_key=API_KEY,
+            http_client=self.http_client,
+            max_retries=max_retries
+        )
+        print(f"VLM API Client initialized for {MODEL_NAME} "
+              f"(timeout {timeout}s, {max_connections} pooled connections).")
+
+    def close(self) -> None:
+        self.client.close()
+
+    def preprocess_plate_image(self, plate_im: np.ndarray) -> np.ndarray:
+        return self.encoder.prepare(plate_im)
+
+    def _complete(self, messages: list, crops: int = 1):
+        start = time.perf_counter()
+        response = self.client.chat.completions.create(model=MODEL_NAME, messages=messages)
+        print(f"[OCR PAYLOAD] {crops} crop(s), {payload_bytes(messages) / 1024:.1f} KB sent, "
+              f"{(time.perf_counter() - start) * 1000:.0f} ms")
+        return response
+
+    def _recognize_plate_via_vlm(self, plate_im: np.ndarray) -> Optional[str]:
+        """
+        Raw answer text ("" for NO_PLATE), None if the request failed.
+        """
+        try:
+            plate_im = self.preprocess_plate_image(plate_im)
+            response = self._complete(build_plate_messages(plate_im, self.encoder))
+
+            if response.choices:
+                return parse_plate_response(response.choices[0].message.content)
 
             return ""
 
         except Exception as e:
             print(f"LỖI VLM API: {e}")
-            return ""
-
-    def clean_plate_text(self, text: str) -> str:
-        text = text.replace(' ', '').replace('-', '')
+            return None
 
-        allowed = set("ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789")
-        text = "".join(c for c in text if c in allowed)
+    def _recognize_plates_via_vlm(self, plate_ims: List[np.ndarray], layout: str = "images") -> List[Optional[str]]:
+        try:
+            plate_ims = [self.preprocess_plate_image(plate_im) for plate_im in plate_ims]
+            response = self._complete(build_batch_messages(plate_ims, layout, self.encoder), len(plate_ims))
+            content = response.choices[0].message.content if response.choices else ""
+        except Exception as e:
+            print(f"LỖI VLM API: {e}")
+            return [None] * len(plate_ims)
 
-        patterns = [
-            r'(\d{2}[A-Z])-?(\d{4,5})',
-            r'(\d{2})-?([A-Z]\d{4,5})',
-            r'(\d{2}[A-Z])(\d{4,5})'
-        ]
+        return parse_batch_response(content, len(plate_ims))
 
-        for pattern in patterns:
-            match = re.match(pattern, text)
-            if match:
-                if len(match.groups()) == 2:
-                    return f"{match.group(1)}-{match.group(2)}"
+    def clean_plate_text(self, text: str) -> str:
+        return clean_plate_text(text)
+
+    def _recognize_plates(self, plate_ims: List[np.ndarray], layout: str = "images") -> List[Optional[str]]:
+        """
+        Raw text per crop, None where the batch answer could not be used.
+        """
+        if len(plate_ims) == 1:
+            return [self._recognize_plate(plate_ims[0])]
+        return self._recognize_plates_via_vlm(plate_ims, layout)
+
+    def read_plates(
+            self, plate_ims: List[np.ndarray], layout: str = "images", scopes: Optional[List[str]] = None
+    ) -> List[str]:
+        """
+        Read several crops with one VLM request. Crops whose answer cannot be parsed
+        fall back to a single-image request. `scopes` (camera id per crop) keep
+        cache hits within the same camera.
+        """
+        plates = [None] * len(plate_ims)
+        keys = {}
+
+        for index, plate_im in enumerate(plate_ims):
+            if self.cache is not None and plate_im.size > 0:
+                keys[index], plates[index] = self.cache.lookup(plate_im, scopes[index] if scopes else None)
+
+        pending = [index for index, plate in enumerate(plates) if plate is None]
+        texts = self._recognize_plates([plate_ims[index] for index in pending], layout) if pending else []
+
+        fallbacks = 0
+        for index, text in zip(pending, texts):
+            if text is None:
+                fallbacks += 1
+                text = self._recognize_plate_via_vlm(plate_ims[index])
+            plates[index] = self.clean_plate_text(text) if text else ""
+
+            # A failed request is not an answer: leave it out of the cache so the crop is retried
+            if index in keys and text is not None:
+                self.cache.store(keys[index], plates[index])
+
+        print(f"[OCR BATCH] {len(plate_ims)} crops, {len(pending)} recognized together, "
+              f"{fallbacks} retried alone")
+        return plates
+
+    def _recognize_plate(self, plate_im: np.ndarray) -> Optional[str]:
+        """
+        Raw plate text for a crop, None if the VLM request failed. Subclasses put
+        cheaper recognizers in front of the VLM here.
+        """
+        return self._recognize_plate_via_vlm(plate_im)
+
+    def read_plate(self, plate_im: np.ndarray, scope: Optional[str] = None) -> str:
+        if self.cache is None or plate_im.size == 0:
+            return self._read_plate(plate_im) or ""
+
+        key, plate_number = self.cache.lookup(plate_im, scope)
+        if plate_number is not None:
+            print(f"[OCR CACHE] Hit: {plate_number or 'NO_PLATE'}")
+            return plate_number
+
+        plate_number = self._read_plate(plate_im)
+        if plate_number is None:
+            return ""
+        self.cache.store(key, plate_number)
+        return plate_number
 
-        return text if len(text) >= 5 else ""
+    def _read_plate(self, plate_im: np.ndarray) -> Optional[str]:
 
-    def read_plate(self, plate_im: np.ndarray) -> str:
+        text = self._recognize_plate(plate_im)
 
-        text = self._recognize_plate_via_vlm(plate_im)
+        if text is None:
+            return None
 
         if not text:
-            print("[OCR RAW] VLM API returned no results or 'NO_PLATE'.")
+            print("[OCR RAW] Recognizer returned no results or 'NO_PLATE'.")
             return ""
 
-        print(f"[OCR RAW] Full recognized string (VLM API): {text}")
+        print(f"[OCR RAW] Full recognized string: {text}")
 
         plate_number = self.clean_plate_text(text)
 
@@ -120,6 +496,26 @@ class PlateReader:
         return plate_number
 
 
+_shared_reader = None
+_shared_reader_lock = threading.Lock()
+
+
+def get_plate_reader(tiered: bool = False, **kwargs) -> PlateReader:
+    """
+    Process-wide PlateReader, created on first use. `tiered` (local OCR first, VLM
+    fallback) and kwargs only apply to that first call.
+    """
+    global _shared_reader
+    with _shared_reader_lock:
+        if _shared_reader is None:
+            if tiered:
+                from inference_service.tiered_ocr import TieredPlateReader
+                _shared_reader = TieredPlateReader(**kwargs)
+            else:
+                _shared_reader = PlateReader(**kwargs)
+        return _shared_reader
+
+
 def extract_plate_region(
         frame: np.ndarray,
         bbox: np.ndarray,
@@ -146,12 +542,12 @@ def extract_and_read_plate(
         frame: np.ndarray,
         detections: sv.Detections,
         labels: List[str],
-        speed_threshold: int = 60
+        speed_threshold: int = 60,
+        reader: Optional[PlateReader] = None,
+        localizer=None
 ) -> List[str]:
     updated_labels = labels[:]
 
-    reader = PlateReader()
-
     for i, (tracker_id, label) in enumerate(zip(detections.tracker_id, labels)):
         if "km/h" in label:
             try:
@@ -160,8 +556,12 @@ def extract_and_read_plate(
                 if speed > speed_threshold:
                     bbox = detections.xyxy[i]
                     plate_im = extract_plate_region(frame, bbox)
+                    if localizer is not None:
+                        plate_im = localizer.crop(plate_im)
 
                     print(f"Extracting plate from vehicle #{tracker_id} with speed {speed} km/h")
+                    if reader is None:
+                        reader = get_plate_reader()
                     plate_number = reader.read_plate(plate_im)
 
                     if plate_number:
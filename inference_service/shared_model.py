@@ -0,0 +1,114 @@
+import queue
+import threading
+import time
+from collections import defaultdict
+
+
+class _Request:
+
+    def __init__(self, frames: list, kwargs: dict):
+        self.frames = frames
+        self.kwargs = kwargs
+        self.results = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class SharedModel:
+    """
+    Thread-safe front for one YOLO model used by many cameras.
+
+    Calls from different threads that arrive within `max_wait_ms` of each other are
+    merged into one batched forward pass (per set of call kwargs, e.g. ROI imgsz),
+    and each caller gets back only the results for its own frames. It can be passed
+    anywhere a YOLO model is expected by process_detection.
+    """
+
+    def __init__(self, model, max_batch_size: int = 16, max_wait_ms: float = 5.0):
+        self.model = model
+        self.names = model.names
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self.forward_passes = 0
+        self.frames_processed = 0
+
+        self._requests = queue.Queue()
+        self._worker = threading.Thread(target=self._serve, name="shared-model", daemon=True)
+        self._worker.start()
+
+    def __call__(self, source, **kwargs):
+        frames = source if isinstance(source, list) else [source]
+        request = _Request(frames, kwargs)
+        self._requests.put(request)
+        request.done.wait()
+
+        if request.error is not None:
+            raise request.error
+        return request.results
+
+    @property
+    def average_batch_size(self) -> float:
+        return self.frames_processed / self.forward_passes if self.forward_passes else 0.0
+
+    def _collect(self, first: _Request) -> tuple:
+        pending = [first]
+        count = len(first.frames)
+        deadline = time.perf_counter() + self.max_wait
+        stopping = False
+
+        while count < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self._requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                stopping = True
+                break
+            pending.append(request)
+            count += len(request.frames)
+
+        return pending, stopping
+
+    def _run(self, requests: list) -> None:
+        groups = defaultdict(list)
+        for request in requests:
+            groups[tuple(sorted(request.kwargs.items()))].append(request)
+
+        for key, group in groups.items():
+            frames = [frame for request in group for frame in request.frames]
+            try:
+                results = self.model(frames, **dict(key))
+            except Exception as e:
+                for request in group:
+                    request.error = e
+                    request.done.set()
+                continue
+
+            self.forward_passes += 1
+            self.frames_processed += len(frames)
+
+            offset = 0
+            for request in group:
+                request.results = results[offset:offset + len(request.frames)]
+                offset += len(request.frames)
+                request.done.set()
+
+    def _serve(self) -> None:
+        while True:
+            first = self._requests.get()
+            if first is None:
+                break
+
+            requests, stopping = self._collect(first)
+            self._run(requests)
+
+            if stopping:
+                break
+
+    def close(self) -> None:
+        self._requests.put(None)
+        self._worker.join()
@@ -1,43 +1,260 @@
-from collections import defaultdict, deque
+from typing import List, Optional, Tuple
+
 import numpy as np
 import supervision as sv
 from inference_service.detector import ViewTransformer
 
+SPEED_MODES = ("endpoint", "lstsq", "kalman")
+
 
 class SpeedEstimator:
+    """
+    Per-track world positions (ViewTransformer output) kept in a preallocated NumPy
+    ring buffer, one row per track slot. estimate() updates every track of a frame
+    and computes all speeds in one vectorized pass; update_and_estimate() keeps the
+    label API.
+
+    Modes:
+      endpoint  distance between the first and last y sample of the window
+      lstsq     least-squares 2D velocity over the whole window
+      kalman    constant-velocity Kalman filter per track
+
+    lstsq and kalman also report a confidence in [0, 1] from the velocity's
+    standard error relative to the speed; endpoint reports 1 once a track has
+    enough samples.
+    """
+
+    def __init__(
+            self,
+            view_transformer: ViewTransformer,
+            fps: float,
+            max_tracks: int = 256,
+            mode: str = "endpoint",
+            process_noise: float = 50.0,
+            measurement_noise: float = 1.0,
+    ):
+        if mode not in SPEED_MODES:
+            raise ValueError(f"Unknown speed mode '{mode}', expected one of {SPEED_MODES}")
 
-    def __init__(self, view_transformer: ViewTransformer, fps: float):
         self.view_transformer = view_transformer
         self.fps = fps
-        self.coordinates = defaultdict(lambda: deque(maxlen=int(fps)))
+        self.mode = mode
+        self.window = max(int(fps), 1)
         self.min_frames_for_speed = max(int(self.fps / 10), 3)
         self.meter_per_pixel = 0.14
 
-    def update_and_estimate(self, detections: sv.Detections) -> list[str]:
-        print(f"[SpeedEstimator FPS] FPS {self.fps}")
+        # Kalman noise, in world units: acceleration spectral density and position variance
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+
+        self.frame_count = 0
+        self.slots = {}
+        self.free_slots = list(range(max_tracks - 1, -1, -1))
+        self.history = np.zeros((max_tracks, self.window, 2), dtype=np.float32)
+        self.times = np.zeros((max_tracks, self.window), dtype=np.float64)
+        self.counts = np.zeros(max_tracks, dtype=np.int32)
+        self.heads = np.zeros(max_tracks, dtype=np.int32)
+
+        # Kalman state [x, y, vx, vy] and covariance per slot
+        self.kf_state = np.zeros((max_tracks, 4), dtype=np.float64)
+        self.kf_cov = np.zeros((max_tracks, 4, 4), dtype=np.float64)
+
+    @property
+    def capacity(self) -> int:
+        return self.history.shape[0]
+
+    @property
+    def bytes_per_track(self) -> int:
+        arrays = (self.history, self.times, self.counts, self.heads, self.kf_state, self.kf_cov)
+        return sum(array[0:1].nbytes for array in arrays)
+
+    def _grow(self) -> None:
+        old_capacity = self.capacity
+        new_capacity = old_capacity * 2
+
+        self.history = np.concatenate([self.history, np.zeros_like(self.history)])
+        self.times = np.concatenate([self.times, np.zeros_like(self.times)])
+        self.counts = np.concatenate([self.counts, np.zeros_like(self.counts)])
+        self.heads = np.concatenate([self.heads, np.zeros_like(self.heads)])
+        self.kf_state = np.concatenate([self.kf_state, np.zeros_like(self.kf_state)])
+        self.kf_cov = np.concatenate([self.kf_cov, np.zeros_like(self.kf_cov)])
+        self.free_slots.extend(range(new_capacity - 1, old_capacity - 1, -1))
+
+    def _slot(self, tracker_id: int) -> int:
+        slot = self.slots.get(tracker_id)
+        if slot is None:
+            if not self.free_slots:
+                self._grow()
+            slot = self.free_slots.pop()
+            self.slots[tracker_id] = slot
+            self.counts[slot] = 0
+            self.heads[slot] = 0
+        return slot
+
+    def evict(self, tracker_ids: List[int]) -> int:
+        """
+        Release the slots of `tracker_ids` for reuse. Returns the bytes released.
+        """
+        freed = 0
+        for tracker_id in tracker_ids:
+            slot = self.slots.pop(tracker_id, None)
+            if slot is None:
+                continue
+            self.counts[slot] = 0
+            self.free_slots.append(slot)
+            freed += self.bytes_per_track
+        return freed
+
+    def _to_kmh(self, world_units_per_second: np.ndarray) -> np.ndarray:
+        return world_units_per_second * self.meter_per_pixel * 3.6
+
+    def _endpoint(self, slots: np.ndarray, heads: np.ndarray, counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        start = self.history[slots, (heads - counts) % self.window, 1]
+        end = self.history[slots, (heads - 1) % self.window, 1]
+
+        speeds = self._to_kmh(np.abs(start - end) / (counts / self.fps))
+        return speeds, np.ones_like(speeds)
+
+    def _lstsq(self, slots: np.ndarray, heads: np.ndarray, counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # Ring positions holding valid samples; the slope does not depend on sample order
+        age = (heads[:, None] - 1 - np.arange(self.window)[None, :]) % self.window
+        valid = (age < counts[:, None]).astype(np.float64)
+
+        points = self.history[slots].astype(np.float64)
+        times = self.times[slots]
+        n = counts.astype(np.float64)
+
+        t_mean = (times * valid).sum(axis=1) / n
+        p_mean = (points * valid[..., None]).sum(axis=1) / n[:, None]
+        dt = (times - t_mean[:, None]) * valid
+        dp = (points - p_mean[:, None, :]) * valid[..., None]
+
+        s_tt = (dt ** 2).sum(axis=1)
+        safe_s_tt = np.where(s_tt > 0, s_tt, 1.0)
+        velocity = (dt[..., None] * dp).sum(axis=1) / safe_s_tt[:, None]
+
+        residuals = (dp - dt[..., None] * velocity[:, None, :]) * valid[..., None]
+        dof = np.maximum(n - 2, 1)
+        sigma2 = (residuals ** 2).sum(axis=(1, 2)) / dof
+        speed_se = self._to_kmh(np.sqrt(sigma2 / safe_s_tt))
+
+        speeds = self._to_kmh(np.linalg.norm(velocity, axis=1))
+        coverage = np.minimum(1.0, n / self.window)
+        confidence = np.clip(1 - speed_se / np.maximum(speeds, 1.0), 0.0, 1.0) * coverage
+        confidence = np.where(s_tt > 0, confidence, 0.0)
+        return speeds, confidence
+
+    def _kalman(self, slots: np.ndarray, points: np.ndarray, now: float, new: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        r = self.measurement_noise
+
+        # New tracks start at the measurement with an unknown velocity
+        if new.any():
+            new_slots = slots[new]
+            self.kf_state[new_slots] = 0.0
+            self.kf_state[new_slots, :2] = points[new]
+            self.kf_cov[new_slots] = np.diag([r, r, 1e4, 1e4])
+
+        old = ~new
+        if old.any():
+            old_slots = slots[old]
+            dt = np.maximum(now - self.times[old_slots, (self.heads[old_slots] - 2) % self.window], 1e-3)
+            k = len(old_slots)
+
+            F = np.tile(np.eye(4), (k, 1, 1))
+            F[:, 0, 2] = dt
+            F[:, 1, 3] = dt
+
+            q = self.process_noise
+            Q = np.zeros((k, 4, 4))
+            for axis in (0, 1):
+                Q[:, axis, axis] = q * dt ** 3 / 3
+                Q[:, axis, axis + 2] = Q[:, axis + 2, axis] = q * dt ** 2 / 2
+                Q[:, axis + 2, axis + 2] = q * dt
+
+            x = np.einsum("kij,kj->ki", F, self.kf_state[old_slots])
+            P = F @ self.kf_cov[old_slots] @ F.transpose(0, 2, 1) + Q
+
+            # Position-only measurement: H = [I 0]
+            S = P[:, :2, :2] + np.eye(2) * r
+            K = P[:, :, :2] @ np.linalg.inv(S)
+            innovation = points[old] - x[:, :2]
+            x = x + np.einsum("kij,kj->ki", K, innovation)
+            P = P - K @ P[:, :2, :]
+
+            self.kf_state[old_slots] = x
+            self.kf_cov[old_slots] = P
+
+        velocity = self.kf_state[slots, 2:]
+        velocity_var = self.kf_cov[slots, 2, 2] + self.kf_cov[slots, 3, 3]
+
+        speeds = self._to_kmh(np.linalg.norm(velocity, axis=1))
+        speed_se = self._to_kmh(np.sqrt(velocity_var))
+        confidence = np.clip(1 - speed_se / np.maximum(speeds, 1.0), 0.0, 1.0)
+        return speeds, confidence
+
+    def estimate_with_confidence(
+            self,
+            detections: sv.Detections,
+            timestamp: Optional[float] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Return (tracker_ids, speeds_kmh, confidence) for the tracks in this frame.
+        `timestamp` is the frame time in seconds (defaults to consecutive frames at
+        fps). Tracks with fewer than min_frames_for_speed samples get NaN speed and
+        zero confidence.
+        """
+        now = timestamp if timestamp is not None else self.frame_count / self.fps
+        self.frame_count += 1
+
+        if detections.tracker_id is None or len(detections) == 0:
+            empty = np.empty(0, dtype=np.float32)
+            return np.empty(0, dtype=int), empty, empty
 
         points = detections.get_anchors_coordinates(anchor=sv.Position.BOTTOM_CENTER)
-        transformed_points = self.view_transformer.transform_points(points=points).astype(int)
+        points = self.view_transformer.transform_points(points=points)
+        if self.mode == "endpoint":
+            points = points.astype(int)
 
-        labels = []
+        tracker_ids = detections.tracker_id.astype(int)
+        slots = np.fromiter((self._slot(t) for t in tracker_ids), dtype=np.intp, count=len(tracker_ids))
+        new = self.counts[slots] == 0
 
-        for tracker_id, [_, y] in zip(detections.tracker_id, transformed_points):
-            self.coordinates[tracker_id].append(y)
+        heads = self.heads[slots]
+        self.history[slots, heads] = points
+        self.times[slots, heads] = now
+        heads = (heads + 1) % self.window
+        self.heads[slots] = heads
+        counts = np.minimum(self.counts[slots] + 1, self.window)
+        self.counts[slots] = counts
 
-            # Tính toán tốc độ
-            if len(self.coordinates[tracker_id]) < self.min_frames_for_speed:
-                labels.append(f"#{tracker_id}")
-            else:
-                coordinate_start = self.coordinates[tracker_id][0]
-                coordinate_end = self.coordinates[tracker_id][-1]
+        if self.mode == "lstsq":
+            speeds, confidence = self._lstsq(slots, heads, counts)
+        elif self.mode == "kalman":
+            speeds, confidence = self._kalman(slots, np.asarray(points, dtype=np.float64), now, new)
+        else:
+            speeds, confidence = self._endpoint(slots, heads, counts)
 
-                distance = abs(coordinate_start - coordinate_end)
-                distance_m = distance * self.meter_per_pixel
+        ready = counts >= self.min_frames_for_speed
+        speeds = np.where(ready, speeds, np.nan)
+        confidence = np.where(ready, confidence, 0.0)
 
-                time = len(self.coordinates[tracker_id]) / self.fps
+        return tracker_ids, speeds, confidence
 
-                speed = distance_m / time * 3.6
+    def estimate(self, detections: sv.Detections, timestamp: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return (tracker_ids, speeds_kmh) for the tracks in this frame. Tracks with
+        fewer than min_frames_for_speed samples get NaN.
+        """
+        tracker_ids, speeds, _ = self.estimate_with_confidence(detections, timestamp)
+        return tracker_ids, speeds
 
-                labels.append(f"#{tracker_id} {int(speed)} km/h")
+    @staticmethod
+    def format_labels(tracker_ids: np.ndarray, speeds: np.ndarray) -> List[str]:
+        return [
+            f"#{tracker_id}" if np.isnan(speed) else f"#{tracker_id} {int(speed)} km/h"
+            for tracker_id, speed in zip(tracker_ids, speeds)
+        ]
 
-        return labels
\ No newline at end of file
+    def update_and_estimate(self, detections: sv.Detections) -> List[str]:
+        tracker_ids, speeds = self.estimate(detections)
+        return self.format_labels(tracker_ids, speeds)
@@ -0,0 +1,147 @@
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from inference_service.plate_reader import PlateReader, PLATE_CHARS, match_plate_pattern
+
+
+class TierStats:
+    """
+    How many plates each OCR tier answered.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.total = 0
+        self.local_hits = 0
+        self.vlm_calls = 0
+        self.vlm_hits = 0
+
+    def record(self, local_hit: bool, vlm_called: bool = False, vlm_hit: bool = False) -> None:
+        with self.lock:
+            self.total += 1
+            self.local_hits += local_hit
+            self.vlm_calls += vlm_called
+            self.vlm_hits += vlm_hit
+
+    def summary(self) -> str:
+        total = max(self.total, 1)
+        vlm_calls = max(self.vlm_calls, 1)
+        return (f"{self.total} plates: local {self.local_hits} ({self.local_hits / total:.0%}), "
+                f"VLM {self.vlm_calls} calls ({self.vlm_calls / total:.0%}), "
+                f"{self.vlm_hits} read ({self.vlm_hits / vlm_calls:.0%} of calls)")
+
+
+class LocalPlateOCR:
+    """
+    CPU EasyOCR tier. read() returns a plate only when EasyOCR is confident enough and
+    the text matches a Vietnamese plate pattern, otherwise "" so the caller can fall
+    back to the VLM.
+    """
+
+    def __init__(self, min_confidence: float = 0.5, languages: Tuple[str, ...] = ("en",), gpu: bool = False):
+        self.min_confidence = min_confidence
+        self.languages = list(languages)
+        self.gpu = gpu
+        self.reader = None
+        self.available = True
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self.reader is None and self.available:
+            try:
+                import easyocr
+            except ImportError:
+                print("[LOCAL OCR] easyocr is not installed, every plate goes to the VLM")
+                self.available = False
+                return None
+            self.reader = easyocr.Reader(self.languages, gpu=self.gpu, verbose=False)
+        return self.reader
+
+    @staticmethod
+    def _join_lines(results: List) -> Tuple[str, float]:
+        # Two-row plates come back as separate boxes: order rows top to bottom, then left to right
+        boxes = []
+        for points, text, confidence in results:
+            ys = [p[1] for p in points]
+            boxes.append(((min(ys) + max(ys)) / 2, max(ys) - min(ys), min(p[0] for p in points), text, confidence))
+        boxes.sort(key=lambda box: box[0])
+
+        rows = []
+        for box in boxes:
+            if rows and abs(box[0] - rows[-1][-1][0]) < box[1] / 2:
+                rows[-1].append(box)
+            else:
+                rows.append([box])
+
+        text = "".join(box[3] for row in rows for box in sorted(row, key=lambda box: box[2]))
+        confidence = min(box[4] for box in boxes)
+        return text, confidence
+
+    def read(self, plate_im: np.ndarray) -> Tuple[str, float]:
+        """
+        (validated plate or "", confidence).
+        """
+        # EasyOCR's Reader is not documented as thread-safe
+        with self._lock:
+            reader = self._load()
+            if reader is None or plate_im.size == 0:
+                return "", 0.0
+            results = reader.readtext(plate_im, allowlist=PLATE_CHARS, detail=1)
+
+        if not results:
+            return "", 0.0
+
+        text, confidence = self._join_lines(results)
+        if confidence < self.min_confidence:
+            return "", confidence
+
+        return match_plate_pattern(text), confidence
+
+
+class TieredPlateReader(PlateReader):
+    """
+    PlateReader that tries LocalPlateOCR first and only calls the VLM when the local
+    result is missing, unconfident or not a valid plate.
+    """
+
+    def __init__(self, min_local_confidence: float = 0.5, gpu: bool = False, **kwargs):
+        super().__init__(**kwargs)
+        self.local = LocalPlateOCR(min_confidence=min_local_confidence, gpu=gpu)
+        self.stats = TierStats()
+
+    def _recognize_plate(self, plate_im: np.ndarray) -> Optional[str]:
+        plate, confidence = self.local.read(plate_im)
+        if plate:
+            print(f"[OCR TIER] Local OCR: {plate} (confidence {confidence:.2f})")
+            self.stats.record(local_hit=True)
+            return plate
+
+        text = self._recognize_plate_via_vlm(plate_im)
+        self.stats.record(local_hit=False, vlm_called=True, vlm_hit=bool(text))
+        return text
+
+    def _recognize_plates(self, plate_ims: List[np.ndarray], layout: str = "images") -> List[Optional[str]]:
+        texts = [None] * len(plate_ims)
+        remaining = []
+        for index, plate_im in enumerate(plate_ims):
+            plate, _ = self.local.read(plate_im)
+            if plate:
+                self.stats.record(local_hit=True)
+                texts[index] = plate
+            else:
+                remaining.append(index)
+
+        if len(remaining) == 1:
+            vlm_texts = [self._recognize_plate_via_vlm(plate_ims[remaining[0]])]
+        elif remaining:
+            vlm_texts = self._recognize_plates_via_vlm([plate_ims[index] for index in remaining], layout)
+        else:
+            vlm_texts = []
+
+        for index, text in zip(remaining, vlm_texts):
+            self.stats.record(local_hit=False, vlm_called=True, vlm_hit=bool(text))
+            texts[index] = text
+
+        return texts
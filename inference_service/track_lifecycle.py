@@ -0,0 +1,112 @@
+import sys
+from collections import OrderedDict
+from typing import Callable, Iterable, List, Optional
+
+
+def discard_from(id_set: set) -> Callable[[List[int]], int]:
+    """
+    Evict callback for a plain set of tracker ids (e.g. OCR dispatch bookkeeping).
+    """
+    def evict(tracker_ids: List[int]) -> int:
+        freed = 0
+        for tracker_id in tracker_ids:
+            if tracker_id in id_set:
+                id_set.discard(tracker_id)
+                freed += sys.getsizeof(tracker_id)
+        return freed
+
+    return evict
+
+
+def bytetrack_alive_ids(byte_track) -> Optional[set]:
+    """
+    Ids ByteTrack still holds (tracked or lost), or None if the tracker does not
+    expose its track lists.
+    """
+    tracked = getattr(byte_track, "tracked_tracks", None)
+    lost = getattr(byte_track, "lost_tracks", None)
+    if tracked is None or lost is None:
+        return None
+
+    return {
+        int(track.external_track_id)
+        for track in list(tracked) + list(lost)
+        if getattr(track, "external_track_id", -1) != -1
+    }
+
+
+class TrackLifecycle:
+    """
+    Knows when every tracker_id was last seen and evicts the per-track state of
+    tracks that are gone: not seen for `ttl_seconds` of stream time, dropped by
+    ByteTrack, or the least recently seen ones once more than `max_tracks` are live.
+
+    Components register an evict callback that frees their state for a list of
+    tracker ids and returns the number of bytes released.
+    """
+
+    def __init__(self, ttl_seconds: float = 10.0, max_tracks: int = 512, byte_track=None):
+        self.ttl_seconds = ttl_seconds
+        self.max_tracks = max(1, max_tracks)
+        self.byte_track = byte_track
+
+        self.last_seen = OrderedDict()
+        self.evictors = {}
+
+        self.evicted_tracks = 0
+        self.evicted_bytes = 0
+        self.evicted_by_reason = {"ttl": 0, "dropped": 0, "budget": 0}
+
+    def register(self, name: str, evict: Callable[[List[int]], int]) -> None:
+        self.evictors[name] = evict
+
+    @property
+    def live_tracks(self) -> int:
+        return len(self.last_seen)
+
+    def _evict(self, tracker_ids: List[int], reason: str) -> None:
+        if not tracker_ids:
+            return
+
+        for tracker_id in tracker_ids:
+            self.last_seen.pop(tracker_id, None)
+        for evict in self.evictors.values():
+            self.evicted_bytes += evict(tracker_ids)
+
+        self.evicted_tracks += len(tracker_ids)
+        self.evicted_by_reason[reason] += len(tracker_ids)
+
+    def update(self, tracker_ids: Iterable[int], now: float) -> List[int]:
+        """
+        Mark `tracker_ids` as seen at `now` (seconds of stream time) and evict stale
+        tracks. Returns the evicted ids.
+        """
+        for tracker_id in tracker_ids:
+            tracker_id = int(tracker_id)
+            self.last_seen[tracker_id] = now
+            self.last_seen.move_to_end(tracker_id)
+
+        # last_seen is ordered oldest first, so expired tracks are at the front
+        expired = []
+        for tracker_id, seen in self.last_seen.items():
+            if now - seen < self.ttl_seconds:
+                break
+            expired.append(tracker_id)
+        self._evict(expired, "ttl")
+
+        alive = bytetrack_alive_ids(self.byte_track) if self.byte_track is not None else None
+        dropped = [] if alive is None else [t for t in self.last_seen if t not in alive]
+        self._evict(dropped, "dropped")
+
+        over_budget = list(self.last_seen)[:max(0, len(self.last_seen) - self.max_tracks)]
+        self._evict(over_budget, "budget")
+
+        return expired + dropped + over_budget
+
+    def metrics(self) -> dict:
+        return {
+            "live_tracks": self.live_tracks,
+            "evicted_tracks": self.evicted_tracks,
+            "evicted_bytes": self.evicted_bytes,
+            **{f"evicted_{reason}": count for reason, count in self.evicted_by_reason.items()},
+        }
@@ -0,0 +1,205 @@
+import queue
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import cv2
+import numpy as np
+import supervision as sv
+
+try:
+    import av
+except ImportError:
+    av = None
+
+
+def copy_plane(av_frame, out: np.ndarray) -> None:
+    """
+    Copy a packed (bgr24) PyAV frame into `out`, skipping the row padding.
+    """
+    plane = av_frame.planes[0]
+    height, width = out.shape[:2]
+    rows = np.frombuffer(plane, dtype=np.uint8).reshape(-1, plane.line_size)[:height, :width * 3]
+    np.copyto(out, rows.reshape(height, width, 3))
+
+
+class ThreadedVideoReader:
+    """
+    Decode a video on a background thread.
+
+    Uses PyAV (FFmpeg with frame/slice threading) when it is installed, otherwise
+    cv2.VideoCapture. With `target_width` the frames handed out are downscaled at
+    decode time (PyAV's swscale or cv2.resize into a preallocated buffer) and
+    full_frame(frame_id) returns the full-resolution image on demand, e.g. for
+    plate crops.
+
+    Frames are written into a pool of `buffers` preallocated arrays that are reused
+    round-robin. The decoder stays at most `prefetch` frames (default `buffers - 2`)
+    ahead of the consumer, so a consumer may hold up to `buffers - prefetch - 1`
+    frames before one of them is overwritten; copy a frame that must live longer.
+    """
+
+    def __init__(
+            self,
+            source_path: str,
+            target_width: Optional[int] = None,
+            buffers: int = 8,
+            prefetch: Optional[int] = None,
+            use_pyav: bool = True,
+            thread_count: int = 0,
+    ):
+        self.source_path = source_path
+        self.thread_count = thread_count
+        self.backend = "pyav" if use_pyav and av is not None else "opencv"
+
+        info = sv.VideoInfo.from_video_path(video_path=source_path)
+        self.full_resolution_wh = info.resolution_wh
+
+        if target_width and target_width < info.width:
+            self.scale = target_width / info.width
+            # Even dimensions keep video encoders happy
+            height = int(round(info.height * self.scale / 2) * 2)
+            self.resolution_wh = (int(target_width), height)
+        else:
+            self.scale = 1.0
+            self.resolution_wh = info.resolution_wh
+
+        self.video_info = sv.VideoInfo(
+            width=self.resolution_wh[0],
+            height=self.resolution_wh[1],
+            fps=info.fps,
+            total_frames=info.total_frames,
+        )
+
+        buffers = max(3, buffers)
+        width, height = self.resolution_wh
+        full_width, full_height = self.full_resolution_wh
+        self._pool = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(buffers)]
+        self._full_pool = [
+            np.empty((full_height, full_width, 3), dtype=np.uint8) for _ in range(buffers)
+        ] if self.scale != 1.0 else self._pool
+
+        prefetch = buffers - 2 if prefetch is None else min(prefetch, buffers - 2)
+        self._queue = queue.Queue(maxsize=max(1, prefetch))
+        self._history = OrderedDict()
+        self._history_size = buffers
+        self._history_lock = threading.Lock()
+        self._stop = threading.Event()
+        self.error = None
+
+        self.frames_decoded = 0
+
+        self._worker = threading.Thread(target=self._run, name="video-decode", daemon=True)
+        self._worker.start()
+
+    @property
+    def downscaled(self) -> bool:
+        return self.scale != 1.0
+
+    def _remember(self, frame_id: int, full) -> None:
+        with self._history_lock:
+            self._history[frame_id] = full
+            while len(self._history) > self._history_size:
+                self._history.popitem(last=False)
+
+    def _put(self, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _decode_pyav(self) -> None:
+        container = av.open(self.source_path)
+        try:
+            stream = container.streams.video[0]
+            stream.thread_type = "AUTO"
+            stream.thread_count = self.thread_count
+
+            width, height = self.resolution_wh
+            for frame_id, av_frame in enumerate(container.decode(stream)):
+                if self._stop.is_set():
+                    break
+
+                buffer = self._pool[frame_id % len(self._pool)]
+                # swscale still allocates the converted frame (PyAV cannot convert into
+                # caller memory), but its pixels go straight into the pooled buffer
+                # instead of through a new ndarray per frame
+                copy_plane(av_frame.reformat(width=width, height=height, format="bgr24"), buffer)
+
+                # Keep the decoded frame, convert to full-resolution BGR only when asked
+                self._remember(frame_id, av_frame)
+                self.frames_decoded += 1
+                if not self._put((frame_id, buffer)):
+                    break
+        finally:
+            container.close()
+
+    def _decode_opencv(self) -> None:
+        capture = cv2.VideoCapture(self.source_path)
+        try:
+            frame_id = 0
+            while not self._stop.is_set():
+                full = self._full_pool[frame_id % len(self._full_pool)]
+                ok, full = capture.read(full)
+                if not ok:
+                    break
+
+                if self.downscaled:
+                    buffer = self._pool[frame_id % len(self._pool)]
+                    cv2.resize(full, self.resolution_wh, dst=buffer, interpolation=cv2.INTER_AREA)
+                else:
+                    buffer = full
+
+                self._remember(frame_id, full)
+                self.frames_decoded += 1
+                if not self._put((frame_id, buffer)):
+                    break
+                frame_id += 1
+        finally:
+            capture.release()
+
+    def _run(self) -> None:
+        try:
+            if self.backend == "pyav":
+                self._decode_pyav()
+            else:
+                self._decode_opencv()
+        except Exception as e:
+            print(f"[DECODE] Error decoding {self.source_path}: {e}")
+            self.error = e
+        finally:
+            self._put(None)
+
+    def __iter__(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            _, frame = item
+            yield frame
+
+    def full_frame(self, frame_id: int) -> Optional[np.ndarray]:
+        """
+        Full-resolution BGR frame for a recently decoded frame_id, or None if it has
+        already been recycled.
+        """
+        with self._history_lock:
+            full = self._history.get(frame_id)
+
+        if full is None:
+            return None
+        if self.backend == "pyav":
+            return full.to_ndarray(format="bgr24")
+        return full
+
+    def close(self) -> None:
+        self._stop.set()
+        try:
+            while True:
+                self._queue.get_nowait()
+        except queue.Empty:
+            pass
+        self._worker.join(timeout=5)
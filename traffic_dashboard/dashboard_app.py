@@ -27,6 +27,11 @@ def fetch_violation_detail(violation_id):
     return response.json()
 
 
+def fetch_violation_evidence(violation_id):
+    response = requests.get(f"{API_BASE_URL}/violations/{violation_id}/evidence")
+    return response.content if response.status_code == 200 else None
+
+
 def get_ai_explanation(plate, speed, limit):
     response = requests.post(f"{API_BASE_URL}/explain",
                              params={"plate_number": plate, "speed": speed, "speed_limit": limit})
@@ -46,6 +51,10 @@ def render_violation_ticket(detail):
                   delta=f"Giới hạn: {detail['speed_limit']} km/h")
         st.info(f"**Địa điểm:** {detail['location']} - **Thời gian:** {detail['timestamp']}")
 
+        evidence = fetch_violation_evidence(detail['id'])
+        if evidence:
+            st.image(evidence, caption="Ảnh biển số", width=320)
+
 
     with col2:
         st.subheader("Thông tin Chủ xe")
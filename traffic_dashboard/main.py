@@ -1,13 +1,17 @@
 import json
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from starlette.middleware.cors import CORSMiddleware
 from . import database as db
+from workflow.evidence_store import EvidenceStore
 from workflow.tools.tools import lookup_db
 from workflow.agents.report_agent import report_agent as report_agent_llm
 
 app = FastAPI(title="Traffic Violation Dashboard")
 
+EVIDENCE_DIR = "output/evidence"
+evidence_store = None
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -36,6 +40,19 @@ def get_violation_detail(violation_id: int):
     return violation
 
 
+@app.get("/violations/{violation_id}/evidence")
+def get_violation_evidence(violation_id: int):
+    global evidence_store
+    if evidence_store is None:
+        evidence_store = EvidenceStore(EVIDENCE_DIR)
+
+    image = evidence_store.read_violation(violation_id)
+    if image is None:
+        raise HTTPException(status_code=404, detail="Evidence not found")
+
+    return Response(content=image, media_type="image/jpeg")
+
+
 @app.post("/explain")
 def get_explanation(plate_number: str, speed: float, speed_limit: float):
     explanation = report_agent_llm(plate_number, speed, speed_limit)
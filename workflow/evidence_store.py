@@ -0,0 +1,210 @@
+import hashlib
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class EvidenceStore:
+    """
+    Plate crops packed into rolling segment files instead of one file per crop.
+
+    Each JPEG is stored once under its SHA-256 (identical crops share one copy) by
+    appending it to the current segment; a segment is closed once it reaches
+    `segment_bytes`. A SQLite index maps the content key to (segment, offset,
+    length), a crop id (camera_frame_tracker) to its key, and a violation id to its
+    key, so reading a violation's crop is one primary-key lookup and one seek.
+    """
+
+    def __init__(self, root: str = os.path.join("output", "evidence"), segment_bytes: int = 64 << 20):
+        self.root = root
+        self.segment_bytes = segment_bytes
+        os.makedirs(root, exist_ok=True)
+
+        # One connection shared by the writer thread and readers (e.g. API worker threads)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(os.path.join(root, "index.db"), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS blobs "
+            "(key TEXT PRIMARY KEY, segment INTEGER, offset INTEGER, length INTEGER, created_at REAL)"
+        )
+        self.db.execute("CREATE TABLE IF NOT EXISTS crops (crop_id TEXT PRIMARY KEY, key TEXT)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS violations (violation_id INTEGER PRIMARY KEY, key TEXT)")
+        self.db.commit()
+
+        row = self.db.execute("SELECT MAX(segment) FROM blobs").fetchone()
+        self.segment = row[0] if row[0] is not None else 0
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.root, f"segment_{segment:06d}.bin")
+
+    def write_batch(self, crops: List[Tuple[str, bytes]], links: List[Tuple[int, str]]) -> Tuple[int, int]:
+        """
+        Append new crops, then record crop ids and violation links in one
+        transaction. Returns (blobs written, links made).
+        """
+        with self.lock:
+            return self._write_batch(crops, links)
+
+    def _write_batch(self, crops: List[Tuple[str, bytes]], links: List[Tuple[int, str]]) -> Tuple[int, int]:
+        try:
+            rows = self._append(crops) if crops else []
+            # The index only ever points at bytes that are already on disk
+            self.db.executemany(
+                "INSERT OR IGNORE INTO blobs (key, segment, offset, length, created_at) VALUES (?, ?, ?, ?, ?)", rows
+            )
+
+            linked = 0
+            for violation_id, crop_id in links:
+                row = self.db.execute("SELECT key FROM crops WHERE crop_id = ?", (crop_id,)).fetchone()
+                if row is not None:
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO violations (violation_id, key) VALUES (?, ?)", (violation_id, row[0])
+                    )
+                    linked += 1
+
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        return len(rows), linked
+
+    def _append(self, crops: List[Tuple[str, bytes]]) -> list:
+        now = time.time()
+        rows = []
+        written = set()
+
+        segment_file = open(self._segment_path(self.segment), "ab")
+        try:
+            for crop_id, data in crops:
+                key = hashlib.sha256(data).hexdigest()
+                if key not in written and self.db.execute("SELECT 1 FROM blobs WHERE key = ?", (key,)).fetchone() is None:
+                    offset = segment_file.tell()
+                    if offset > 0 and offset + len(data) > self.segment_bytes:
+                        segment_file.close()
+                        self.segment += 1
+                        segment_file = open(self._segment_path(self.segment), "ab")
+                        offset = 0
+                    segment_file.write(data)
+                    rows.append((key, self.segment, offset, len(data), now))
+                    written.add(key)
+                self.db.execute("INSERT OR REPLACE INTO crops (crop_id, key) VALUES (?, ?)", (crop_id, key))
+            segment_file.flush()
+            os.fsync(segment_file.fileno())
+        finally:
+            segment_file.close()
+
+        return rows
+
+    def read(self, key: str) -> Optional[bytes]:
+        with self.lock:
+            row = self.db.execute("SELECT segment, offset, length FROM blobs WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+
+        segment, offset, length = row
+        with open(self._segment_path(segment), "rb") as segment_file:
+            segment_file.seek(offset)
+            return segment_file.read(length)
+
+    def key_for_violation(self, violation_id: int) -> Optional[str]:
+        with self.lock:
+            row = self.db.execute("SELECT key FROM violations WHERE violation_id = ?", (violation_id,)).fetchone()
+        return row[0] if row is not None else None
+
+    def read_violation(self, violation_id: int) -> Optional[bytes]:
+        """
+        JPEG of the plate crop linked to a violation, or None.
+        """
+        key = self.key_for_violation(violation_id)
+        return self.read(key) if key is not None else None
+
+    def close(self) -> None:
+        with self.lock:
+            self.db.close()
+
+
+class EvidenceWriter:
+    """
+    Background thread that JPEG-encodes crops and writes them to an EvidenceStore
+    in batches, keeping disk I/O off the frame loop. submit() never blocks: when
+    `max_queue` crops are waiting the crop is dropped and counted. link() is queued
+    behind the crops submitted before it, so a violation can be linked to a crop
+    that has not been written yet.
+    """
+
+    def __init__(self, store: EvidenceStore, max_queue: int = 1024, batch_size: int = 64, jpeg_quality: int = 90):
+        self.store = store
+        self.batch_size = batch_size
+        self.jpeg_quality = jpeg_quality
+        self.queue = queue.Queue(maxsize=max_queue)
+
+        self.submitted = 0
+        self.dropped = 0
+        self.written = 0
+        self.linked = 0
+        self.batches = 0
+
+        self.thread = threading.Thread(target=self._run, name="evidence-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, crop_id: str, image: np.ndarray) -> bool:
+        try:
+            self.queue.put_nowait(("crop", crop_id, image))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.submitted += 1
+        return True
+
+    def link(self, violation_id: int, crop_id: str) -> None:
+        self.queue.put(("link", violation_id, crop_id))
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            crops, links = [], []
+            for item in batch:
+                if item is None:
+                    stopping = True
+                elif item[0] == "crop":
+                    ok, buffer = cv2.imencode(".jpg", item[2], [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+                    if ok:
+                        crops.append((item[1], buffer.tobytes()))
+                else:
+                    links.append((item[1], item[2]))
+
+            if not crops and not links:
+                continue
+
+            try:
+                written, linked = self.store.write_batch(crops, links)
+                self.written += written
+                self.linked += linked
+                self.batches += 1
+            except Exception as e:
+                print(f"[EVIDENCE] Could not write {len(crops)} crops: {e}")
+
+    def summary(self) -> str:
+        return (f"{self.submitted} crops submitted ({self.dropped} dropped), {self.written} stored "
+                f"in {self.batches} batches, {self.linked} violations linked, segment {self.store.segment}")
+
+    def close(self) -> None:
+        self.queue.put(None)
+        self.thread.join()
+        print(f"[EVIDENCE] {self.summary()}")
+        self.store.close()
@@ -0,0 +1,121 @@
+from typing import Callable, Dict, Optional, Tuple
+
+from langgraph.graph import StateGraph, END
+
+from workflow.state import TrafficState
+from workflow.frame_context import FrameContext
+
+EXECUTORS = ("langgraph", "fast")
+
+
+class GraphSpec:
+    """
+    Node/edge description shared by both executors: `nodes` maps a name to its
+    node function and `routes` maps a name to the nodes it may hand over to via
+    state["next"] ("end" is always allowed).
+    """
+
+    def __init__(self, entry: str, nodes: Dict[str, Callable], routes: Dict[str, Tuple[str, ...]]):
+        self.entry = entry
+        self.nodes = nodes
+        self.routes = routes
+
+
+def processing_spec() -> GraphSpec:
+    """
+    detect -> speed -> check -> OCR, each step able to stop the frame early.
+    """
+    from workflow.node import nodes
+
+    return GraphSpec(
+        entry="detect_vehicle",
+        nodes={
+            "detect_vehicle": nodes.detect_vehicle,
+            "calculate_speed": nodes.calculate_speed,
+            "check_violation": nodes.check_violation,
+            "ocr_plate": nodes.ocr_plate,
+        },
+        routes={
+            "detect_vehicle": ("calculate_speed",),
+            "calculate_speed": ("check_violation",),
+            "check_violation": ("ocr_plate",),
+            "ocr_plate": (),
+        }
+    )
+
+
+def build_langgraph(spec: GraphSpec, state_schema=TrafficState):
+    workflow = StateGraph(state_schema)
+
+    for name, node in spec.nodes.items():
+        workflow.add_node(name, node)
+
+    workflow.set_entry_point(spec.entry)
+
+    for name, targets in spec.routes.items():
+        path_map = {target: target for target in targets}
+        path_map["end"] = END
+        workflow.add_conditional_edges(name, lambda state: state["next"], path_map)
+
+    return workflow.compile()
+
+
+class LangGraphAdapter:
+    """
+    Compiled LangGraph that also accepts a FrameContext: the graph runs on its
+    TrafficState dict and the final values are written back into the context.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def invoke(self, state):
+        if isinstance(state, FrameContext):
+            state.update(self.graph.invoke(state.as_state()))
+            return state
+        return self.graph.invoke(state)
+
+
+class FastPathExecutor:
+    """
+    Runs a GraphSpec as plain function calls: the node functions and routing of
+    the LangGraph version, without channels, checkpoints or per-step dispatch.
+    invoke() has the same signature, so it can stand in for a compiled graph.
+    A FrameContext is run in place; a dict is copied first, as LangGraph would.
+    """
+
+    def __init__(self, spec: GraphSpec):
+        self.entry = spec.entry
+        # Resolve names once: each step is a tuple lookup instead of a graph dispatch
+        self.steps = {
+            name: (node, frozenset(spec.routes.get(name, ())) | {"end"})
+            for name, node in spec.nodes.items()
+        }
+
+    def invoke(self, state):
+        if isinstance(state, dict):
+            state = dict(state)
+        name = self.entry
+
+        while True:
+            node, targets = self.steps[name]
+            update = node(state)
+            if update is not state:
+                state.update(update)
+
+            target = state.get("next", "end")
+            if target not in targets:
+                raise ValueError(f"Node '{name}' routed to '{target}', allowed: {sorted(targets)}")
+            if target == "end":
+                return state
+            name = target
+
+
+def compile_processing(executor: str = "langgraph", spec: Optional[GraphSpec] = None):
+    """
+    Per-frame processing app: a compiled LangGraph or the fast-path executor.
+    """
+    spec = spec or processing_spec()
+    if executor == "fast":
+        return FastPathExecutor(spec)
+    return LangGraphAdapter(build_langgraph(spec))
@@ -0,0 +1,111 @@
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, List, Optional
+
+
+class _ItemAccess:
+    """
+    state["key"] / state.get("key") over slotted attributes, so nodes written
+    against the TrafficState dict run unchanged on the objects below.
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key: str, value) -> None:
+        try:
+            setattr(self, key, value)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key: str) -> bool:
+        return hasattr(self, key)
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default)
+
+    def update(self, changes: dict) -> None:
+        for key, value in changes.items():
+            self[key] = value
+
+
+@dataclass(slots=True, eq=False)
+class FrameContext(_ItemAccess):
+    """
+    One frame's TrafficState as a slotted object. Nodes set fields in place via
+    update_state() instead of returning a spread copy of the whole state, so a
+    frame allocates one small object rather than a dict per node.
+    """
+
+    frame: Any
+    frame_id: int
+    timestamp: float
+    camera_id: str
+    location: Optional[str]
+    speed_limit: Optional[float]
+    detections: Optional[Any] = None
+    motion_skipped: bool = False
+    speed_values: Dict[int, float] = field(default_factory=dict)
+    speed_confidence: Dict[int, float] = field(default_factory=dict)
+    violations: List[Dict] = field(default_factory=list)
+    violation_plates: List[Dict] = field(default_factory=list)
+    plate_readings: Dict[int, str] = field(default_factory=dict)
+    llm_reports: List[str] = field(default_factory=list)
+    human_review_needed: bool = False
+    next: str = ""
+
+    def as_state(self) -> dict:
+        """
+        TrafficState dict for LangGraph.
+        """
+        return {name: getattr(self, name) for name in FRAME_FIELDS}
+
+
+FRAME_FIELDS = tuple(f.name for f in fields(FrameContext))
+
+
+@dataclass(slots=True, eq=False)
+class CameraAccumulator(_ItemAccess):
+    """
+    What a camera carries from frame to frame (latest speeds, violations, plates,
+    reports) in a fixed set of slots. Replaces the persistent_state dict.
+    """
+
+    speed_values: Dict[int, float] = field(default_factory=dict)
+    speed_confidence: Dict[int, float] = field(default_factory=dict)
+    violations: List[Dict] = field(default_factory=list)
+    violation_plates: List[Dict] = field(default_factory=list)
+    plate_readings: Dict[int, str] = field(default_factory=dict)
+    llm_reports: List[str] = field(default_factory=list)
+
+    def frame_context(self, frame, frame_id: int, timestamp: float, camera_id: str, location: Optional[str],
+                      speed_limit: Optional[float], detections=None, next: str = "") -> FrameContext:
+        """
+        Context for the next frame, sharing this camera's accumulated containers.
+        """
+        return FrameContext(
+            frame, frame_id, timestamp, camera_id, location, speed_limit,
+            detections=detections,
+            speed_values=self.speed_values,
+            speed_confidence=self.speed_confidence,
+            violation_plates=self.violation_plates,
+            plate_readings=self.plate_readings,
+            llm_reports=self.llm_reports,
+            next=next
+        )
+
+
+def update_state(state, **changes):
+    """
+    Apply a node's changes. A FrameContext is updated in place and returned; for a
+    plain dict (LangGraph) only the changed keys are returned as a partial update.
+    """
+    if isinstance(state, FrameContext):
+        for key, value in changes.items():
+            setattr(state, key, value)
+        return state
+    return changes
@@ -1,7 +1,11 @@
+import asyncio
+import functools
+import itertools
+import multiprocessing
+import queue
 import time
-from multiprocessing.managers import DictProxy
+from typing import List, Optional, Tuple
 
-import cv2
 import supervision as sv
 import argparse
 import sys
@@ -11,24 +15,52 @@ from workflow.node import nodes
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from inference_service.speed_estimator import SpeedEstimator
-from inference_service.detector import initialize_detector
+from inference_service.speed_estimator import SpeedEstimator, SPEED_MODES
+from inference_service.motion import MotionGate
+from inference_service.track_lifecycle import TrackLifecycle, discard_from
+from inference_service.plate_candidates import PlateCandidateBuffer
+from inference_service.plate_localizer import PlateLocalizer
+from inference_service.plate_reader import PayloadEncoder, PLATE_HEIGHT, MAX_PAYLOAD_BYTES
+from inference_service.video_source import ThreadedVideoReader
+from inference_service.detector import (
+    initialize_detector, process_detection_batch, batch_frames, StridedDetector
+)
 from workflow.state import TrafficState
+from workflow.frame_context import FrameContext, CameraAccumulator
+from workflow.pipeline import Pipeline
+from workflow.fast_path import compile_processing, EXECUTORS
+from workflow.shm_transport import OCRTransport
+from workflow.rendering import annotate_frame, should_annotate, open_video_writer, FrameAnnotator, VideoEncoder
 from langgraph.graph import StateGraph, END
 from workflow.node.nodes import *
 
 cv_models = {}
 
 
-def initialize_models(
+def build_models(
         model_path: str,
         video_info,
         confidence: float,
-        iou: float
-):
-    """Initialize and cache CV models."""
-    global cv_models
-
+        iou: float,
+        detection_stride: int = 1,
+        use_roi: bool = False,
+        backend: str = "pytorch",
+        int8: bool = False,
+        calibration_dir: Optional[str] = None,
+        model=None,
+        source=None,
+        target=None,
+        motion_gate: bool = False,
+        motion_threshold: float = 0.002,
+        track_ttl: float = 10.0,
+        max_tracks: int = 512,
+        speed_mode: str = "endpoint",
+        min_speed_confidence: float = 0.0,
+        plate_deadline: float = 2.0,
+        plate_localizer: str = "none",
+        plate_model_path: Optional[str] = None
+) -> dict:
+    """Build the CV models dict for one camera."""
     (
         model,
         byte_track,
@@ -37,11 +69,26 @@ def initialize_models(
         box_annotator,
         label_annotator,
         trace_annotator,
+        roi,
     ) = initialize_detector(
-        model_path, video_info, confidence, iou
+        model_path,
+        video_info,
+        confidence,
+        iou,
+        use_roi=use_roi,
+        backend=backend,
+        int8=int8,
+        calibration_dir=calibration_dir,
+        model=model,
+        source=source,
+        target=target
     )
 
-    cv_models = {
+    speed_estimator = SpeedEstimator(view_transformer, video_info.fps, mode=speed_mode)
+    track_lifecycle = TrackLifecycle(ttl_seconds=track_ttl, max_tracks=max_tracks, byte_track=byte_track)
+    track_lifecycle.register("speed_estimator", speed_estimator.evict)
+
+    models = {
         "model": model,
         "byte_track": byte_track,
         "polygon_zone": polygon_zone,
@@ -49,69 +96,90 @@ def initialize_models(
         "box_annotator": box_annotator,
         "label_annotator": label_annotator,
         "trace_annotator": trace_annotator,
-        "speed_estimator": SpeedEstimator(view_transformer, video_info.fps),
+        "speed_estimator": speed_estimator,
+        "track_lifecycle": track_lifecycle,
+        "min_speed_confidence": min_speed_confidence,
+        "plate_candidates": PlateCandidateBuffer(deadline=plate_deadline),
         "confidence": confidence,
         "iou": iou,
+        "roi": roi,
     }
 
-    print("CV models initialized and cached.")
+    if detection_stride > 1:
+        models["stride_detector"] = StridedDetector(
+            model, byte_track, polygon_zone, confidence, iou, stride=detection_stride, roi=roi
+        )
 
+    if motion_gate:
+        models["motion_gate"] = MotionGate(threshold=motion_threshold)
 
-def create_processing_graph():
-    """
-    Create frame processing workflow (without DB save and report generation)
-    """
-    # Share cv_models with nodes
-    import workflow.node.nodes as nodes
-    nodes.cv_models = cv_models
+    if plate_localizer == "classical":
+        models["plate_localizer"] = PlateLocalizer()
+    elif plate_localizer == "yolo":
+        if not plate_model_path:
+            raise ValueError("plate_localizer='yolo' needs plate_model_path")
+        models["plate_localizer"] = PlateLocalizer(model_path=plate_model_path)
 
-    workflow = StateGraph(TrafficState)
+    return models
 
-    # Add nodes for frame processing only
-    workflow.add_node("detect_vehicle", detect_vehicle)
-    workflow.add_node("calculate_speed", calculate_speed)
-    workflow.add_node("check_violation", check_violation)
-    workflow.add_node("ocr_plate", ocr_plate)
 
-    # Set entry point
-    workflow.set_entry_point("detect_vehicle")
+def initialize_models(
+        model_path: str,
+        video_info,
+        confidence: float,
+        iou: float,
+        detection_stride: int = 1,
+        use_roi: bool = False,
+        backend: str = "pytorch",
+        int8: bool = False,
+        calibration_dir: Optional[str] = None,
+        motion_gate: bool = False,
+        motion_threshold: float = 0.002,
+        track_ttl: float = 10.0,
+        max_tracks: int = 512,
+        speed_mode: str = "endpoint",
+        min_speed_confidence: float = 0.0,
+        plate_deadline: float = 2.0,
+        plate_localizer: str = "none",
+        plate_model_path: Optional[str] = None
+):
+    """Initialize and cache CV models."""
+    global cv_models
 
-    workflow.add_conditional_edges(
-        "detect_vehicle",
-        lambda state: state["next"],
-        {
-            "calculate_speed": "calculate_speed",
-            "end": END
-        }
+    cv_models = build_models(
+        model_path,
+        video_info,
+        confidence,
+        iou,
+        detection_stride=detection_stride,
+        use_roi=use_roi,
+        backend=backend,
+        int8=int8,
+        calibration_dir=calibration_dir,
+        motion_gate=motion_gate,
+        motion_threshold=motion_threshold,
+        track_ttl=track_ttl,
+        max_tracks=max_tracks,
+        speed_mode=speed_mode,
+        min_speed_confidence=min_speed_confidence,
+        plate_deadline=plate_deadline,
+        plate_localizer=plate_localizer,
+        plate_model_path=plate_model_path
     )
 
-    workflow.add_conditional_edges(
-        "calculate_speed",
-        lambda state: state["next"],
-        {
-            "check_violation": "check_violation",
-            "end": END
-        }
-    )
+    print("CV models initialized and cached.")
 
-    workflow.add_conditional_edges(
-        "check_violation",
-        lambda state: state["next"],
-        {
-            "ocr_plate": "ocr_plate",
-            "end": END
-        }
-    )
 
-    workflow.add_conditional_edges(
-        "ocr_plate",
-        lambda state: state["next"],
-        {
-            "end": END
-        }
-    )
+def create_processing_graph(executor: str = "langgraph"):
+    """
+    Create frame processing workflow (without DB save and report generation).
+    executor="fast" runs the same nodes and routes as direct calls (see workflow.fast_path).
+    """
+    # Share cv_models with nodes
+    import workflow.node.nodes as nodes
+    nodes.cv_models = cv_models
 
-    return workflow.compile()
+    return compile_processing(executor)
 
 
 def create_finalization_graph():
@@ -141,18 +209,386 @@ def create_finalization_graph():
     return workflow.compile()
 
 
+def iter_frames_with_detections(frame_generator, batch_size: int = 1, models: Optional[dict] = None):
+    """
+    Yield (frame, detections) pairs. With batch_size > 1 the detections are computed
+    with one YOLO call per batch; otherwise they are left to the detect_vehicle node.
+    """
+    cv_models_ = models if models is not None else cv_models
+
+    for frames in batch_frames(frame_generator, batch_size):
+        if batch_size > 1:
+            batch_detections = process_detection_batch(
+                cv_models_["model"],
+                cv_models_["byte_track"],
+                cv_models_["polygon_zone"],
+                frames,
+                cv_models_["confidence"],
+                cv_models_["iou"],
+                cv_models_["roi"],
+                cv_models_.get("input_scale", 1.0)
+            )
+        else:
+            batch_detections = [None] * len(frames)
+
+        yield from zip(frames, batch_detections)
+
+
+def run_frame(
+        processing_app,
+        persistent_state: CameraAccumulator,
+        frame,
+        frame_id: int,
+        fps: float,
+        camera_id: str,
+        location: str,
+        speed_limit: float,
+        detections=None
+) -> FrameContext:
+    """
+    Run one frame through the processing graph and fold the result into persistent_state.
+    """
+    print(f"\n--- Processing Frame {frame_id} ---")
+
+    context = persistent_state.frame_context(
+        frame, frame_id, frame_id / fps, camera_id, location, speed_limit,
+        detections=detections, next="save_db"
+    )
+
+    # Process frame through detection, speed, violation check, and OCR only
+    result = processing_app.invoke(context)
+
+    # Update persistent state with new results
+    persistent_state.speed_values = result.speed_values
+    persistent_state.speed_confidence = result.speed_confidence
+
+    if result.violations:
+        persistent_state.violations.extend(result.violations)
+
+    # Plates read since the previous frame, attached while the video is still running
+    ocr_results = nodes.ocr_transport.poll(camera_id) if nodes.ocr_transport is not None else []
+    attach_ocr_results(persistent_state, ocr_results, result.violations)
+
+    return result
+
+
+def attach_ocr_results(persistent_state: CameraAccumulator, ocr_results: list, new_violations: Optional[list] = None) -> int:
+    """
+    Fold OCR results into persistent_state: the plate per tracker (plate_readings),
+    violation_plates for save_db, and plate_number on the tracker's violations.
+    Violations added this frame pick up plates that were read earlier.
+    """
+    readings = persistent_state.plate_readings
+    attached = 0
+
+    for plate_info in ocr_results:
+        plate_number = plate_info.get("license_plate")
+        if not plate_number:
+            continue
+
+        tracker_id = plate_info["tracker_id"]
+        readings[tracker_id] = plate_number
+        persistent_state.violation_plates.append({
+            "frame_id": plate_info["frame_id"],
+            "tracker_id": tracker_id,
+            "license_plate": plate_number
+        })
+
+        for violation in persistent_state.violations:
+            if violation["tracker_id"] == tracker_id:
+                violation["plate_number"] = plate_number
+                attached += 1
+        print(f"[OCR LIVE] Tracker #{tracker_id}: {plate_number} "
+              f"({time.time() - plate_info['processed_at']:.2f}s after OCR)")
+
+    for violation in new_violations or []:
+        if violation["tracker_id"] in readings:
+            violation["plate_number"] = readings[violation["tracker_id"]]
+            attached += 1
+
+    return attached
+
+
+def video_frames(source_video_path: str, max_frame_id: Optional[int] = None, frame_source=None):
+    frames = frame_source if frame_source is not None else sv.get_video_frames_generator(source_path=source_video_path)
+    if max_frame_id is not None:
+        frames = itertools.islice(frames, max_frame_id + 1)
+    return frames
+
+
+def open_frame_source(
+        source_video_path: str,
+        models: dict,
+        decode_width: Optional[int] = None,
+        buffers: int = 8,
+        prefetch: Optional[int] = None
+) -> ThreadedVideoReader:
+    """
+    Start background decoding and register the reader with the camera models, so
+    detection maps boxes back to full resolution and plate crops use full frames.
+    """
+    reader = ThreadedVideoReader(source_video_path, target_width=decode_width, buffers=buffers, prefetch=prefetch)
+    models["frame_source"] = reader
+    models["input_scale"] = reader.scale
+    if "stride_detector" in models:
+        models["stride_detector"].input_scale = reader.scale
+
+    if reader.downscaled and models.get("roi") is not None:
+        print("[DECODE] Road ROI crops full-resolution frames, disabled for downscaled decoding")
+        models["roi"] = None
+        if "stride_detector" in models:
+            models["stride_detector"].roi = None
+
+    width, height = reader.resolution_wh
+    print(f"[DECODE] Background {reader.backend} decoding at {width}x{height}")
+    return reader
+
+
+def run_serial(
+        processing_app,
+        persistent_state: CameraAccumulator,
+        video_info: sv.VideoInfo,
+        output_path: str,
+        frame_generator,
+        batch_size: int,
+        frame_kwargs: dict,
+        models: Optional[dict] = None,
+        annotate_every: int = 1,
+        annotate_violations_only: bool = False
+) -> int:
+    cv_models_ = models if models is not None else cv_models
+
+    writer = open_video_writer(output_path, video_info)
+    if writer is None:
+        return -1
+
+    print(f"[VIDEO] Saving annotated output to: {output_path} using cv2.VideoWriter")
+
+    frame_id = -1
+    frames_with_detections = iter_frames_with_detections(frame_generator, batch_size, cv_models_)
+
+    for frame_id, (frame, batch_detections) in enumerate(frames_with_detections):
+        result = run_frame(
+            processing_app, persistent_state, frame, frame_id, detections=batch_detections, **frame_kwargs
+        )
+
+        if should_annotate(frame_id, bool(result["violations"]), annotate_every, annotate_violations_only):
+            annotated_frame = annotate_frame(
+                frame,
+                result["detections"],
+                result.get("speed_values", {}),
+                cv_models_["box_annotator"],
+                cv_models_["label_annotator"],
+                cv_models_["trace_annotator"],
+                cv_models_.get("input_scale", 1.0),
+            )
+        else:
+            annotated_frame = frame
+
+        # Write final annotated frame
+        writer.write(annotated_frame)
+
+    writer.release()
+    print("Video Writer released.")
+
+    return frame_id
+
+
+def run_pipelined(
+        processing_app,
+        persistent_state: CameraAccumulator,
+        video_info: sv.VideoInfo,
+        output_path: str,
+        source_video_path: str,
+        max_frame_id: Optional[int],
+        frame_kwargs: dict,
+        queue_size: int = 8,
+        decode_mode: str = "thread",
+        annotate_mode: str = "thread",
+        encode_mode: str = "thread",
+        annotate_every: int = 1,
+        annotate_violations_only: bool = False,
+        frame_source: Optional[ThreadedVideoReader] = None
+) -> int:
+    """
+    Run decode -> infer -> annotate -> encode as concurrent stages.
+    Inference always runs on a thread of this process because it owns the tracker state.
+    """
+    if frame_source is not None and decode_mode == "process":
+        print("[PIPELINE] The threaded frame source decodes in this process, ignoring --decode_mode=process")
+        decode_mode = "thread"
+    display_scale = frame_source.scale if frame_source is not None else 1.0
+
+    processed = {"last_frame_id": -1}
+
+    def make_infer():
+        frame_ids = itertools.count()
+
+        def infer(frame):
+            frame_id = next(frame_ids)
+            result = run_frame(processing_app, persistent_state, frame, frame_id, **frame_kwargs)
+            processed["last_frame_id"] = frame_id
+            annotate = should_annotate(
+                frame_id, bool(result["violations"]), annotate_every, annotate_violations_only
+            )
+            return frame, result["detections"], result.get("speed_values", {}), annotate
+
+        return infer
+
+    pipeline = Pipeline(queue_size=queue_size)
+    pipeline.add_source(
+        "decode", functools.partial(video_frames, source_video_path, max_frame_id, frame_source), decode_mode
+    )
+    pipeline.add_stage("infer", make_infer, "thread")
+    pipeline.add_stage("annotate", functools.partial(FrameAnnotator, video_info, display_scale), annotate_mode)
+    pipeline.add_stage("encode", functools.partial(VideoEncoder, output_path, video_info), encode_mode)
+
+    print(f"[VIDEO] Saving annotated output to: {output_path} using a pipelined cv2.VideoWriter")
+    pipeline.run()
+
+    return processed["last_frame_id"]
+
+
+def report_detection_stats(models: dict, prefix: str = "[DETECT]") -> None:
+    if "stride_detector" in models:
+        stride_detector = models["stride_detector"]
+        print(f"{prefix} YOLO keyframes: {stride_detector.keyframes}, "
+              f"propagated frames: {stride_detector.propagated_frames}")
+
+    if "motion_gate" in models:
+        motion_gate = models["motion_gate"]
+        print(f"{prefix} Motion gate skipped {motion_gate.skipped}/{motion_gate.frames} frames "
+              f"(skip ratio {motion_gate.skip_ratio:.2%})")
+
+    if "plate_candidates" in models:
+        plate_candidates = models["plate_candidates"]
+        print(f"{prefix} Plate crops scored: {plate_candidates.offered}, "
+              f"sent to OCR: {plate_candidates.dispatched}")
+
+    if "plate_localizer" in models:
+        print(f"{prefix} {models['plate_localizer'].summary()}")
+
+    if "track_lifecycle" in models:
+        metrics = models["track_lifecycle"].metrics()
+        print(f"{prefix} Live tracks: {metrics['live_tracks']}, evicted {metrics['evicted_tracks']} "
+              f"(ttl {metrics['evicted_ttl']}, dropped {metrics['evicted_dropped']}, "
+              f"budget {metrics['evicted_budget']}), {metrics['evicted_bytes'] / 1024:.1f} KiB freed")
+
+
+def stop_ocr_worker(ocr_process: multiprocessing.Process, transport: OCRTransport, timeout: float = 30.0) -> bool:
+    """
+    Drain-then-stop: the worker finishes every crop already sent, then exits on the
+    stop sentinel. It is terminated only if it is still busy after `timeout`
+    seconds. Returns True on a clean stop; False, with the crops lost, if the
+    worker had to be terminated, had already died, or left crops unanswered.
+    """
+    transport.stop()
+    ocr_process.join(timeout)
+
+    if ocr_process.is_alive():
+        print(f"[OCR] Worker still busy after {timeout:.0f}s ({transport.pending} crops unanswered), terminating")
+        ocr_process.terminate()
+        ocr_process.join()
+        return False
+
+    # Every answer is already in the pipe; let the reader thread catch up
+    drained = transport.join(timeout=5.0)
+
+    if ocr_process.exitcode != 0:
+        print(f"[OCR] Worker exited with code {ocr_process.exitcode}, "
+              f"{transport.pending} crops lost: {transport.summary()}")
+        return False
+    if not drained:
+        print(f"[OCR] Worker stopped with {transport.pending} crops unanswered: {transport.summary()}")
+        return False
+
+    print(f"[OCR] Worker stopped after draining: {transport.summary()}")
+    return True
+
+
+def build_finalization_state(
+        persistent_state: CameraAccumulator,
+        violation_plates: list,
+        frame_id: int,
+        camera_id: str,
+        location: str,
+        speed_limit: float,
+        fps: float
+) -> TrafficState:
+    return {
+        "frame": None,
+        "frame_id": frame_id,
+        "timestamp": frame_id / fps,
+        "camera_id": camera_id,
+        "location": location,
+        "speed_limit": speed_limit,
+        "detections": None,
+        "speed_values": persistent_state.speed_values,
+        "violations": persistent_state.violations,
+        "violation_plates": violation_plates,
+        "plate_readings": persistent_state.plate_readings,
+        "llm_reports": [],
+        "next": "",
+    }
+
+
+def new_persistent_state() -> CameraAccumulator:
+    """Persistent state for accumulating violations across frames."""
+    return CameraAccumulator()
+
+
 def process_video(
         source_video_path: str,
         speed_limit: float = 60.0,
         camera_id: str = "CAM_001",
-        location: str = "HIGHWAY_1"
+        location: str = "HIGHWAY_1",
+        batch_size: int = 1,
+        detection_stride: int = 1,
+        use_roi: bool = False,
+        backend: str = "pytorch",
+        int8: bool = False,
+        calibration_dir: Optional[str] = None,
+        motion_gate: bool = False,
+        motion_threshold: float = 0.002,
+        track_ttl: float = 10.0,
+        max_tracks: int = 512,
+        speed_mode: str = "endpoint",
+        min_speed_confidence: float = 0.0,
+        plate_deadline: float = 2.0,
+        plate_localizer: str = "none",
+        plate_model_path: Optional[str] = None,
+        ocr_concurrency: int = 1,
+        tiered_ocr: bool = False,
+        ocr_cache: bool = False,
+        ocr_cache_path: Optional[str] = None,
+        ocr_batch_size: int = 1,
+        ocr_batch_layout: str = "images",
+        ocr_plate_height: int = PLATE_HEIGHT,
+        ocr_max_bytes: int = MAX_PAYLOAD_BYTES,
+        ocr_grayscale: bool = False,
+        ocr_clahe: bool = False,
+        pipelined: bool = False,
+        queue_size: int = 8,
+        decode_mode: str = "thread",
+        annotate_mode: str = "thread",
+        encode_mode: str = "thread",
+        annotate_every: int = 1,
+        annotate_violations_only: bool = False,
+        threaded_decode: bool = False,
+        decode_width: Optional[int] = None,
+        max_frame_id: Optional[int] = 100,
+        ocr_shutdown_timeout: float = 30.0,
+        executor: str = "langgraph"
 ):
-    ocr_queue_ = nodes.ocr_queue
-    ocr_results_ = nodes.ocr_results
+    ocr_transport = nodes.ocr_transport
 
+    encoder = PayloadEncoder(
+        target_height=ocr_plate_height, max_bytes=ocr_max_bytes, grayscale=ocr_grayscale, clahe=ocr_clahe
+    )
     ocr_process = multiprocessing.Process(
         target=ocr_worker,
-        args=(ocr_queue_, ocr_results_)
+        args=(ocr_transport, ocr_concurrency, tiered_ocr, ocr_cache, ocr_cache_path,
+              ocr_batch_size, ocr_batch_layout, encoder, plate_localizer != "none")
     )
     ocr_process.start()
 
@@ -162,253 +598,429 @@ def process_video(
         model_path="inference_service\\yolo11n.pt",
         video_info=video_info,
         confidence=0.3,
-        iou=0.7
+        iou=0.7,
+        detection_stride=detection_stride,
+        use_roi=use_roi,
+        backend=backend,
+        int8=int8,
+        calibration_dir=calibration_dir,
+        motion_gate=motion_gate,
+        motion_threshold=motion_threshold,
+        track_ttl=track_ttl,
+        max_tracks=max_tracks,
+        speed_mode=speed_mode,
+        min_speed_confidence=min_speed_confidence,
+        plate_deadline=plate_deadline,
+        plate_localizer=plate_localizer,
+        plate_model_path=plate_model_path
     )
+    cv_models["track_lifecycle"].register("ocr_dispatch", discard_from(nodes.ocr_dispatched_tracker_ids))
+
+    if detection_stride > 1 and batch_size > 1:
+        print("[DETECT] Stride mode runs YOLO on single keyframes, ignoring --batch_size")
+        batch_size = 1
 
     # Create two  workflows
-    processing_app = create_processing_graph()
+    processing_app = create_processing_graph(executor)
     finalization_app = create_finalization_graph()
 
-    frame_generator = sv.get_video_frames_generator(source_path=source_video_path)
-
     print(f"Kích thước khung hình: {video_info.width}x{video_info.height}, FPS: {video_info.fps}")
 
     BASE_DIR = os.path.dirname(os.path.dirname(__file__))
     output_path = os.path.join(BASE_DIR, "inference_service", "output", "output_hehe.avi")
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-    fourcc = cv2.VideoWriter_fourcc(*'MJPG')
-    frame_size = (video_info.width, video_info.height)
-    writer = cv2.VideoWriter(
-        filename=output_path,
-        fourcc=fourcc,
-        fps=video_info.fps,
-        frameSize=frame_size
-    )
+    frame_source = None
+    output_video_info = video_info
+    if threaded_decode:
+        if pipelined:
+            # Frames stay in the reader's buffer pool while they sit in the three stage queues
+            buffers, prefetch = queue_size * 4 + 8, queue_size
+        else:
+            # A whole YOLO batch is held while the decoder keeps prefetching
+            prefetch = 6
+            buffers = batch_size + prefetch + 2
+        frame_source = open_frame_source(source_video_path, cv_models, decode_width, buffers, prefetch)
+        output_video_info = frame_source.video_info
+
+    persistent_state = new_persistent_state()
+
+    frame_kwargs = {
+        "fps": video_info.fps,
+        "camera_id": camera_id,
+        "location": location,
+        "speed_limit": speed_limit,
+    }
 
-    if not writer.isOpened():
-        print(f"!!! LỖI QUAN TRỌNG: cv2.VideoWriter KHÔNG THỂ KHỞI TẠO. Codec '{'X264'}' hoặc FFmpeg có vấn đề.")
+    if pipelined:
+        if batch_size > 1:
+            print("[PIPELINE] The infer stage runs one frame at a time, ignoring --batch_size")
+        frame_id = run_pipelined(
+            processing_app, persistent_state, output_video_info, output_path,
+            source_video_path, max_frame_id, frame_kwargs,
+            queue_size=queue_size,
+            decode_mode=decode_mode,
+            annotate_mode=annotate_mode,
+            encode_mode=encode_mode,
+            annotate_every=annotate_every,
+            annotate_violations_only=annotate_violations_only,
+            frame_source=frame_source
+        )
+    else:
+        frame_generator = video_frames(source_video_path, max_frame_id, frame_source)
+        frame_id = run_serial(
+            processing_app, persistent_state, output_video_info, output_path,
+            frame_generator, batch_size, frame_kwargs,
+            annotate_every=annotate_every,
+            annotate_violations_only=annotate_violations_only
+        )
+
+    if frame_source is not None:
+        frame_source.close()
+
+    if frame_id < 0:
+        stop_ocr_worker(ocr_process, ocr_transport, ocr_shutdown_timeout)
+        ocr_transport.close()
         return
 
-    print(f"[VIDEO] Saving annotated output to: {output_path} using cv2.VideoWriter")
+    nodes.flush_plate_candidates(cv_models, camera_id)
 
-    # Persistent state for accumulating violations across frames
-    persistent_state = {
-        "speed_values": {},
-        "violations": [],
-        "violation_plates": [],
-        "plate_readings": {},
-        "llm_reports": [],
-    }
+    stop_ocr_worker(ocr_process, ocr_transport, ocr_shutdown_timeout)
+    attach_ocr_results(persistent_state, ocr_transport.poll(camera_id))
+    ocr_transport.close()
 
-    total_violations = 0
-
-    for frame_id, frame in enumerate(frame_generator):
-        print(f"\n--- Processing Frame {frame_id} ---")
-
-        initial_state: TrafficState = {
-            "frame": frame,
-            "frame_id": frame_id,
-            "timestamp": frame_id / video_info.fps,
-            "camera_id": camera_id,
-            "location": location,
-            "speed_limit": speed_limit,
-            "detections": None,
-            "speed_values": persistent_state["speed_values"],
-            "violations": persistent_state["violations"],
-            "violation_plates": persistent_state["violation_plates"],
-            "plate_readings": persistent_state["plate_readings"],
-            "llm_reports": persistent_state["llm_reports"],
-            "next": "save_db",
-        }
+    print(f"\n{'=' * 60}")
+    print(f" Finalization phase - Processing {len(persistent_state.violations)} violations")
+    print(f" Total violation_plates in persistent_state: {len(persistent_state.violation_plates)}")
+    print('=' * 60)
 
-        # Process frame through detection, speed, violation check, and OCR only
-        result = processing_app.invoke(initial_state)
+    finalization_state = build_finalization_state(
+        persistent_state, persistent_state.violation_plates, frame_id, camera_id, location, speed_limit,
+        video_info.fps
+    )
 
-        # Update persistent state with new results
-        persistent_state["speed_values"] = result["speed_values"]
+    # Run finalization workflow
+    final_result = finalization_app.invoke(finalization_state)
 
-        if result["violations"]:
-            persistent_state["violations"].extend(result["violations"])
+    # Display final reports
+    if final_result["llm_reports"]:
+        print(f"\n Generated {len(final_result['llm_reports'])} reports")
 
-        if result["violation_plates"]:
-            persistent_state["violation_plates"].extend(result["violation_plates"])
+    report_detection_stats(cv_models)
 
-        violations_count = len(result["violations"])
-        total_violations += violations_count
+    if nodes.evidence_writer is not None:
+        nodes.evidence_writer.close()
 
-        annotated_frame = frame.copy()
-        detections = result["detections"]
+    print("\n Processing complete!")
 
-        # Draw boxes, IDs, traces
-        if detections is not None:
-            annotated_frame = cv_models["box_annotator"].annotate(
-                scene=annotated_frame,
-                detections=detections
-            )
-            annotated_frame = cv_models["label_annotator"].annotate(
-                scene=annotated_frame,
-                detections=detections
-            )
-            annotated_frame = cv_models["trace_annotator"].annotate(
-                scene=annotated_frame,
-                detections=detections
-            )
 
-        # Draw speed per tracked vehicle
-        speed_values = result.get("speed_values", {})
+def _ocr_result(task: dict, plate_number: str) -> dict:
+    return {
+        "camera_id": task.get("camera_id"),
+        "frame_id": task["frame_id"],
+        "tracker_id": task["tracker_id"],
+        "license_plate": plate_number,
+        "processed_at": time.time()
+    }
 
-        if detections is not None and detections.tracker_id is not None:
-            for det_idx in range(len(detections)):
-                track_id = int(detections.tracker_id[det_idx])
 
-                if track_id in speed_values:
-                    speed = speed_values[track_id]
-                    x1, y1, x2, y2 = detections.xyxy[det_idx]
+OCR_STATS_EVERY = 10
 
-                    anchor = sv.Point(int(x1), int(y1) - 12)
-                    text = f"{speed:.1f} km/h"
-                    font = cv2.FONT_HERSHEY_SIMPLEX
-                    font_scale = 0.9
-                    thickness = 2
 
-                    (text_w, text_h), baseline = cv2.getTextSize(text, font, font_scale, thickness)
+def _open_ocr_cache(use_cache: bool, cache_path: Optional[str], fuzzy: bool = False):
+    """
+    OCRCache for the worker; near matches only when crops are tight plate crops.
+    """
+    if not use_cache and not cache_path:
+        return None
 
-                    text_x = int(x1)
-                    text_y = int(y1) - 10
-                    if text_y < text_h:
-                        text_y = text_h + 5
+    from inference_service.ocr_cache import OCRCache, PLATE_MAX_DISTANCE
+    return OCRCache(db_path=cache_path, max_distance=PLATE_MAX_DISTANCE if fuzzy else 0)
 
-                    cv2.rectangle(
-                        annotated_frame,
-                        (text_x, text_y - text_h - 4),
-                        (text_x + text_w + 4, text_y + 4),
-                        (0, 0, 0),  # black background
-                        -1  # filled
-                    )
 
-                    cv2.putText(
-                        annotated_frame,
-                        text,
-                        (text_x + 2, text_y),
-                        font,
-                        font_scale,
-                        (0, 255, 255),  # yellow text
-                        thickness,
-                        cv2.LINE_AA
-                    )
+def _report_ocr_stats(processed: int, tier_stats=None, cache=None) -> None:
+    if processed % OCR_STATS_EVERY != 0:
+        return
+    if tier_stats is not None:
+        print(f"[OCR TIER] {tier_stats.summary()}")
+    if cache is not None:
+        print(f"[OCR CACHE] {cache.summary()}")
 
-        # Write final annotated frame
-        writer.write(annotated_frame)
 
-        if frame_id >= 100:
+def _drain_tasks(transport: OCRTransport, first: dict, batch_size: int) -> List[dict]:
+    """
+    `first` plus whatever else is already waiting, up to batch_size tasks.
+    """
+    tasks = [first]
+    while len(tasks) < batch_size:
+        try:
+            tasks.append(transport.get_nowait())
+        except queue.Empty:
             break
+    return tasks
 
-    try:
-        ocr_queue_.join()
-    except Exception:
-        pass
-
-    ocr_process.terminate()
-    ocr_process.join()
-
-    final_violation_plates = []
-    for task_id, plate_info in ocr_results_.items():
-        if plate_info.get("license_plate"):
-            final_violation_plates.append({
-                "frame_id": plate_info["frame_id"],
-                "tracker_id": plate_info["tracker_id"],
-                "license_plate": plate_info["license_plate"]
-            })
 
-    writer.release()
-    print("Video Writer released.")
+def _print_ocr_result(task: dict, plate_number: str) -> None:
+    if plate_number:
+        print(f"[OCR WORKER] Task {task['task_id']} SUCCESS: Plate = {plate_number}")
+    else:
+        print(f"[OCR WORKER] Task {task['task_id']} NO PLATE detected.")
 
-    print(f"\n{'=' * 60}")
-    print(f" Finalization phase - Processing {total_violations} violations")
-    print(f" Total violations in persistent_state: {len(persistent_state['violations'])}")
-    print(f" Total violation_plates in persistent_state: {len(persistent_state['violation_plates'])}")
-    print('=' * 60)
 
-    finalization_state: TrafficState = {
-        "frame": None,
-        "frame_id": frame_id,
-        "timestamp": frame_id / video_info.fps,
-        "camera_id": camera_id,
-        "location": location,
-        "speed_limit": speed_limit,
-        "detections": None,
-        "speed_values": persistent_state["speed_values"],
-        "violations": persistent_state["violations"],
-        "violation_plates": final_violation_plates,
-        "plate_readings": persistent_state["plate_readings"],
-        "llm_reports": [],
-        "next": "",
-    }
+async def _async_ocr_worker(
+        transport: OCRTransport,
+        concurrency: int,
+        tiered: bool = False,
+        cache=None,
+        batch_size: int = 1,
+        batch_layout: str = "images",
+        encoder: Optional[PayloadEncoder] = None
+):
+    from inference_service.async_ocr import AsyncOCREngine
+    from inference_service.tiered_ocr import LocalPlateOCR, TierStats
+
+    loop = asyncio.get_running_loop()
+    local_ocr = LocalPlateOCR() if tiered else None
+    tier_stats = TierStats() if tiered else None
+    processed = 0
+
+    async with AsyncOCREngine(max_in_flight=concurrency, encoder=encoder) as engine:
+        print(f"\n=== ASYNC OCR WORKER STARTED (up to {concurrency} requests in flight) ===\n")
+
+        async def answer_locally(plate_im, scope: Optional[str]) -> Tuple[Optional[tuple], Optional[str]]:
+            # (cache key, plate) where plate is None when the VLM still has to read the crop
+            key = None
+            if cache is not None and plate_im.size > 0:
+                key, plate_number = cache.lookup(plate_im, scope)
+                if plate_number is not None:
+                    print(f"[OCR CACHE] Hit: {plate_number or 'NO_PLATE'}")
+                    return key, plate_number
+
+            if local_ocr is not None:
+                plate_number, _ = await loop.run_in_executor(None, local_ocr.read, plate_im)
+                if plate_number:
+                    tier_stats.record(local_hit=True)
+                    if key is not None:
+                        cache.store(key, plate_number)
+                    return key, plate_number
 
-    # Run finalization workflow
-    final_result = finalization_app.invoke(finalization_state)
+            return key, None
 
-    # Display final reports
-    if final_result["llm_reports"]:
-        print(f"\n Generated {len(final_result['llm_reports'])} reports")
+        async def handle(tasks: List[dict]) -> None:
+            nonlocal processed
+            results = [None] * len(tasks)
+            try:
+                answers = await asyncio.gather(
+                    *(answer_locally(task["plate_im"], task.get("camera_id")) for task in tasks)
+                )
+                plates = [plate_number for _, plate_number in answers]
+
+                remaining = [index for index, plate_number in enumerate(plates) if plate_number is None]
+                if remaining:
+                    vlm_plates = await engine.read_plate_batch(
+                        [tasks[index]["plate_im"] for index in remaining], batch_layout
+                    )
+                    for index, plate_number in zip(remaining, vlm_plates):
+                        plates[index] = plate_number or ""
+                        if tier_stats is not None:
+                            tier_stats.record(local_hit=False, vlm_called=True, vlm_hit=bool(plate_number))
+                        # None means the request failed; only real answers go into the cache
+                        if answers[index][0] is not None and plate_number is not None:
+                            cache.store(answers[index][0], plate_number)
+
+                for index, (task, plate_number) in enumerate(zip(tasks, plates)):
+                    results[index] = _ocr_result(task, plate_number)
+                    _print_ocr_result(task, plate_number)
+                    processed += 1
+                    _report_ocr_stats(processed, tier_stats, cache)
+            except Exception as e:
+                print(f"[OCR WORKER] Unhandled error: {e}")
+            finally:
+                for task, result in zip(tasks, results):
+                    transport.done(task, result)
 
-    print("\n Processing complete!")
+        pending = set()
+        while not transport.stopping:
+            # Keep a couple of tasks queued behind the limiter, leave the rest in the transport
+            if len(pending) >= concurrency * 2:
+                _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+            try:
+                task = await loop.run_in_executor(None, functools.partial(transport.get, timeout=1))
+            except queue.Empty:
+                continue
 
+            pending.add(asyncio.create_task(handle(_drain_tasks(transport, task, batch_size))))
+            pending = {p for p in pending if not p.done()}
 
-def ocr_worker(input_queue: multiprocessing.JoinableQueue, output_dict: DictProxy):
+        # Stop sentinel received: finish what is in flight before leaving
+        if pending:
+            await asyncio.wait(pending)
+
+
+def ocr_worker(
+        transport: OCRTransport,
+        concurrency: int = 1,
+        tiered: bool = False,
+        use_cache: bool = False,
+        cache_path: Optional[str] = None,
+        batch_size: int = 1,
+        batch_layout: str = "images",
+        encoder: Optional[PayloadEncoder] = None,
+        cache_fuzzy: bool = False
+):
     try:
-        from inference_service.plate_reader import PlateReader
-        reader = PlateReader()
+        cache = _open_ocr_cache(use_cache, cache_path, cache_fuzzy)
+
+        if concurrency > 1:
+            asyncio.run(_async_ocr_worker(
+                transport, concurrency, tiered, cache, batch_size, batch_layout, encoder
+            ))
+            if cache is not None:
+                cache.close()
+            print("\n=== ASYNC OCR WORKER STOPPED (queue drained) ===\n")
+            return
+
+        from inference_service.plate_reader import get_plate_reader
+        reader = get_plate_reader(tiered=tiered, cache=cache, encoder=encoder)
+        tier_stats = getattr(reader, "stats", None)
+        processed = 0
 
         print("\n=== OCR WORKER STARTED ===\n")
 
-        while True:
+        while not transport.stopping:
+            tasks = []
+            results = []
             try:
-                task = input_queue.get(timeout=1)
-                task_id = task["task_id"]
+                tasks = _drain_tasks(transport, transport.get(timeout=1), batch_size)
+                results = [None] * len(tasks)
 
-                plate_number = reader.read_plate(task["plate_im"])
-
-                output_dict[task_id] = {
-                    "frame_id": task["frame_id"],
-                    "tracker_id": task["tracker_id"],
-                    "license_plate": plate_number,
-                    "processed_at": time.time()
-                }
-
-                if plate_number:
-                    print(f"[OCR WORKER] Task {task_id} SUCCESS: Plate = {plate_number}")
+                if len(tasks) > 1:
+                    plates = reader.read_plates(
+                        [task["plate_im"] for task in tasks], batch_layout, [task.get("camera_id") for task in tasks]
+                    )
                 else:
-                    print(f"[OCR WORKER] Task {task_id} NO PLATE detected.")
+                    plates = [reader.read_plate(tasks[0]["plate_im"], tasks[0].get("camera_id"))]
 
-                input_queue.task_done()
+                for index, (task, plate_number) in enumerate(zip(tasks, plates)):
+                    results[index] = _ocr_result(task, plate_number)
+                    _print_ocr_result(task, plate_number)
+                    processed += 1
+                    _report_ocr_stats(processed, tier_stats, cache)
 
             except queue.Empty:
                 continue
             except Exception as e:
                 print(f"[OCR WORKER] Unhandled error: {e}")
-                if input_queue:
-                    input_queue.task_done()
+            finally:
+                for task, result in zip(tasks, results):
+                    transport.done(task, result)
+
+        if cache is not None:
+            cache.close()
+        print("\n=== OCR WORKER STOPPED (queue drained) ===\n")
     except KeyboardInterrupt:
         print("\n=== OCR WORKER SHUTDOWN ===\n")
 
 
 if __name__ == "__main__":
     multiprocessing.freeze_support()
-    nodes.init_multiprocessing_resources()
 
     parser = argparse.ArgumentParser(description="Standard LangGraph Traffic Monitoring")
     parser.add_argument("--source_video_path", default="inference_service/data/plate.mp4", type=str)
     parser.add_argument("--speed_limit", default=60, type=float)
     parser.add_argument("--camera_id", default="CAM_001", type=str)
     parser.add_argument("--location", default="Xuan Thuy - KM 10", type=str)
+    parser.add_argument("--batch_size", default=1, type=int, help="Frames per YOLO forward pass")
+    parser.add_argument("--detection_stride", default=1, type=int, help="Run YOLO every N frames, propagate tracks in between")
+    parser.add_argument("--use_roi", action="store_true", help="Run YOLO only on the road polygon (SOURCE) crop")
+    parser.add_argument("--backend", default="pytorch", choices=["pytorch", "onnx", "openvino"])
+    parser.add_argument("--int8", action="store_true", help="Use an INT8 post-training quantized export")
+    parser.add_argument("--calibration_dir", default=None, type=str, help="Frames used for INT8 calibration")
+    parser.add_argument("--motion_gate", action="store_true", help="Skip YOLO on frames without motion or live tracks")
+    parser.add_argument("--motion_threshold", default=0.002, type=float, help="Changed-pixel fraction that counts as motion")
+    parser.add_argument("--track_ttl", default=10.0, type=float, help="Seconds before an unseen track's state is evicted")
+    parser.add_argument("--max_tracks", default=512, type=int, help="Max live tracks kept before evicting the least recent")
+    parser.add_argument("--speed_mode", default="endpoint", choices=SPEED_MODES, help="Speed fit: window endpoints, least squares or Kalman")
+    parser.add_argument("--min_speed_confidence", default=0.0, type=float, help="Only flag violations whose speed confidence reaches this")
+    parser.add_argument("--plate_deadline", default=2.0, type=float, help="Seconds to collect crops of a violator before OCR (0 = first crop)")
+    parser.add_argument("--plate_localizer", default="none", choices=["none", "classical", "yolo"], help="Tight plate crops for OCR")
+    parser.add_argument("--plate_model_path", default=None, type=str, help="YOLO plate detector for --plate_localizer=yolo")
+    parser.add_argument("--ocr_concurrency", default=1, type=int, help="VLM requests in flight in the OCR worker (>1 uses asyncio)")
+    parser.add_argument("--tiered_ocr", action="store_true", help="Try local EasyOCR first, call the VLM only when it is unsure")
+    parser.add_argument("--ocr_cache", action="store_true", help="Reuse OCR results for near-identical crops (perceptual hash)")
+    parser.add_argument("--ocr_cache_path", default=None, type=str, help="SQLite file that keeps the OCR cache between runs")
+    parser.add_argument("--ocr_batch_size", default=1, type=int, help="Plate crops read in one VLM request")
+    parser.add_argument("--ocr_batch_layout", default="images", choices=["images", "mosaic"], help="Batch as numbered images or one labeled grid")
+    parser.add_argument("--ocr_plate_height", default=PLATE_HEIGHT, type=int, help="Resize crops to this height before the VLM (0 = keep)")
+    parser.add_argument("--ocr_max_bytes", default=MAX_PAYLOAD_BYTES, type=int, help="JPEG byte budget per image sent to the VLM (0 = no limit)")
+    parser.add_argument("--ocr_grayscale", action="store_true", help="Send plate crops to the VLM in grayscale")
+    parser.add_argument("--ocr_clahe", action="store_true", help="Apply CLAHE contrast enhancement before the VLM")
+    parser.add_argument("--ocr_slots", default=64, type=int, help="Shared-memory crop slots between the graph and the OCR worker")
+    parser.add_argument("--ocr_slot_kb", default=1024, type=int, help="Size of one crop slot (larger crops are sent inline)")
+    parser.add_argument("--pipelined", action="store_true", help="Run decode/infer/annotate/encode as concurrent stages")
+    parser.add_argument("--queue_size", default=8, type=int, help="Bounded queue depth between pipeline stages")
+    parser.add_argument("--decode_mode", default="thread", choices=["thread", "process"])
+    parser.add_argument("--annotate_mode", default="thread", choices=["thread", "process"])
+    parser.add_argument("--encode_mode", default="thread", choices=["thread", "process"])
+    parser.add_argument("--annotate_every", default=1, type=int, help="Draw annotations on every Nth frame only")
+    parser.add_argument("--annotate_violations_only", action="store_true", help="Draw annotations only on frames with violations")
+    parser.add_argument("--threaded_decode", action="store_true", help="Decode frames on a background thread (PyAV if installed)")
+    parser.add_argument("--decode_width", default=None, type=int, help="Downscale frames to this width at decode time")
+    parser.add_argument("--max_frame_id", default=100, type=int, help="Stop after this frame (-1 for the whole video)")
+    parser.add_argument("--ocr_shutdown_timeout", default=30.0, type=float, help="Seconds the OCR worker gets to drain at shutdown before it is killed")
+    parser.add_argument("--executor", default="langgraph", choices=EXECUTORS, help="Per-frame graph runner: LangGraph or direct node calls")
+    parser.add_argument("--evidence_dir", default=os.path.join("output", "evidence"), type=str, help="Plate crop segments and index (empty = loose JPEG files)")
+    parser.add_argument("--evidence_segment_mb", default=64, type=int, help="Size at which an evidence segment file is rolled over")
 
     args = parser.parse_args()
+    if args.plate_localizer == "yolo" and not args.plate_model_path:
+        parser.error("--plate_localizer=yolo requires --plate_model_path")
+
+    nodes.init_multiprocessing_resources(slots=args.ocr_slots, slot_bytes=args.ocr_slot_kb * 1024)
+    if args.evidence_dir:
+        nodes.init_evidence_writer(args.evidence_dir, args.evidence_segment_mb)
 
     process_video(
         source_video_path=args.source_video_path,
         speed_limit=args.speed_limit,
         camera_id=args.camera_id,
-        location=args.location
+        location=args.location,
+        batch_size=args.batch_size,
+        detection_stride=args.detection_stride,
+        use_roi=args.use_roi,
+        backend=args.backend,
+        int8=args.int8,
+        calibration_dir=args.calibration_dir,
+        motion_gate=args.motion_gate,
+        motion_threshold=args.motion_threshold,
+        track_ttl=args.track_ttl,
+        max_tracks=args.max_tracks,
+        speed_mode=args.speed_mode,
+        min_speed_confidence=args.min_speed_confidence,
+        plate_deadline=args.plate_deadline,
+        plate_localizer=args.plate_localizer,
+        plate_model_path=args.plate_model_path,
+        ocr_concurrency=args.ocr_concurrency,
+        tiered_ocr=args.tiered_ocr,
+        ocr_cache=args.ocr_cache,
+        ocr_cache_path=args.ocr_cache_path,
+        ocr_batch_size=args.ocr_batch_size,
+        ocr_batch_layout=args.ocr_batch_layout,
+        ocr_plate_height=args.ocr_plate_height,
+        ocr_max_bytes=args.ocr_max_bytes,
+        ocr_grayscale=args.ocr_grayscale,
+        ocr_clahe=args.ocr_clahe,
+        pipelined=args.pipelined,
+        queue_size=args.queue_size,
+        decode_mode=args.decode_mode,
+        annotate_mode=args.annotate_mode,
+        encode_mode=args.encode_mode,
+        annotate_every=args.annotate_every,
+        annotate_violations_only=args.annotate_violations_only,
+        threaded_decode=args.threaded_decode,
+        decode_width=args.decode_width,
+        max_frame_id=args.max_frame_id if args.max_frame_id >= 0 else None,
+        ocr_shutdown_timeout=args.ocr_shutdown_timeout,
+        executor=args.executor
     )
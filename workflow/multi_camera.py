@@ -0,0 +1,300 @@
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional
+
+import numpy as np
+import supervision as sv
+
+from inference_service.backends import load_model
+from inference_service.detector import TARGET
+from inference_service.plate_reader import PayloadEncoder, PLATE_HEIGHT, MAX_PAYLOAD_BYTES
+from inference_service.shared_model import SharedModel
+from inference_service.speed_estimator import SPEED_MODES
+from inference_service.track_lifecycle import discard_from
+from workflow import main as workflow_main
+from workflow.fast_path import EXECUTORS
+from workflow.node import nodes
+
+
+def _calibration_arrays(calibration: Optional[dict]):
+    if not calibration:
+        return None, None
+
+    source = np.array(calibration["source"], dtype=np.float32)
+    if "target" in calibration:
+        target = np.array(calibration["target"], dtype=np.float32)
+    elif "target_width" in calibration or "target_height" in calibration:
+        width = calibration.get("target_width", TARGET[1][0])
+        height = calibration.get("target_height", TARGET[2][1])
+        target = np.array([[0, 0], [width, 0], [width, height], [0, height]], dtype=np.float32)
+    else:
+        target = TARGET
+
+    return source, target
+
+
+def load_manifest(manifest_path: str) -> list:
+    """
+    Read a JSON manifest: a list (or {"cameras": [...]}) of
+    {"camera_id", "source", "location", "speed_limit", "calibration": {"source": [[x, y] * 4], ...}}.
+    """
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        cameras = json.load(f)
+
+    if isinstance(cameras, dict):
+        cameras = cameras["cameras"]
+
+    seen = set()
+    for camera in cameras:
+        for key in ("camera_id", "source"):
+            if key not in camera:
+                raise ValueError(f"Camera entry is missing '{key}': {camera}")
+        if camera["camera_id"] in seen:
+            raise ValueError(f"Duplicate camera_id in manifest: {camera['camera_id']}")
+        seen.add(camera["camera_id"])
+
+        camera.setdefault("location", camera["camera_id"])
+        camera.setdefault("speed_limit", 60.0)
+        camera.setdefault("calibration", None)
+
+    return cameras
+
+
+class DBWriter:
+    """
+    Single thread that runs the finalization graph for every camera, so the
+    violations database only ever has one writer.
+    """
+
+    def __init__(self, finalization_app):
+        self.finalization_app = finalization_app
+        self.jobs = queue.Queue()
+        self.reports = 0
+        self.worker = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self.worker.start()
+
+    def submit(self, finalization_state) -> None:
+        self.jobs.put(finalization_state)
+
+    def _run(self) -> None:
+        while True:
+            state = self.jobs.get()
+            if state is None:
+                break
+            try:
+                result = self.finalization_app.invoke(state)
+                self.reports += len(result["llm_reports"])
+            except Exception as e:
+                print(f"[DB WRITER] Finalization failed for {state['camera_id']}: {e}")
+
+    def close(self) -> None:
+        self.jobs.put(None)
+        self.worker.join()
+
+
+def run_camera(camera: dict, shared_model: SharedModel, processing_app, args: argparse.Namespace):
+    camera_id = camera["camera_id"]
+    video_info = sv.VideoInfo.from_video_path(video_path=camera["source"])
+    source, target = _calibration_arrays(camera["calibration"])
+
+    models = workflow_main.build_models(
+        args.model_path,
+        video_info,
+        args.confidence,
+        args.iou,
+        detection_stride=args.detection_stride,
+        use_roi=args.use_roi,
+        model=shared_model,
+        source=source,
+        target=target,
+        motion_gate=args.motion_gate,
+        motion_threshold=args.motion_threshold,
+        track_ttl=args.track_ttl,
+        max_tracks=args.max_tracks,
+        speed_mode=args.speed_mode,
+        min_speed_confidence=args.min_speed_confidence,
+        plate_deadline=args.plate_deadline,
+        plate_localizer=args.plate_localizer,
+        plate_model_path=args.plate_model_path
+    )
+    nodes.camera_models[camera_id] = models
+    models["track_lifecycle"].register(
+        "ocr_dispatch", discard_from(nodes.camera_dispatched_tracker_ids.setdefault(camera_id, set()))
+    )
+
+    persistent_state = workflow_main.new_persistent_state()
+    frame_kwargs = {
+        "fps": video_info.fps,
+        "camera_id": camera_id,
+        "location": camera["location"],
+        "speed_limit": camera["speed_limit"],
+    }
+
+    frame_source = None
+    output_video_info = video_info
+    if args.threaded_decode:
+        frame_source = workflow_main.open_frame_source(camera["source"], models, args.decode_width)
+        output_video_info = frame_source.video_info
+
+    output_path = os.path.join(args.output_dir, f"output_{camera_id}.avi")
+    print(f"[CAMERA {camera_id}] {camera['source']} -> {output_path}")
+
+    try:
+        frame_id = workflow_main.run_serial(
+            processing_app,
+            persistent_state,
+            output_video_info,
+            output_path,
+            workflow_main.video_frames(camera["source"], args.max_frame_id, frame_source),
+            1,
+            frame_kwargs,
+            models,
+            annotate_every=args.annotate_every,
+            annotate_violations_only=args.annotate_violations_only
+        )
+    finally:
+        # A failing camera must not leave its decode thread running for the rest of the run
+        if frame_source is not None:
+            frame_source.close()
+
+    nodes.flush_plate_candidates(models, camera_id)
+    workflow_main.report_detection_stats(models, prefix=f"[CAMERA {camera_id}]")
+
+    return camera, persistent_state, frame_id, video_info.fps
+
+
+def run_cameras(args: argparse.Namespace) -> None:
+    cameras = load_manifest(args.manifest)
+    workers = min(args.workers, len(cameras)) if args.workers > 0 else len(cameras)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    # One OCR worker process for every camera
+    encoder = PayloadEncoder(
+        target_height=args.ocr_plate_height, max_bytes=args.ocr_max_bytes,
+        grayscale=args.ocr_grayscale, clahe=args.ocr_clahe
+    )
+    ocr_process = multiprocessing.Process(
+        target=workflow_main.ocr_worker,
+        args=(nodes.ocr_transport, args.ocr_concurrency, args.tiered_ocr,
+              args.ocr_cache, args.ocr_cache_path, args.ocr_batch_size, args.ocr_batch_layout, encoder,
+              args.plate_localizer != "none")
+    )
+    ocr_process.start()
+
+    # One YOLO instance for every camera; concurrent calls are merged into batches
+    shared_model = SharedModel(
+        load_model(args.model_path, args.backend, int8=args.int8, calibration_dir=args.calibration_dir),
+        max_batch_size=args.max_batch_size
+    )
+
+    processing_app = workflow_main.create_processing_graph(args.executor)
+    db_writer = DBWriter(workflow_main.create_finalization_graph())
+
+    finished = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="camera") as pool:
+        futures = {
+            pool.submit(run_camera, camera, shared_model, processing_app, args): camera["camera_id"]
+            for camera in cameras
+        }
+        for future in as_completed(futures):
+            camera_id = futures[future]
+            try:
+                finished.append(future.result())
+                print(f"[CAMERA {camera_id}] Done")
+            except Exception as e:
+                print(f"[CAMERA {camera_id}] Failed: {e}")
+
+    workflow_main.stop_ocr_worker(ocr_process, nodes.ocr_transport, args.ocr_shutdown_timeout)
+
+    for camera, persistent_state, frame_id, fps in finished:
+        # Plates that arrived after the camera's last frame
+        workflow_main.attach_ocr_results(persistent_state, nodes.ocr_transport.poll(camera["camera_id"]))
+        if frame_id < 0:
+            continue
+        db_writer.submit(workflow_main.build_finalization_state(
+            persistent_state,
+            persistent_state.violation_plates,
+            frame_id,
+            camera["camera_id"],
+            camera["location"],
+            camera["speed_limit"],
+            fps
+        ))
+
+    db_writer.close()
+    nodes.ocr_transport.close()
+    if nodes.evidence_writer is not None:
+        nodes.evidence_writer.close()
+    shared_model.close()
+
+    print(f"\n[MULTI CAMERA] {len(finished)}/{len(cameras)} cameras processed, "
+          f"{db_writer.reports} reports, "
+          f"average YOLO batch {shared_model.average_batch_size:.2f} frames")
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Multi-camera LangGraph Traffic Monitoring")
+    parser.add_argument("--manifest", required=True, type=str, help="JSON list of camera sources")
+    parser.add_argument("--workers", default=0, type=int, help="Camera worker threads (0 = one per camera)")
+    parser.add_argument("--max_batch_size", default=16, type=int, help="Max frames per shared YOLO pass")
+    parser.add_argument("--model_path", default="inference_service/yolo11n.pt", type=str)
+    parser.add_argument("--backend", default="pytorch", choices=["pytorch", "onnx", "openvino"])
+    parser.add_argument("--int8", action="store_true")
+    parser.add_argument("--calibration_dir", default=None, type=str)
+    parser.add_argument("--confidence", default=0.3, type=float)
+    parser.add_argument("--iou", default=0.7, type=float)
+    parser.add_argument("--detection_stride", default=1, type=int)
+    parser.add_argument("--use_roi", action="store_true")
+    parser.add_argument("--motion_gate", action="store_true")
+    parser.add_argument("--motion_threshold", default=0.002, type=float)
+    parser.add_argument("--track_ttl", default=10.0, type=float)
+    parser.add_argument("--max_tracks", default=512, type=int)
+    parser.add_argument("--speed_mode", default="endpoint", choices=SPEED_MODES)
+    parser.add_argument("--min_speed_confidence", default=0.0, type=float)
+    parser.add_argument("--plate_deadline", default=2.0, type=float)
+    parser.add_argument("--plate_localizer", default="none", choices=["none", "classical", "yolo"])
+    parser.add_argument("--plate_model_path", default=None, type=str)
+    parser.add_argument("--ocr_concurrency", default=1, type=int)
+    parser.add_argument("--tiered_ocr", action="store_true")
+    parser.add_argument("--ocr_cache", action="store_true")
+    parser.add_argument("--ocr_cache_path", default=None, type=str)
+    parser.add_argument("--ocr_batch_size", default=1, type=int)
+    parser.add_argument("--ocr_batch_layout", default="images", choices=["images", "mosaic"])
+    parser.add_argument("--ocr_plate_height", default=PLATE_HEIGHT, type=int)
+    parser.add_argument("--ocr_max_bytes", default=MAX_PAYLOAD_BYTES, type=int)
+    parser.add_argument("--ocr_grayscale", action="store_true")
+    parser.add_argument("--ocr_clahe", action="store_true")
+    parser.add_argument("--ocr_slots", default=64, type=int)
+    parser.add_argument("--ocr_slot_kb", default=1024, type=int)
+    parser.add_argument("--ocr_shutdown_timeout", default=30.0, type=float)
+    parser.add_argument("--executor", default="langgraph", choices=EXECUTORS)
+    parser.add_argument("--evidence_dir", default=os.path.join("output", "evidence"), type=str)
+    parser.add_argument("--evidence_segment_mb", default=64, type=int)
+    parser.add_argument("--annotate_every", default=1, type=int)
+    parser.add_argument("--annotate_violations_only", action="store_true")
+    parser.add_argument("--threaded_decode", action="store_true")
+    parser.add_argument("--decode_width", default=None, type=int)
+    parser.add_argument("--output_dir", default=os.path.join("inference_service", "output"), type=str)
+    parser.add_argument("--max_frame_id", default=-1, type=int, help="Stop each camera after this frame")
+
+    args = parser.parse_args()
+    if args.plate_localizer == "yolo" and not args.plate_model_path:
+        parser.error("--plate_localizer=yolo requires --plate_model_path")
+    if args.max_frame_id < 0:
+        args.max_frame_id = None
+    return args
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    args = parse_arguments()
+    nodes.init_multiprocessing_resources(slots=args.ocr_slots, slot_bytes=args.ocr_slot_kb * 1024)
+    if args.evidence_dir:
+        nodes.init_evidence_writer(args.evidence_dir, args.evidence_segment_mb)
+
+    run_cameras(args)
@@ -1,10 +1,13 @@
-import multiprocessing
 import os
-import queue
 
 import cv2
+import numpy as np
+import supervision as sv
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
 from workflow.state import TrafficState
+from workflow.frame_context import update_state
+from workflow.shm_transport import OCRTransport
+from workflow.evidence_store import EvidenceStore, EvidenceWriter
 from inference_service.detector import process_detection
 from inference_service.plate_reader import extract_and_read_plate, extract_plate_region
 from workflow.tools.tools import save_violation
@@ -17,6 +20,41 @@ from pathlib import Path
 cv_models = {}
 ocr_dispatched_tracker_ids = set()
 
+# Multi-camera runs register one models dict and one dispatch set per camera_id;
+# single-camera runs keep using cv_models / ocr_dispatched_tracker_ids above.
+camera_models = {}
+camera_dispatched_tracker_ids = {}
+
+
+def get_models(state: TrafficState) -> dict:
+    return camera_models.get(state["camera_id"], cv_models)
+
+
+def get_full_frame(state: TrafficState, cv_models: dict):
+    """
+    Full-resolution frame for plate crops. When frames are decoded downscaled the
+    full-resolution image is fetched from the frame source only at this point.
+    """
+    frame_source = cv_models.get("frame_source")
+    if frame_source is None or not frame_source.downscaled:
+        return state["frame"]
+
+    full = frame_source.full_frame(state["frame_id"])
+    if full is None:
+        print(f"[OCR] Full-resolution frame {state['frame_id']} no longer buffered, upscaling")
+        full = cv2.resize(state["frame"], frame_source.full_resolution_wh)
+    return full
+
+
+def get_dispatched_tracker_ids(state: TrafficState) -> set:
+    return dispatched_tracker_ids_for(state["camera_id"])
+
+
+def dispatched_tracker_ids_for(camera_id: str) -> set:
+    if camera_id in camera_models:
+        return camera_dispatched_tracker_ids.setdefault(camera_id, set())
+    return ocr_dispatched_tracker_ids
+
 PLATES_DIR = os.path.join("inference_service", "output", "plates")
 os.makedirs(PLATES_DIR, exist_ok=True)
 
@@ -25,99 +63,104 @@ def detect_vehicle(state: TrafficState) -> TrafficState:
     Detect vehicles in the current video frame.
     """
     
-    global cv_models
+    cv_models = get_models(state)
     
     try:
-        detections = process_detection(
-            cv_models["model"],
-            cv_models["byte_track"],
-            cv_models["polygon_zone"],
-            state["frame"],
-            cv_models["confidence"],
-            cv_models["iou"]
-        )
+        # Detections may already be filled in by batched inference in process_video
+        detections = state.get("detections")
+
+        motion_gate = cv_models.get("motion_gate")
+        if detections is None and motion_gate is not None and not motion_gate.should_detect(state["frame"]):
+            print(f"[DETECT] Frame {state['frame_id']}: no motion, detection skipped")
+            # ocr_plate does not run on this frame; violators that already left still get their crop sent
+            dispatch_due_candidates(state, cv_models)
+            return update_state(
+                state,
+                detections=sv.Detections.empty(),
+                motion_skipped=True,
+                speed_values={},
+                speed_confidence={},
+                violations=[],
+                next="end"
+            )
+
+        if detections is None and "stride_detector" in cv_models:
+            detections = cv_models["stride_detector"].detect(state["frame"])
+        elif detections is None:
+            detections = process_detection(
+                cv_models["model"],
+                cv_models["byte_track"],
+                cv_models["polygon_zone"],
+                state["frame"],
+                cv_models["confidence"],
+                cv_models["iou"],
+                cv_models.get("roi"),
+                cv_models.get("input_scale", 1.0)
+            )
         
+        if motion_gate is not None:
+            motion_gate.update_tracks(len(detections))
+
         print(f"[DETECT] Frame {state['frame_id']}: {len(detections) if detections else 0} vehicles")
         
-        return {
-            **state,
-            "detections": detections,
-            "next": "calculate_speed"
-        }
+        return update_state(state, detections=detections, motion_skipped=False, next="calculate_speed")
     
     except Exception as e:
-        return {
-            **state,
-            "detections": None,
-            "error": [f"Vehicle detection failed: {str(e)}"],
-            "next": "end"
-        }
+        print(f"[DETECT] Vehicle detection failed: {e}")
+        dispatch_due_candidates(state, cv_models)
+        return update_state(state, detections=None, next="end")
 
 def calculate_speed(state: TrafficState) -> TrafficState:
     """
     Calculate the speed of detected vehicles.
     """
     
-    global cv_models
+    cv_models = get_models(state)
     
     try:
         if state["detections"] is None:
-            return {
-                **state,
-                "speed_values": {},
-                "next": "end"
-            }
+            return update_state(state, speed_values={}, speed_confidence={}, next="end")
             
         speed_estimator = cv_models["speed_estimator"]
-        speed_labels = speed_estimator.update_and_estimate(state["detections"])
-        
-        print(f"[SPEED] Raw speed labels: {speed_labels}")
-        
-        speed_values = {}
-        
-        for labels in speed_labels:
-            if "km/h" in labels:
-                try:
-                    # Parse format like "#1 127 km/h"
-                    parts = labels.split()
-                    tracker_id = int(parts[0].replace("#", ""))
-                    speed_part = parts[1] if len(parts) > 1 else "0"
-                    speed = float(speed_part.split()[0])  # Get first number before "km/h"
-                    speed_values[tracker_id] = speed
-                except:
-                    print(f"[SPEED] Failed to parse speed label: {labels}")
-            else:
-                # Handle labels without km/h (like '#1', '#2', etc.)
-                try:
-                    tracker_id = int(labels.replace("#", ""))
-                    speed_values[tracker_id] = 0.0  # Default speed when no km/h info
-                except:
-                    pass
+        tracker_ids, speeds, confidence = speed_estimator.estimate_with_confidence(
+            state["detections"], timestamp=state["timestamp"]
+        )
+
+        # Tracks without enough history yet count as 0 km/h
+        speeds = np.nan_to_num(speeds, nan=0.0)
+        speed_values = dict(zip(tracker_ids.tolist(), speeds.tolist()))
+        speed_confidence = dict(zip(tracker_ids.tolist(), confidence.tolist()))
+
+        track_lifecycle = cv_models.get("track_lifecycle")
+        if track_lifecycle is not None:
+            track_lifecycle.update(tracker_ids, now=state["timestamp"])
             
         print(f"[SPEED] calculated speeds: {speed_values}")
         
-        return {
-            **state,
-            "speed_values": speed_values,
-            "next": "check_violation"
-        }
+        return update_state(
+            state, speed_values=speed_values, speed_confidence=speed_confidence, next="check_violation"
+        )
         
     except Exception as e:
-        return {
-            **state,
-            "speed_values": {},
-            "next": "end",
-        }
+        return update_state(state, speed_values={}, speed_confidence={}, next="end")
         
 def check_violation(state: TrafficState) -> TrafficState:
     """
     Check for speed violations.
     """
+    min_confidence = get_models(state).get("min_speed_confidence", 0.0)
+    speed_confidence = state.get("speed_confidence") or {}
+
     try:
         violations = []
+        uncertain = 0
         
         for tracker_id, speed in state["speed_values"].items():
             if speed > state["speed_limit"]:
+                confidence = speed_confidence.get(tracker_id, 1.0)
+                if confidence < min_confidence:
+                    uncertain += 1
+                    continue
                 violation = {
                     "frame_id": state["frame_id"],
                     "tracker_id": tracker_id,
@@ -127,89 +170,168 @@ def check_violation(state: TrafficState) -> TrafficState:
                     "camera_id": state["camera_id"],
                     "location": state["location"],
                     "timestamp": state["timestamp"],
+                    "speed_confidence": confidence,
                 }
                 violations.append(violation)
-        print(f"[CHECK] {len(violations)} violations detected")
+        print(f"[CHECK] {len(violations)} violations detected"
+              + (f", {uncertain} over the limit below speed confidence {min_confidence}" if uncertain else ""))
         
-        next_action = "ocr_plate" if violations else "end"
+        # Buffered best crops are dispatched from ocr_plate once their track leaves
+        plate_candidates = get_models(state).get("plate_candidates")
+        has_pending = plate_candidates is not None and len(plate_candidates) > 0
+        next_action = "ocr_plate" if violations or has_pending else "end"
         
-        return {
-            **state,
-            "violations": violations,
-            "next": next_action
-        }    
+        return update_state(state, violations=violations, next=next_action)
     
     except Exception as e:
-        return {
-            **state,
-            "violations": [],
-            "next": "end"
-        }
+        return update_state(state, violations=[], next="end")
 
 
-ocr_results: multiprocessing.managers.DictProxy = None
-ocr_queue: multiprocessing.JoinableQueue = None
+ocr_transport: OCRTransport = None
 
-def init_multiprocessing_resources():
-    global ocr_results, ocr_queue
-    manager = multiprocessing.Manager()
-    ocr_results = manager.dict()
-    ocr_queue = manager.JoinableQueue()
+def init_multiprocessing_resources(slots: int = 64, slot_bytes: int = 1 << 20):
+    global ocr_transport
+    ocr_transport = OCRTransport(slots=slots, slot_bytes=slot_bytes)
 
 
-def ocr_plate(state: TrafficState) -> TrafficState:
-    global ocr_dispatched_tracker_ids, ocr_queue, ocr_results
+# Background writer for plate crop evidence; without one crops are saved as loose files in PLATES_DIR
+evidence_writer: EvidenceWriter = None
+
+def init_evidence_writer(root: str = os.path.join("output", "evidence"), segment_mb: int = 64) -> EvidenceWriter:
+    global evidence_writer
+    evidence_writer = EvidenceWriter(EvidenceStore(root, segment_bytes=segment_mb << 20))
+    return evidence_writer
+
 
+def plate_task_id(camera_id: str, frame_id: int, tracker_id: int) -> str:
+    return f"{camera_id}_{frame_id}_{tracker_id}"
+
+
+def save_plate_evidence(camera_id: str, frame_id: int, tracker_id: int, plate_im) -> None:
+    if evidence_writer is not None:
+        if not evidence_writer.submit(plate_task_id(camera_id, frame_id, tracker_id), plate_im):
+            print(f"[EVIDENCE] Writer queue full, crop of tracker #{tracker_id} not kept")
+        return
+
+    plate_path = os.path.join(PLATES_DIR, f"plate_{camera_id}_f{frame_id}_t{tracker_id}.jpg")
     try:
-        if not state["violations"]:
-            return {**state, "next": "end"}
+        cv2.imwrite(plate_path, plate_im)
+        print(f"[PLATE SAVE] Saved: {plate_path}")
+    except Exception as e:
+        print(f"[PLATE SAVE ERROR] Could not save plate: {e}")
 
-        current_violation_ids = {v["tracker_id"] for v in state["violations"]}
 
-        if state["detections"] is not None and state["detections"].tracker_id is not None:
-            for i in range(len(state["detections"])):
-                tracker_id = state["detections"].tracker_id[i]
+def dispatch_plate(camera_id: str, frame_id: int, tracker_id: int, plate_im) -> None:
+    """
+    Save the crop as evidence and queue it for the OCR worker.
+    """
+    save_plate_evidence(camera_id, frame_id, tracker_id, plate_im)
 
-                if tracker_id in current_violation_ids:
+    try:
+        task_id = plate_task_id(camera_id, frame_id, tracker_id)
 
-                    if tracker_id in ocr_dispatched_tracker_ids:
-                        continue
+        ocr_transport.put({
+            "task_id": task_id,
+            "camera_id": camera_id,
+            "frame_id": frame_id,
+            "tracker_id": tracker_id
+        }, plate_im)
 
-                    ocr_dispatched_tracker_ids.add(tracker_id)
+        print(f"[OCR DISPATCH] Tracker #{tracker_id} → sent ONCE to queue")
 
-                    bbox = state["detections"].xyxy[i].copy()
-                    plate_im = extract_plate_region(state["frame"].copy(), bbox)
+    except Exception as e:
+        print(f"[OCR DISPATCH] Could not send tracker #{tracker_id}: {e}")
 
-                    plate_filename = f"plate_f{state['frame_id']}_t{tracker_id}.jpg"
-                    plate_path = os.path.join(PLATES_DIR, plate_filename)
 
-                    try:
-                        cv2.imwrite(plate_path, plate_im)
-                        print(f"[PLATE SAVE] Saved: {plate_path}")
-                    except Exception as e:
-                        print(f"[PLATE SAVE ERROR] Could not save plate: {e}")
+def localize_plate(models: dict, plate_im):
+    """
+    Tight plate crop when a plate localizer is configured, else the vehicle region as-is.
+    """
+    plate_localizer = models.get("plate_localizer")
+    return plate_localizer.crop(plate_im) if plate_localizer is not None else plate_im
 
-                    try:
-                        task_id = f"{state['frame_id']}_{tracker_id}"
 
-                        ocr_queue.put_nowait({
-                            "task_id": task_id,
-                            "frame_id": state["frame_id"],
-                            "tracker_id": tracker_id,
-                            "plate_im": plate_im
-                        })
+def flush_plate_candidates(models: dict, camera_id: str) -> int:
+    """
+    Dispatch every buffered best crop, e.g. when the video ends.
+    """
+    plate_candidates = models.get("plate_candidates")
+    if plate_candidates is None:
+        return 0
 
-                        print(f"[OCR DISPATCH] Tracker #{tracker_id} → sent ONCE to queue")
+    dispatched_ids = dispatched_tracker_ids_for(camera_id)
+    candidates = plate_candidates.flush()
+    for candidate in candidates:
+        dispatched_ids.add(candidate.tracker_id)
+        dispatch_plate(camera_id, candidate.frame_id, candidate.tracker_id, localize_plate(models, candidate.crop))
 
-                    except queue.Full:
-                        print(f"[OCR DISPATCH] Queue FULL → Skipped tracker #{tracker_id}")
+    return len(candidates)
 
-        return {**state, "next": "end"}
+
+def dispatch_due_candidates(state: TrafficState, models: dict, active_ids=()) -> int:
+    """
+    Dispatch the buffered crops whose track left (not in `active_ids`) or whose deadline passed.
+    """
+    plate_candidates = models.get("plate_candidates")
+    if plate_candidates is None or len(plate_candidates) == 0:
+        return 0
+
+    dispatched_ids = get_dispatched_tracker_ids(state)
+    candidates = plate_candidates.due(state["timestamp"], active_ids)
+    for candidate in candidates:
+        print(f"[OCR] Tracker #{candidate.tracker_id}: best of {candidate.offers} crops "
+              f"(frame {candidate.frame_id}, score {candidate.score:.2f})")
+        dispatched_ids.add(candidate.tracker_id)
+        dispatch_plate(state["camera_id"], candidate.frame_id, candidate.tracker_id,
+                       localize_plate(models, candidate.crop))
+
+    return len(candidates)
+
+
+def ocr_plate(state: TrafficState) -> TrafficState:
+    cv_models = get_models(state)
+    plate_candidates = cv_models.get("plate_candidates")
+    ocr_dispatched_tracker_ids = get_dispatched_tracker_ids(state)
+
+    try:
+        has_pending = plate_candidates is not None and len(plate_candidates) > 0
+        if not state["violations"] and not has_pending:
+            return update_state(state, next="end")
+
+        full_frame = None
+        detections = state["detections"]
+
+        current_violation_ids = {v["tracker_id"] for v in state["violations"]}
+
+        if detections is not None and detections.tracker_id is not None:
+            for i in range(len(detections)):
+                tracker_id = detections.tracker_id[i]
+
+                if tracker_id not in current_violation_ids or tracker_id in ocr_dispatched_tracker_ids:
+                    continue
+
+                bbox = detections.xyxy[i].copy()
+                if full_frame is None:
+                    full_frame = get_full_frame(state, cv_models)
+                plate_im = extract_plate_region(full_frame, bbox)
+
+                if plate_candidates is None:
+                    ocr_dispatched_tracker_ids.add(tracker_id)
+                    dispatch_plate(state["camera_id"], state["frame_id"], tracker_id,
+                                   localize_plate(cv_models, plate_im.copy()))
+                else:
+                    # Keep only the best crop while the vehicle approaches
+                    plate_candidates.offer(tracker_id, plate_im, state["frame_id"], state["timestamp"])
+
+        if plate_candidates is not None:
+            active_ids = detections.tracker_id if detections is not None and detections.tracker_id is not None else []
+            dispatch_due_candidates(state, cv_models, active_ids)
+
+        return update_state(state, next="end")
 
     except Exception as e:
         print(f"[OCR] Error in ocr_plate dispatcher: {e}")
-        return {**state, "next": "end"}
-
+        return update_state(state, next="end")
 
 
 def save_db(state: TrafficState) -> TrafficState:
@@ -245,7 +367,11 @@ def save_db(state: TrafficState) -> TrafficState:
             violation_copy = violation.copy()
             violation_copy["plate_number"] = plate_number
             
-            _ = save_violation.invoke({"violation_data": json.dumps(violation_copy)})
+            saved = json.loads(save_violation.invoke({"violation_data": json.dumps(violation_copy)}))
+            if evidence_writer is not None:
+                evidence_writer.link(
+                    saved["violation_id"], plate_task_id(state["camera_id"], violation["frame_id"], violation["tracker_id"])
+                )
             saved_count += 1
             saved_plates.add(plate_number)
             saved_violations.append(violation_copy)  
@@ -0,0 +1,215 @@
+import multiprocessing
+import queue
+import threading
+import time
+from typing import Callable, List, Optional
+
+_STOP = None
+
+
+def _queue_depth(q) -> int:
+    try:
+        return q.qsize()
+    except NotImplementedError:
+        # multiprocessing.Queue.qsize is not available on macOS
+        return -1
+
+
+def _run_source(name, factory, output_queue, stop_event, busy, processed, errors):
+    try:
+        iterator = iter(factory())
+        seq = 0
+        while not stop_event.is_set():
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            busy.value += time.perf_counter() - start
+            processed.value += 1
+
+            output_queue.put((seq, item))
+            seq += 1
+    except Exception as e:
+        print(f"[PIPELINE] Stage '{name}' failed: {e}")
+        errors.value += 1
+        stop_event.set()
+    finally:
+        output_queue.put(_STOP)
+
+
+def _run_stage(name, factory, input_queue, output_queue, stop_event, busy, processed, errors):
+    fn = None
+    failed = False
+    try:
+        fn = factory()
+    except Exception as e:
+        print(f"[PIPELINE] Stage '{name}' could not start: {e}")
+        errors.value += 1
+        stop_event.set()
+        failed = True
+
+    while True:
+        item = input_queue.get()
+        if item is _STOP:
+            break
+        if failed:
+            # Keep draining so upstream stages never block on a full queue
+            continue
+
+        seq, payload = item
+        start = time.perf_counter()
+        try:
+            result = fn(payload)
+        except Exception as e:
+            print(f"[PIPELINE] Stage '{name}' failed on item {seq}: {e}")
+            errors.value += 1
+            stop_event.set()
+            failed = True
+            continue
+        busy.value += time.perf_counter() - start
+        processed.value += 1
+
+        if output_queue is not None:
+            output_queue.put((seq, result))
+
+    close = getattr(fn, "close", None)
+    if close is not None:
+        close()
+
+    if output_queue is not None:
+        output_queue.put(_STOP)
+
+
+class Stage:
+
+    def __init__(self, name: str, factory: Callable, mode: str = "thread", is_source: bool = False):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown stage mode: {mode}")
+
+        self.name = name
+        self.factory = factory
+        self.mode = mode
+        self.is_source = is_source
+
+        self.busy = multiprocessing.Value("d", 0.0)
+        self.processed = multiprocessing.Value("l", 0)
+        self.errors = multiprocessing.Value("l", 0)
+        self.input_queue = None
+        self.worker = None
+
+
+class Pipeline:
+    """
+    Linear chain of stages connected by bounded queues.
+
+    Every stage is a single worker reading its input queue in FIFO order, so items
+    leave the last stage in the order the source produced them. `factory` is called
+    inside the worker and must return the stage callable (or, for the source, an
+    iterable); in process mode it has to be picklable. A callable with a `close`
+    method is closed after the last item.
+    """
+
+    def __init__(self, queue_size: int = 8):
+        self.queue_size = queue_size
+        self.stages: List[Stage] = []
+        self.stop_event = multiprocessing.Event()
+        self.started_at = None
+        self.finished_at = None
+
+    def add_source(self, name: str, factory: Callable, mode: str = "thread") -> "Pipeline":
+        if self.stages:
+            raise ValueError("The source must be the first stage")
+        self.stages.append(Stage(name, factory, mode, is_source=True))
+        return self
+
+    def add_stage(self, name: str, factory: Callable, mode: str = "thread") -> "Pipeline":
+        if not self.stages:
+            raise ValueError("Add a source before adding stages")
+        self.stages.append(Stage(name, factory, mode))
+        return self
+
+    def _make_queue(self, upstream: Stage, downstream: Stage):
+        if upstream.mode == "process" or downstream.mode == "process":
+            return multiprocessing.Queue(maxsize=self.queue_size)
+        return queue.Queue(maxsize=self.queue_size)
+
+    def _start(self) -> None:
+        for upstream, downstream in zip(self.stages, self.stages[1:]):
+            downstream.input_queue = self._make_queue(upstream, downstream)
+
+        self.started_at = time.perf_counter()
+
+        for i, stage in enumerate(self.stages):
+            output_queue = self.stages[i + 1].input_queue if i + 1 < len(self.stages) else None
+            counters = (stage.busy, stage.processed, stage.errors)
+
+            if stage.is_source:
+                target = _run_source
+                args = (stage.name, stage.factory, output_queue, self.stop_event, *counters)
+            else:
+                target = _run_stage
+                args = (stage.name, stage.factory, stage.input_queue, output_queue, self.stop_event, *counters)
+
+            if stage.mode == "process":
+                stage.worker = multiprocessing.Process(target=target, args=args, name=stage.name, daemon=True)
+            else:
+                stage.worker = threading.Thread(target=target, args=args, name=stage.name, daemon=True)
+            stage.worker.start()
+
+    def stats(self) -> List[dict]:
+        end = self.finished_at or time.perf_counter()
+        wall = max(end - (self.started_at or end), 1e-9)
+
+        return [
+            {
+                "stage": stage.name,
+                "mode": stage.mode,
+                "processed": stage.processed.value,
+                "errors": stage.errors.value,
+                "busy_s": stage.busy.value,
+                "utilization": stage.busy.value / wall,
+                "queue_depth": _queue_depth(stage.input_queue) if stage.input_queue is not None else 0,
+                "queue_size": self.queue_size,
+            }
+            for stage in self.stages
+        ]
+
+    def format_stats(self) -> str:
+        parts = []
+        for s in self.stats():
+            parts.append(
+                f"{s['stage']}: {s['utilization'] * 100:.0f}% busy, "
+                f"{s['processed']} items, queue {s['queue_depth']}/{s['queue_size']}"
+            )
+        return " | ".join(parts)
+
+    def bottleneck(self) -> Optional[str]:
+        stats = self.stats()
+        if not stats:
+            return None
+        return max(stats, key=lambda s: s["utilization"])["stage"]
+
+    def stop(self) -> None:
+        self.stop_event.set()
+
+    def run(self, report_interval: float = 5.0) -> List[dict]:
+        """
+        Start all stages and block until the last one has drained.
+        """
+        self._start()
+
+        last_stage = self.stages[-1]
+        while last_stage.worker.is_alive():
+            last_stage.worker.join(timeout=report_interval)
+            if last_stage.worker.is_alive():
+                print(f"[PIPELINE] {self.format_stats()}")
+
+        for stage in self.stages:
+            stage.worker.join()
+
+        self.finished_at = time.perf_counter()
+        print(f"[PIPELINE] Done: {self.format_stats()}")
+        print(f"[PIPELINE] Bottleneck stage: {self.bottleneck()}")
+
+        return self.stats()
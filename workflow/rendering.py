@@ -0,0 +1,162 @@
+import cv2
+import numpy as np
+import supervision as sv
+
+from inference_service.detector import create_annotators, scale_detections
+
+
+def draw_speed_labels(frame: np.ndarray, detections: sv.Detections, speed_values: dict) -> np.ndarray:
+    """
+    Draw speed per tracked vehicle.
+    """
+    if detections is None or detections.tracker_id is None:
+        return frame
+
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    font_scale = 0.9
+    thickness = 2
+
+    for det_idx in range(len(detections)):
+        track_id = int(detections.tracker_id[det_idx])
+
+        if track_id not in speed_values:
+            continue
+
+        speed = speed_values[track_id]
+        x1, y1, x2, y2 = detections.xyxy[det_idx]
+
+        text = f"{speed:.1f} km/h"
+
+        (text_w, text_h), baseline = cv2.getTextSize(text, font, font_scale, thickness)
+
+        text_x = int(x1)
+        text_y = int(y1) - 10
+        if text_y < text_h:
+            text_y = text_h + 5
+
+        cv2.rectangle(
+            frame,
+            (text_x, text_y - text_h - 4),
+            (text_x + text_w + 4, text_y + 4),
+            (0, 0, 0),  # black background
+            -1  # filled
+        )
+
+        cv2.putText(
+            frame,
+            text,
+            (text_x + 2, text_y),
+            font,
+            font_scale,
+            (0, 255, 255),  # yellow text
+            thickness,
+            cv2.LINE_AA
+        )
+
+    return frame
+
+
+def annotate_frame(
+        frame: np.ndarray,
+        detections: sv.Detections,
+        speed_values: dict,
+        box_annotator: sv.BoxAnnotator,
+        label_annotator: sv.LabelAnnotator,
+        trace_annotator: sv.TraceAnnotator,
+        scale: float = 1.0,
+) -> np.ndarray:
+    """
+    Draw boxes, IDs, traces and speeds on a copy of the frame.
+    `scale` maps full-resolution boxes onto a downscaled frame.
+    """
+    annotated_frame = frame.copy()
+
+    if detections is not None and scale != 1.0:
+        detections = scale_detections(detections, scale)
+
+    if detections is not None:
+        annotated_frame = box_annotator.annotate(
+            scene=annotated_frame,
+            detections=detections
+        )
+        annotated_frame = label_annotator.annotate(
+            scene=annotated_frame,
+            detections=detections
+        )
+        annotated_frame = trace_annotator.annotate(
+            scene=annotated_frame,
+            detections=detections
+        )
+
+    return draw_speed_labels(annotated_frame, detections, speed_values or {})
+
+
+def should_annotate(
+        frame_id: int,
+        has_violation: bool,
+        annotate_every: int = 1,
+        annotate_violations_only: bool = False
+) -> bool:
+    if annotate_violations_only:
+        return has_violation
+    return frame_id % max(1, annotate_every) == 0
+
+
+def open_video_writer(output_path: str, video_info: sv.VideoInfo):
+    fourcc = cv2.VideoWriter_fourcc(*'MJPG')
+    frame_size = (video_info.width, video_info.height)
+    writer = cv2.VideoWriter(
+        filename=output_path,
+        fourcc=fourcc,
+        fps=video_info.fps,
+        frameSize=frame_size
+    )
+
+    if not writer.isOpened():
+        print(f"!!! LỖI QUAN TRỌNG: cv2.VideoWriter KHÔNG THỂ KHỞI TẠO. Codec 'MJPG' hoặc FFmpeg có vấn đề.")
+        return None
+
+    return writer
+
+
+class FrameAnnotator:
+    """
+    Pipeline stage callable: (frame, detections, speed_values, annotate) -> frame.
+    Frames with annotate=False pass through untouched.
+    Builds its own annotators so it can run in a separate process.
+    """
+
+    def __init__(self, video_info: sv.VideoInfo, scale: float = 1.0):
+        self.box_annotator, self.label_annotator, self.trace_annotator = create_annotators(video_info)
+        self.scale = scale
+
+    def __call__(self, payload) -> np.ndarray:
+        frame, detections, speed_values, annotate = payload
+        if not annotate:
+            return frame
+        return annotate_frame(
+            frame,
+            detections,
+            speed_values,
+            self.box_annotator,
+            self.label_annotator,
+            self.trace_annotator,
+            self.scale,
+        )
+
+
+class VideoEncoder:
+    """
+    Pipeline stage callable that writes frames to an MJPG file.
+    """
+
+    def __init__(self, output_path: str, video_info: sv.VideoInfo):
+        self.writer = open_video_writer(output_path, video_info)
+        if self.writer is None:
+            raise RuntimeError(f"Could not open video writer for {output_path}")
+
+    def __call__(self, frame: np.ndarray) -> None:
+        self.writer.write(frame)
+
+    def close(self) -> None:
+        self.writer.release()
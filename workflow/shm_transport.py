@@ -0,0 +1,163 @@
+import multiprocessing
+import queue
+import threading
+from collections import deque
+from multiprocessing import shared_memory
+from typing import List, Optional
+
+import numpy as np
+
+
+class OCRTransport:
+    """
+    Plate crops to the OCR worker process and plate results back, without a
+    Manager process in between.
+
+    Crop pixels are written once into a fixed-size slot of a shared-memory slab and
+    only a small descriptor (task fields, slot, shape, dtype) goes through a
+    multiprocessing.Queue; the worker reads the pixels in place. Crops larger than
+    a slot, or sent while every slot is busy, travel inline in the descriptor
+    instead. The worker answers every task with done(), which returns the result
+    and the slot over a pipe; a reader thread in the parent collects results and
+    recycles slots. Results are queued per camera for poll(), so the
+    frame loop can attach plates while the video is still running.
+
+    Results are only held until poll() hands them out, so memory stays flat on
+    a camera that runs for days.
+
+    stop() queues a sentinel behind every crop sent so far: the worker finishes
+    them, then get() raises queue.Empty and `stopping` turns True.
+
+    Parent: put(), poll(), join(), stop(), close().
+    Worker: get(), get_nowait(), done().
+    """
+
+    def __init__(self, slots: int = 64, slot_bytes: int = 1 << 20):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+
+        self.tasks = multiprocessing.Queue()
+        self.replies = multiprocessing.SimpleQueue()
+
+        self.arrivals = {}
+        self.free_slots = deque(range(slots))
+        self.sent = 0
+        self.completed = 0
+        self.inline = 0
+        self.condition = threading.Condition()
+        self.stopping = False
+
+        self.reader = threading.Thread(target=self._read_replies, name="ocr-results", daemon=True)
+        self.reader.start()
+
+    def __getstate__(self):
+        # Only what the worker needs; the parent-side bookkeeping stays behind
+        return {"slots": self.slots, "slot_bytes": self.slot_bytes, "shm": self.shm,
+                "tasks": self.tasks, "replies": self.replies, "stopping": False}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+    def _slot_view(self, slot: int, shape, dtype) -> np.ndarray:
+        return np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=slot * self.slot_bytes)
+
+    # Parent side
+
+    def put(self, task: dict, plate_im: np.ndarray) -> None:
+        descriptor = dict(task)
+        slot = None
+        with self.condition:
+            self.sent += 1
+            if plate_im.nbytes <= self.slot_bytes and self.free_slots:
+                slot = self.free_slots.popleft()
+            else:
+                self.inline += 1
+
+        if slot is None:
+            descriptor["plate_im"] = plate_im
+        else:
+            self._slot_view(slot, plate_im.shape, plate_im.dtype)[...] = plate_im
+            descriptor.update(slot=slot, shape=plate_im.shape, dtype=plate_im.dtype.str)
+
+        self.tasks.put(descriptor)
+
+    def _read_replies(self) -> None:
+        while True:
+            reply = self.replies.get()
+            if reply is None:
+                return
+
+            slot, result = reply
+            with self.condition:
+                if result is not None:
+                    self.arrivals.setdefault(result.get("camera_id"), deque()).append(result)
+                if slot is not None:
+                    self.free_slots.append(slot)
+                self.completed += 1
+                self.condition.notify_all()
+
+    def poll(self, camera_id: Optional[str] = None) -> List[dict]:
+        """
+        Results for `camera_id` that arrived since the last poll.
+        """
+        with self.condition:
+            arrived = self.arrivals.get(camera_id)
+            if not arrived:
+                return []
+            results = list(arrived)
+            arrived.clear()
+            return results
+
+    @property
+    def pending(self) -> int:
+        with self.condition:
+            return self.sent - self.completed
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every crop sent so far has been answered; False on timeout.
+        """
+        with self.condition:
+            return self.condition.wait_for(lambda: self.completed >= self.sent, timeout)
+
+    def stop(self) -> None:
+        self.tasks.put(None)
+
+    def summary(self) -> str:
+        return (f"{self.sent} crops sent, {self.completed} answered, {self.inline} inline "
+                f"(slab {self.slots} x {self.slot_bytes // 1024} KiB)")
+
+    def close(self) -> None:
+        self.replies.put(None)
+        self.reader.join()
+        self.tasks.close()
+        self.shm.close()
+        self.shm.unlink()
+
+    # Worker side
+
+    def _attach(self, descriptor: Optional[dict]) -> dict:
+        if descriptor is None:
+            self.stopping = True
+            raise queue.Empty
+        if "slot" in descriptor:
+            descriptor["plate_im"] = self._slot_view(descriptor["slot"], descriptor["shape"], np.dtype(descriptor["dtype"]))
+        return descriptor
+
+    def get(self, timeout: Optional[float] = None) -> dict:
+        """
+        Next task with its `plate_im`; raises queue.Empty after `timeout` or on the
+        stop sentinel. The pixels stay valid until done() is called for the task.
+        """
+        return self._attach(self.tasks.get(timeout=timeout))
+
+    def get_nowait(self) -> dict:
+        return self._attach(self.tasks.get_nowait())
+
+    def done(self, task: dict, result: Optional[dict]) -> None:
+        """
+        Report a task's result (None if it failed) and hand its slot back.
+        """
+        task.pop("plate_im", None)
+        self.replies.put((task.get("slot"), result))
@@ -16,11 +16,14 @@ class TrafficState(TypedDict):
     
     # CV res
     detections: Annotated[Optional[Any], "vehicle detections in the frame"]
+    motion_skipped: Annotated[bool, "detection skipped because the motion gate saw no motion"]
     speed_values: Annotated[Dict[int, float], "speed mapping"]
+    speed_confidence: Annotated[Dict[int, float], "speed estimate confidence (0..1) per tracker id"]
     
     # violation info
     violations: Annotated[List[Dict], "list of detected violations"]
     violation_plates: Annotated[List[Dict], "list of violation plates with frame_id, tracker_id and license plate"]
+    plate_readings: Annotated[Dict[int, str], "plate read by OCR per tracker id, filled as results arrive"]
     
     llm_reports: Annotated[List[str], "Generated violation reports"]
     